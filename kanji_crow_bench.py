@@ -0,0 +1,452 @@
+import statistics
+import platform
+import tempfile
+import random
+import typer
+import json
+import time
+import os
+
+
+from rich.console import Console
+from rich.table import Table
+from collections import deque
+
+import kanji_crow_monolith as kc
+
+
+# Typer Interface
+console = Console()
+app = typer.Typer(help="Headless Kanji Crow benchmarks.")
+
+# Default fixture scale (the full KanjiAPI dataset has 13108 kanji).
+FIXTURE_KANJI = 13108
+FIXTURE_USERS = 10000
+FIXTURE_QUEUE = 200
+FIXTURE_KNOWN = 300
+
+BENCH_PASSWORD = "Benchmark1"
+RESULTS_DIR = "bench_results"
+
+# Common words keep English queries realistic (many hits per query).
+WORDS = ["water", "fire", "tree", "person", "mountain", "river", "sun",
+         "moon", "gold", "earth", "heart", "hand", "eye", "mouth", "rain",
+         "power", "road", "house", "sword", "thread", "bamboo", "rice",
+         "field", "stone", "cloud", "wind", "snow", "spring", "autumn",
+         "winter", "summer", "east", "west", "south", "north", "king"]
+
+HIRAGANA = [chr(cp) for cp in range(0x3041, 0x3094)]
+KATAKANA = [chr(cp) for cp in range(0x30A1, 0x30F4)]
+
+
+def fake_word(rng: random.Random) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz")
+                   for _ in range(rng.randint(3, 9)))
+
+
+def make_kanji_dataset(n: int, rng: random.Random) -> dict:
+    """
+    Returns a synthetic dataset with the full KanjiAPI entry schema.
+    """
+
+    kanjis = {}
+    for i in range(n):
+        kanji = chr(0x4E00 + i)
+
+        meanings = [rng.choice(WORDS) if rng.random() < 0.3
+                    else fake_word(rng) for _ in range(rng.randint(1, 3))]
+
+        kanjis[kanji] = {
+            "freq_mainichi_shinbun": (rng.randint(1, 2500)
+                                      if rng.random() < 0.2 else None),
+            "grade": rng.choice([1, 2, 3, 4, 5, 6, 8, 9, None, None]),
+            "heisig_en": meanings[0] if rng.random() < 0.8 else None,
+            "jlpt": rng.choice([1, 2, 3, 4, 5, None, None]),
+            "kanji": kanji,
+            "kun_readings": [
+                "".join(rng.choices(HIRAGANA, k=rng.randint(1, 3)))
+                + rng.choice(["", ".", "-"])
+                + "".join(rng.choices(HIRAGANA, k=rng.randint(0, 2)))
+                for _ in range(rng.randint(0, 3))],
+            "meanings": meanings,
+            "name_readings": [
+                "".join(rng.choices(HIRAGANA, k=rng.randint(1, 4)))
+                for _ in range(rng.randint(0, 2))],
+            "notes": [],
+            "on_readings": [
+                "".join(rng.choices(KATAKANA, k=rng.randint(1, 3)))
+                for _ in range(rng.randint(0, 2))],
+            "stroke_count": rng.randint(1, 30),
+            "unicode": format(0x4E00 + i, "X")
+        }
+
+    return kanjis
+
+
+def make_user_doc(kanjis: dict, users: int, queue: int, known: int,
+                  rng: random.Random) -> dict:
+    """
+    Returns a compact-layout user file with `users` users, each
+    with ~queue cards to review and ~known known kanji.
+    """
+
+    # One cheap shared hash: login/register benches hash their own.
+    password = kc.bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"),
+                                kc.bcrypt.gensalt(4)).decode("utf-8")
+
+    ids = [kc.card_id(entry) for entry in kanjis.values()]
+    doc = {"format": kc.USER_FILE_FORMAT, "users": {}, "cards": {}}
+    for entry in kanjis.values():
+        doc["cards"][format(kc.card_id(entry), "X")] = entry
+
+    now = time.time()
+    for u in range(users):
+        picked = rng.sample(ids, rng.randint(queue // 2, queue * 3 // 2)
+                            + rng.randint(known // 2, known * 3 // 2))
+        reviews = picked[:rng.randint(queue // 2, queue * 3 // 2)]
+
+        known_set = kc.KnownSet()
+        for kid in picked[len(reviews):]:
+            known_set.add(kid)
+
+        schedule = {}
+        for kid in reviews:
+            sched = kc.new_schedule(now)
+            sched["due"] = now + rng.uniform(-7, 7) * 86400
+            schedule[format(kid, "X")] = sched
+
+        doc["users"][f"user{u}@example.com"] = {
+            "password": password,
+            "kanji_data": {
+                "reviews": reviews,
+                "known": known_set.encode(),
+                "schedule": schedule
+            }
+        }
+
+    return doc
+
+
+def build_fixtures(root: str, backend: str, kanji: int, users: int,
+                   queue: int, known: int, seed: int) -> dict:
+    """
+    Writes the dataset and user store under root (mirroring the
+    app's relative dummy_cache layout) and returns the dataset.
+    """
+
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, "dummy_cache"), exist_ok=True)
+
+    kanjis = make_kanji_dataset(kanji, rng)
+    with open(os.path.join(root, kc.KANJI_DATA_FP), "w",
+              encoding="utf-8") as file:
+        json.dump({"kanjis": kanjis}, file, ensure_ascii=False)
+
+    doc = make_user_doc(kanjis, users, queue, known, rng)
+    if backend == "json":
+        kc.atomic_write_json(os.path.join(root, kc.USER_DATA_FP), doc,
+                             ensure_ascii=False)
+    else:
+        store = kc.SqliteUserStore(os.path.join(root, kc.USER_DB_FP))
+        store.import_users(doc)
+        store.close()
+
+    return kanjis
+
+
+class Script:
+    """
+    Scripted answers standing in for the interactive prompts.
+    Y/N and "Press enter" prompts default to "" once it runs dry.
+    """
+
+    def __init__(self):
+        self.answers = deque()
+
+    def feed(self, *answers):
+        self.answers.extend(answers)
+
+    def next(self, default=None):
+        if self.answers:
+            return self.answers.popleft()
+        if default is None:
+            raise RuntimeError("Benchmark script ran out of answers")
+        return default
+
+
+class ScriptedPrompt:
+    def __init__(self, script: Script, validate=None):
+        self.script = script
+        self.validate = validate
+
+    def ask(self):
+        answer = self.script.next()
+
+        # Run validators too: they are part of the real cost.
+        if self.validate is not None:
+            res = self.validate(answer)
+            assert res is True, res
+
+        return answer
+
+
+def patch_prompts(script: Script):
+    """
+    Replaces questionary, gui and console.input with the script,
+    and sends all rendering to /dev/null.
+    """
+
+    class Questionary:
+        @staticmethod
+        def text(message, validate=None, **kwargs):
+            return ScriptedPrompt(script, validate)
+
+        password = text
+
+    def gui(options, title="Select an Option:"):
+
+        # Paged results: never ask for more.
+        if title == "Show more?":
+            return "No"
+        return script.next()
+
+    kc.questionary = Questionary
+    kc.gui = gui
+    kc.console = Console(file=open(os.devnull, "w", encoding="utf-8"),
+                         width=120)
+    kc.console.input = lambda prompt="", **kwargs: script.next("")
+
+
+def summarize(samples: list) -> dict:
+    """
+    Returns timing stats (ms) for a list of per-op durations (s).
+    """
+
+    ms = sorted(s * 1000 for s in samples)
+    cuts = (statistics.quantiles(ms, n=100, method="inclusive")
+            if len(ms) > 1 else [ms[0]] * 99)
+
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": cuts[49],
+        "p95_ms": cuts[94],
+        "min_ms": ms[0],
+        "max_ms": ms[-1],
+        "ops_per_sec": len(ms) / (sum(ms) / 1000) if sum(ms) else None
+    }
+
+
+def timed(fn, n: int) -> list:
+    samples = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_benchmarks(kanjis: dict, users: int, iterations: int,
+                   slow_iterations: int, rng: random.Random) -> dict:
+    """
+    Times the hot paths against the fixtures in the current
+    directory. Returns {bench name: timing stats}.
+    """
+
+    script = Script()
+    patch_prompts(script)
+
+    results = {}
+    email = "user0@example.com"
+    kc.update_session_email(email)
+
+    def record(name: str, samples: list):
+        results[name] = summarize(samples)
+        console.print(f"  {name:<22} p50 {results[name]['p50_ms']:9.3f} ms"
+                      f"   p95 {results[name]['p95_ms']:9.3f} ms")
+
+    # English search: cold index build, raw queries, whole page.
+    queries = [rng.choice(WORDS)[:rng.randint(2, 6)]
+               for _ in range(iterations)]
+
+    def build_index(i):
+        os.remove(kc.search_index_path(kc.KANJI_DATA_FP))
+        kc._search_index = None
+        kc.get_search_index(kc.KANJI_DATA_FP)
+
+    kc.get_search_index(kc.KANJI_DATA_FP)
+    record("search_index_build", timed(build_index, slow_iterations))
+
+    index = kc.get_search_index(kc.KANJI_DATA_FP)
+    record("search_query", timed(lambda i: index.search(queries[i]),
+                                 iterations))
+
+    def search_page(i):
+        script.feed("English to Kanji", queries[i], "")
+        kc.kanji_search()
+
+    record("search_page", timed(search_page, iterations))
+
+    # Random pick: sampler cursor, and the page declining to add.
+    sampler = kc.get_kanji_sampler(kc.KANJI_DATA_FP)
+    record("random_pick", timed(lambda i: sampler.cursor().next(),
+                                iterations))
+
+    def random_page(i):
+        script.feed("Generate Random Kanji", "n")
+        kc.kanji_wildcard_search()
+
+    record("random_page", timed(random_page, iterations))
+
+    # Add/remove toggle on kanji the user does not know yet.
+    store = kc.get_user_store()
+    toggles = [entry for entry in kanjis.values()
+               if not store.has_card(email, "known", entry)][:iterations]
+
+    def add_remove(i):
+
+        # Add: "Add?" -> y. Remove: "Already queued" -> enter, then y.
+        script.feed("y") if i % 2 == 0 else script.feed("", "y")
+        kc.add_remove_kanji_to_db(toggles[i // 2], "search")
+
+    record("add_remove_kanji", timed(add_remove, len(toggles) * 2))
+
+    # Review ratings through the checkpointed session.
+    session = kc.get_review_session(email)
+    ratings = ["again", "hard", "good", "easy"]
+
+    def rate(i):
+        kid = session.due.next_due(float("inf"))
+        session.rate(kid, ratings[i % 4])
+
+    def rate_commit(i):
+        rate(i)
+        session.commit()
+
+    record("review_rate", timed(rate, iterations))
+    record("review_commit", timed(rate_commit, iterations))
+    kc.end_review_session()
+
+    # Register + login at the host's calibrated bcrypt cost.
+    def register(i):
+        script.feed(f"bench{i}@example.com", BENCH_PASSWORD, BENCH_PASSWORD)
+        kc.register_user()
+
+    def login(i):
+        script.feed(f"bench{i}@example.com", BENCH_PASSWORD)
+        assert kc.login_user() == "dashboard"
+
+    record("register", timed(register, slow_iterations))
+    record("login", timed(login, slow_iterations))
+
+    # Dashboard for a user drawn from across the whole store.
+    emails = [f"user{rng.randrange(users)}@example.com"
+              for _ in range(iterations)]
+
+    def dashboard(i):
+        kc.update_session_email(emails[i])
+        script.feed("dashboard")
+        kc.dashboard()
+
+    record("dashboard", timed(dashboard, iterations))
+    kc.update_session_email(None)
+
+    return results
+
+
+@app.command()
+def run(backend: str = "sqlite",
+        kanji: int = FIXTURE_KANJI,
+        users: int = FIXTURE_USERS,
+        queue: int = FIXTURE_QUEUE,
+        known: int = FIXTURE_KNOWN,
+        iterations: int = 200,
+        slow_iterations: int = 5,
+        seed: int = 0,
+        out: str = None):
+    """
+    Builds synthetic fixtures, times the hot paths and saves the
+    results as JSON (default: bench_results/<timestamp>.json).
+    """
+
+    rng = random.Random(seed)
+    out = os.path.abspath(out or os.path.join(
+        RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json"))
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as root:
+        console.print(f"Building fixtures: {kanji} kanji, {users} users "
+                      f"({backend})...")
+        start = time.perf_counter()
+        kanjis = build_fixtures(root, backend, kanji, users, queue, known,
+                                seed)
+        fixture_secs = time.perf_counter() - start
+
+        # The app uses relative paths: run it inside the fixture tree.
+        os.chdir(root)
+        kc.USER_STORE_BACKEND = backend
+        kc._user_store = None
+        try:
+            results = run_benchmarks(kanjis, users, iterations,
+                                     slow_iterations, rng)
+        finally:
+            if kc._user_store is not None and backend != "json":
+                kc._user_store.close()
+            kc._user_store = None
+            os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": backend,
+            "kanji": kanji,
+            "users": users,
+            "queue": queue,
+            "known": known,
+            "seed": seed,
+            "bcrypt_cost": kc.bcrypt_cost(),
+            "fixture_secs": fixture_secs
+        },
+        "results": results
+    }
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=4)
+
+    console.print(f"Saved results to {out}")
+
+
+@app.command()
+def compare(base: str, new: str):
+    """
+    Compares two saved runs (p50 / p95 per benchmark).
+    """
+
+    with open(base, "r", encoding="utf-8") as file:
+        a = json.load(file)["results"]
+    with open(new, "r", encoding="utf-8") as file:
+        b = json.load(file)["results"]
+
+    table = Table("Benchmark", "p50 base", "p50 new", "Change",
+                  "p95 base", "p95 new", title="Benchmark Comparison")
+
+    for name in a:
+        if name not in b:
+            continue
+
+        change = b[name]["p50_ms"] / a[name]["p50_ms"] - 1
+        color = "red" if change > 0.05 else "green" if change < -0.05 else ""
+        table.add_row(name,
+                      f"{a[name]['p50_ms']:.3f}", f"{b[name]['p50_ms']:.3f}",
+                      f"[{color}]{change:+.1%}[/{color}]" if color
+                      else f"{change:+.1%}",
+                      f"{a[name]['p95_ms']:.3f}", f"{b[name]['p95_ms']:.3f}")
+
+    console.print(table)
+
+
+if __name__ == '__main__':
+    app()
@@ -1,30 +1,232 @@
-import urllib.request
-import questionary
-import platform
-import requests
-import zipfile
+import importlib.util
+import urllib.parse
+import threading
 import random
-import bcrypt
+import heapq
 import typer
 import json
+import time
+import sys
 import os
 
 
-from email_validator import validate_email, EmailNotValidError
-from password_validator import PasswordValidator
 from rich.console import Console
+from rich.segment import Segments
 from rich.console import Group
 from rich.table import Table
 from rich.panel import Panel
 from rich.align import Align
 from rich.text import Text
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
 from typing import List
 
 
+def lazy_import(name: str):
+    """
+    Returns a module that is only executed on first attribute
+    access, keeping page-specific dependencies off startup.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
+
+
+# Heavy dependencies, loaded by the pages that need them.
+questionary = lazy_import("questionary")
+requests = lazy_import("requests")
+zipfile = lazy_import("zipfile")
+bcrypt = lazy_import("bcrypt")
+email_validator = lazy_import("email_validator")
+
+# Standard modules only some backends and commands use.
+tracemalloc = lazy_import("tracemalloc")
+tempfile = lazy_import("tempfile")
+sqlite3 = lazy_import("sqlite3")
+hashlib = lazy_import("hashlib")
+base64 = lazy_import("base64")
+zlib = lazy_import("zlib")
+
+
 # Typer Interface
 console = Console()
 app = typer.Typer()
 
+# Local data paths.
+USER_DATA_FP = "dummy_cache/user_dummy_data.json"
+USER_DB_FP = "dummy_cache/user_data.db"
+KANJI_DATA_FP = "dummy_cache/kanji_dummy_data.json"
+KAPI_CACHE_DIR = "kanjiapi_cache"
+KAPI_DATA_FP = os.path.join(KAPI_CACHE_DIR, "kanjiapi_full.json")
+LOOKUP_CACHE_DIR = "dummy_cache/lookup_cache"
+
+# Kanji Lookup API and response caching (seconds).
+KAPI_BASE_URL = os.environ.get("KANJI_CROW_API_URL",
+                               "https://kanjiapi.dev/v1")
+LOOKUP_TTL = 7 * 24 * 60 * 60
+LOOKUP_NEGATIVE_TTL = 24 * 60 * 60
+LOOKUP_TIMEOUT = 5
+
+# Review session checkpoints (ratings / seconds between commits).
+REVIEW_CHECKPOINT = int(os.environ.get("KANJI_CROW_REVIEW_CHECKPOINT", 10))
+REVIEW_CHECKPOINT_SECS = 60
+
+# Search results shown per page; searches kept open for paging.
+SEARCH_PAGE_SIZE = int(os.environ.get("KANJI_CROW_PAGE_SIZE", 3))
+SEARCH_CURSORS = 32
+
+# bcrypt work factor: calibrated per host to a target hash time.
+BCRYPT_TARGET_MS = int(os.environ.get("KANJI_CROW_BCRYPT_TARGET_MS", 250))
+BCRYPT_MIN_COST = 10
+BCRYPT_MAX_COST = 16
+BCRYPT_SAMPLES = 5
+
+# KanjiAPI full dataset download.
+KAPI_ZIP_URL = "https://kanjiapi.dev/kanjiapi_full.zip"
+KAPI_ZIP_SHA256 = os.environ.get("KANJI_CROW_ZIP_SHA256")
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# User store backend ('sqlite', 'json' or 'service').
+USER_STORE_BACKEND = os.environ.get("KANJI_CROW_USER_STORE", "sqlite")
+
+# Local user service: Unix socket path or host:port, write-behind delay.
+USER_SERVICE_ADDR = os.environ.get(
+    "KANJI_CROW_USER_SERVICE",
+    "127.0.0.1:8765" if os.name == "nt" else "dummy_cache/user_service.sock")
+USER_SERVICE_FLUSH_SECS = 1.0
+
+# Store the user service serves: the configured one, never itself.
+USER_SERVICE_BACKEND = ("sqlite" if USER_STORE_BACKEND == "service"
+                        else USER_STORE_BACKEND)
+
+# Search/random/lookup backend ('local' or 'service').
+QUERY_BACKEND = os.environ.get("KANJI_CROW_QUERIES", "local")
+
+# Query service: address, batch size/window (s), hot-query cache size.
+QUERY_SERVICE_ADDR = os.environ.get(
+    "KANJI_CROW_QUERY_SERVICE",
+    "127.0.0.1:8766" if os.name == "nt" else "dummy_cache/query_service.sock")
+QUERY_BATCH_SIZE = 64
+QUERY_BATCH_WINDOW = 0.0
+QUERY_CACHE_SIZE = 1024
+
+
+class Tracer:
+    """
+    Writes timing spans as JSON lines (one object per span).
+
+    Each span records wall and CPU time, the net change in traced
+    memory (tracemalloc) and any attributes the block adds, such as
+    bytes read or written. CPU time excludes time spent waiting
+    on prompts or the network.
+    """
+
+    def __init__(self, fp: str):
+        self.fp = fp
+        self.file = open(fp, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # Leave tracemalloc running if someone else started it.
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start()
+
+    def stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self.file.close()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+
+_tracer = None
+
+
+def start_tracing(fp: str) -> Tracer:
+    global _tracer
+    _tracer = Tracer(fp)
+    return _tracer
+
+
+def stop_tracing():
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+
+
+@contextmanager
+def trace_span(name: str):
+    """
+    Times the enclosed block as a named span when tracing is on
+    (--trace). Yields a dict the block may add attributes to.
+    """
+
+    attrs = {}
+    tracer = _tracer
+    if tracer is None:
+        yield attrs
+        return
+
+    stack = tracer.stack()
+    parent = stack[-1] if stack else None
+    stack.append(name)
+
+    start = time.time()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    mem = tracemalloc.get_traced_memory()[0]
+    try:
+        yield attrs
+    finally:
+        stack.pop()
+        tracer.write({
+            "name": name,
+            "parent": parent,
+            "start": start,
+            "ms": (time.perf_counter() - wall) * 1000,
+            "cpu_ms": (time.process_time() - cpu) * 1000,
+            "mem_delta_bytes": tracemalloc.get_traced_memory()[0] - mem,
+            **attrs
+        })
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Returns the q-th percentile (0-100) of sorted values,
+    interpolating between the closest ranks.
+    """
+
+    if not values:
+        return 0.0
+
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
 
 def update_session_email(email):
     global session_email
@@ -36,21 +238,36 @@ def clear_terminal():
     Clears user terminal/CMD window.
     """
 
-    # Get user OS.
-    user_os = platform.system()
+    # ANSI clear + cursor home, written in-process (no-op when piped).
+    console.clear()
 
-    # Use os-specific command.
-    if user_os == 'Darwin':
-        os.system('clear')
-    else:
-        os.system('cls')
+
+# Static renders (banners, nav bars) keyed by (content, width).
+_render_cache = {}
+
+
+def print_static(key, build):
+    """
+    Prints a static renderable centered, rendering it to segments
+    only once per terminal width. build() makes the renderable.
+    """
+
+    key = (key, console.width)
+    segments = _render_cache.get(key)
+    if segments is None:
+        with trace_span("render.static"):
+            options = console.options.update(justify="center")
+            segments = list(console.render(build(), options))
+        _render_cache[key] = segments
+
+    console.print(Segments(segments))
 
 
 def page_banner(banner: str):
     """
     Draws page panner on terminal/CMD window.
     """
-    console.print(banner, justify="center")
+    print_static(banner, lambda: console.render_str(banner))
 
 
 def success_msg(panel_msg: str):
@@ -78,78 +295,73 @@ def nav_bar(curr_pg):
     Draws navigation bar panel on terminal/CMD window.
     """
 
-    # List of all valid pages.
-    page_list = ["Dashboard",
-                 "Review",
-                 "Search",
-                 "Random",
-                 "Help",
-                 "Logout"]
+    def build():
 
-    nav_text = Text()
+        # List of all valid pages.
+        page_list = ["Dashboard",
+                     "Review",
+                     "Search",
+                     "Random",
+                     "Help",
+                     "Logout"]
 
-    # Build rich text for nav bar.
-    for i, pg in enumerate(page_list):
+        nav_text = Text()
 
-        # Highlight current page.
-        color = "blue" if pg.lower() == curr_pg.lower() else "green"
-        nav_text.append(pg, style=color)
+        # Build rich text for nav bar.
+        for i, pg in enumerate(page_list):
 
-        if i < len(page_list) - 1:
-            nav_text.append(" | ")
+            # Highlight current page.
+            color = "blue" if pg.lower() == curr_pg.lower() else "green"
+            nav_text.append(pg, style=color)
 
-    # Draw nav bar:
-    panel = Panel(nav_text)
-    console.print(panel, justify="center")
+            if i < len(page_list) - 1:
+                nav_text.append(" | ")
+
+        return Align.center(Panel(nav_text))
+
+    # Draw nav bar (one render per page and terminal width):
+    print_static(("nav", curr_pg.lower()), build)
     console.print()
 
 
 def navigate_to_page(prompt, curr_pg=None):
     """
-    Allows for quick navigation
-    between Kanji Crow's pages.
+    Allows for quick navigation between Kanji Crow's
+    pages. Returns the route of the page to show next.
     """
 
-    prompt = prompt.lower()
+    prompt = (prompt or "").lower()
+
+    if prompt in ['dashboard', 'review', 'search', 'random', 'help']:
+        return prompt
 
-    if prompt == 'dashboard':
-        dashboard()
-    elif prompt == 'review':
-        kanji_reviewer()
-    elif prompt == 'search':
-        kanji_search()
-    elif prompt == 'random':
-        kanji_wildcard_search()
-    elif prompt == 'help':
-        user_help()
     elif prompt == 'logout':
         console.print()
         console.print("Are you sure?", style="red")
         input = console.input(prompt="[Y/N]: ")
 
         if input in ["Yes", "yes", "Y", "y"]:
+            end_review_session()
             update_session_email(None)
-            welcome_menu()
+            return "welcome"
 
         elif input in ["No", "no", "N", "n"]:
-            navigate_to_page(curr_pg)
+            return curr_pg
 
     failure_msg("Invalid Input")
-    navigate_to_page(curr_pg)
+    return curr_pg
 
 
 def add_remove_kanji_to_db(kanji_obj, curr_page):
     """
     Adds/Removes kanji from a user's review queue / list of known kanji.
+    Returns curr_page so callers can navigate back to it.
     """
 
-    fp = "dummy_cache/user_dummy_data.json"
-    with open(fp, 'r', encoding='utf-8') as kapi:
-        ud = json.load(kapi)
-
+    store = get_user_store()
     curr_user = session_email
 
-    if kanji_obj in ud[curr_user]["kanji_data"]["known"]:
+    if store.has_card(curr_user, "known", kanji_obj):
         failure_msg("This kanji is marked as known!")
         console.print()
         console.print("[red]Remove[/red] Kanji from known kanji list?")
@@ -157,10 +369,7 @@ def add_remove_kanji_to_db(kanji_obj, curr_page):
 
         if input in ["Yes", "yes", "Y", "y"]:
 
-            ud[curr_user]["kanji_data"]["known"].remove(kanji_obj)
-
-            with open(fp, 'w', encoding='utf-8') as usdb:
-                json.dump(ud, usdb, ensure_ascii=False, indent=4)
+            store.remove_card(curr_user, "known", kanji_obj)
 
             removed_kanji = kanji_obj["kanji"]
             success_msg(f"{removed_kanji} Removed Successfully")
@@ -172,39 +381,24 @@ def add_remove_kanji_to_db(kanji_obj, curr_page):
 
             if input in ["Yes", "yes", "Y", "y"]:
 
-                ud[curr_user]["kanji_data"]["reviews"].append(kanji_obj)
-
-                with open(fp, 'w', encoding='utf-8') as usdb:
-                    json.dump(ud, usdb, ensure_ascii=False, indent=4)
+                store.add_card(curr_user, "reviews", kanji_obj)
 
                 added_kanji = kanji_obj["kanji"]
                 success_msg(f"{added_kanji} Added Successfully")
-                navigate_to_page(curr_page)
-
-            elif input in ["No", "no", "N", "n"]:
-                navigate_to_page(curr_page)
 
-        elif input in ["No", "no", "N", "n"]:
-            navigate_to_page(curr_page)
+        return curr_page
 
-    if kanji_obj not in ud[curr_user]["kanji_data"]["reviews"]:
+    if not store.has_card(curr_user, "reviews", kanji_obj):
 
         console.print("Add Kanji to [green]Review Queue[/green]?")
         input = console.input(prompt="[Y/N]: ",)
 
         if input in ["Yes", "yes", "Y", "y"]:
 
-            ud[curr_user]["kanji_data"]["reviews"].append(kanji_obj)
-
-            with open(fp, 'w', encoding='utf-8') as usdb:
-                json.dump(ud, usdb, ensure_ascii=False, indent=4)
+            store.add_card(curr_user, "reviews", kanji_obj)
 
             added_kanji = kanji_obj["kanji"]
             success_msg(f"{added_kanji} Added Successfully")
-            navigate_to_page(curr_page)
-
-        elif input in ["No", "no", "N", "n"]:
-            navigate_to_page(curr_page)
 
     else:
         failure_msg("This kanji is already in your Review Queue!")
@@ -214,17 +408,12 @@ def add_remove_kanji_to_db(kanji_obj, curr_page):
 
         if input in ["Yes", "yes", "Y", "y"]:
 
-            ud[curr_user]["kanji_data"]["reviews"].remove(kanji_obj)
-
-            with open(fp, 'w', encoding='utf-8') as usdb:
-                json.dump(ud, usdb, ensure_ascii=False, indent=4)
+            store.remove_card(curr_user, "reviews", kanji_obj)
 
             removed_kanji = kanji_obj["kanji"]
             success_msg(f"{removed_kanji} Removed Successfully")
-            navigate_to_page(curr_page)
 
-        elif input in ["No", "no", "N", "n"]:
-            navigate_to_page(curr_page)
+    return curr_page
 
 
 def gui(options: List[str], title: str = "Select an Option:") -> str:
@@ -244,10 +433,174 @@ def gui(options: List[str], title: str = "Select an Option:") -> str:
     return choice
 
 
+def stream_download(url: str, dest: str, expected_sha256: str = None,
+                    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                    progress=None) -> str:
+    """
+    Streams url to dest in chunks, resuming a previous partial
+    download with an HTTP Range request when possible.
+
+    Returns the sha256 of the completed file. Raises ValueError
+    if it does not match expected_sha256.
+    """
+
+    part = dest + ".part"
+    etag_fp = part + ".etag"
+
+    dir = os.path.dirname(dest)
+    if dir and not os.path.exists(dir):
+        os.makedirs(dir)
+
+    # Resume from an existing partial file.
+    headers = {}
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset and os.path.exists(etag_fp):
+        with open(etag_fp, "r", encoding="utf-8") as file:
+            headers["If-Range"] = file.read()
+        headers["Range"] = f"bytes={offset}-"
+    else:
+        offset = 0
+
+    with requests.get(url, headers=headers, stream=True,
+                      timeout=LOOKUP_TIMEOUT) as response:
+
+        # Nothing past the offset: an earlier run got every byte
+        # but stopped before verifying.
+        if response.status_code == 416 and offset:
+            size = response.headers.get("Content-Range", "")
+            size = size.rpartition("/")[2]
+            if size.isdigit() and int(size) != offset:
+                discard_partial(part)
+                raise ValueError(f"Partial download of {url} does not "
+                                 f"match its size ({size} bytes)")
+        else:
+            receive_download(response, part, offset, chunk_size, progress)
+
+    # Verify the completed file.
+    digest = hashlib.sha256()
+    with open(part, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    digest = digest.hexdigest()
+
+    # A bad partial file must not be resumed from next time.
+    if expected_sha256 and digest != expected_sha256.lower():
+        discard_partial(part)
+        raise ValueError(f"Checksum mismatch for {url}: {digest}")
+
+    os.replace(part, dest)
+    if os.path.exists(etag_fp):
+        os.remove(etag_fp)
+
+    return digest
+
+
+def receive_download(response, part: str, offset: int,
+                     chunk_size: int, progress=None):
+    """
+    Writes a download response to the .part file: appended after
+    offset for a 206 (range) response, from scratch otherwise.
+    """
+
+    response.raise_for_status()
+
+    # Server ignored the range (or the file changed): start over.
+    if response.status_code != 206:
+        offset = 0
+
+    if response.headers.get("ETag"):
+        with open(part + ".etag", "w", encoding="utf-8") as file:
+            file.write(response.headers["ETag"])
+
+    total = response.headers.get("Content-Length")
+    total = int(total) + offset if total else None
+
+    task = None
+    if progress is not None:
+        task = progress.add_task("Downloading", total=total,
+                                 completed=offset)
+
+    with open(part, "ab" if offset else "wb") as out:
+        for chunk in response.iter_content(chunk_size):
+            out.write(chunk)
+            if task is not None:
+                progress.update(task, advance=len(chunk))
+
+
+def discard_partial(part: str):
+    """
+    Removes a .part file and its saved ETag.
+    """
+
+    for fp in (part, part + ".etag"):
+        if os.path.exists(fp):
+            os.remove(fp)
+
+
+def iter_zip_kanji(zf: "zipfile.ZipFile"):
+    """
+    Yields (kanji, entry) pairs from a KanjiAPI archive. Only kanji
+    members are decompressed; words and readings are skipped.
+
+    Per-kanji members are decoded one at a time, but a single-file
+    member ({"kanjis": {...}}) is decoded whole, so peak memory is
+    the size of that member's parsed JSON.
+    """
+
+    for info in zf.infolist():
+        if info.is_dir() or not info.filename.endswith(".json"):
+            continue
+
+        parts = info.filename.split("/")
+
+        # Per-kanji layout: .../kanji/<char>.json
+        if len(parts) > 1 and parts[-2] == "kanji":
+            with zf.open(info) as member:
+                entry = json.load(member)
+            yield entry["kanji"], entry
+
+        # Single-file layout: {"kanjis": {...}, ...}
+        elif not ({"words", "reading", "readings"} & set(parts[:-1])):
+            with zf.open(info) as member:
+                data = json.load(member)
+            if isinstance(data, dict) and "kanjis" in data:
+                yield from data["kanjis"].items()
+
+
+def extract_kanji_dataset(zip_fp: str, dest: str = KAPI_DATA_FP) -> int:
+    """
+    Streams the kanji entries of a KanjiAPI archive into a single
+    compact dataset file (same schema as the bundled dataset).
+    Returns the number of kanji written.
+    """
+
+    count = 0
+    tmp = dest + ".tmp"
+
+    with zipfile.ZipFile(zip_fp, "r") as zf:
+        if zf.testzip() is not None:
+            raise ValueError(f"Corrupt archive: {zip_fp}")
+
+        with open(tmp, "w", encoding="utf-8") as out:
+            out.write('{"kanjis": {')
+            for kanji, entry in iter_zip_kanji(zf):
+                if count:
+                    out.write(",")
+                out.write(json.dumps(kanji, ensure_ascii=False) + ":")
+                out.write(json.dumps(entry, ensure_ascii=False,
+                                     separators=(",", ":")))
+                count += 1
+            out.write("}}")
+
+    os.replace(tmp, dest)
+    return count
+
+
 def download_kapi_data(curr_page: str):
     """
-    Downloads and unzips a copy of the
-    KanjiAPI for use with search features.
+    Downloads a copy of the KanjiAPI
+    for use with search features.
+    Returns curr_page to navigate back to.
 
     SRC: https://kanjiapi.dev/#!/
     """
@@ -264,776 +617,4829 @@ def download_kapi_data(curr_page: str):
     # Download API cache:
     if choice == 'Yes':
 
-        dir = os.path.dirname("kanjiapi_full.zip")
-        if dir and not os.path.exists(dir):
-            os.makedirs(dir)
-        url = 'https://kanjiapi.dev/kanjiapi_full.zip'
-        urllib.request.urlretrieve(url, "kanjiapi_full.zip")
+        zip_fp = os.path.join(KAPI_CACHE_DIR, "kanjiapi_full.zip")
 
-        with zipfile.ZipFile("kanjiapi_full.zip", 'r') as zf:
-            zf.extractall("kanjiapi_cache")
+        from rich.progress import (Progress, BarColumn, DownloadColumn,
+                                   TextColumn, TransferSpeedColumn)
 
-        os.remove("kanjiapi_full.zip")
+        # Stream (and resume) the archive with a progress bar.
+        columns = (TextColumn("{task.description}"), BarColumn(),
+                   DownloadColumn(), TransferSpeedColumn())
+        try:
+            with Progress(*columns, console=console) as progress:
+                stream_download(KAPI_ZIP_URL, zip_fp,
+                                expected_sha256=KAPI_ZIP_SHA256,
+                                progress=progress)
+        except (requests.RequestException, ValueError) as e:
+            failure_msg(f"Download failed: {e}")
+            return curr_page
 
-        navigate_to_page(curr_page)
+        # Keep only the kanji entries, in one compact file.
+        count = extract_kanji_dataset(zip_fp, KAPI_DATA_FP)
+        os.remove(zip_fp)
 
-    elif choice == 'No':
-        navigate_to_page(curr_page)
+        success_msg(f"Downloaded {count} kanji")
 
+    return curr_page
 
 
-@app.command()
-def welcome_menu():
+# Character classes usable in validation rules.
+CHAR_CLASSES = {
+    "uppercase": lambda ch: ch != ch.lower(),
+    "lowercase": lambda ch: ch != ch.upper(),
+    "digits": str.isdecimal,
+    "letters": lambda ch: ch.isascii() and ch.isalpha(),
+    "spaces": str.isspace,
+    "at": lambda ch: ch == "@",
+}
+
+
+class ValidationEngine:
     """
-    Kanji Crow Welcome Menu. Allows users to
-    login, register, or exit from the service.
+    Validates form input against a rule set compiled once.
+
+    Rules are (kind, arg, message) tuples, checked in order:
+      ("min", n, msg) / ("max", n, msg)  - length bounds
+      ("has", cls, msg) / ("no", cls, msg) - CHAR_CLASSES presence
+      ("check", fn, None) - fn(value) returns True or a message
+    Character classes are collected in a single pass over the
+    input, and results for repeated inputs are memoized, so
+    questionary can call this on every keystroke.
     """
 
-    # Kanji Crow's ASCII Logo.
-    kc_logo = """[bold blue]
-    ██╗  ██╗ █████╗ ███╗   ██╗     ██╗██╗     ██████╗██████╗  ██████╗ ██╗    ██╗
-    ██║ ██╔╝██╔══██╗████╗  ██║     ██║██║    ██╔════╝██╔══██╗██╔═══██╗██║    ██║
-    █████╔╝ ███████║██╔██╗ ██║     ██║██║    ██║     ██████╔╝██║   ██║██║ █╗ ██║
-    ██╔═██╗ ██╔══██║██║╚██╗██║██   ██║██║    ██║     ██╔══██╗██║   ██║██║███╗██║
-    ██║  ██╗██║  ██║██║ ╚████║╚█████╔╝██║    ╚██████╗██║  ██║╚██████╔╝╚███╔███╔╝
-    ╚═╝  ╚═╝╚═╝  ╚═╝╚═╝  ╚═══╝ ╚════╝ ╚═╝     ╚═════╝╚═╝  ╚═╝ ╚═════╝  ╚══╝╚══╝
-    [/bold blue]"""
+    def __init__(self, rules: list, cache_size: int = 1024):
+        self.rules = rules
+        self._classes = [(name, CHAR_CLASSES[name]) for name in
+                         dict.fromkeys(arg for kind, arg, _ in rules
+                                       if kind in ("has", "no"))]
+        self.validate = lru_cache(maxsize=cache_size)(self._validate)
+
+    def _validate(self, value: str):
+        # Single pass: which character classes appear?
+        present = set()
+        for ch in value:
+            for name, test in self._classes:
+                if name not in present and test(ch):
+                    present.add(name)
+
+        # First failing rule wins.
+        for kind, arg, message in self.rules:
+            if kind == "min" and len(value) < arg:
+                return message
+            if kind == "max" and len(value) > arg:
+                return message
+            if kind == "has" and arg not in present:
+                return message
+            if kind == "no" and arg in present:
+                return message
+            if kind == "check":
+                result = arg(value)
+                if result is not True:
+                    return result
+
+        return True
+
+    def __call__(self, value: str):
+        return self.validate(value or "")
+
+
+def check_email_syntax(user_email: str):
+    """
+    Validates a user's email.
+    Ensures prefix, @, provider, ., and suffix.
+    """
 
-    # Draw banner.
-    clear_terminal()
-    page_banner(kc_logo)
+    try:
+        email_validator.validate_email(user_email, check_deliverability=False)
+        return True
+    except email_validator.EmailNotValidError as e:
+        return str(e)
+
+
+# Shared form validators (registration, login).
+EMAIL_VALIDATOR = ValidationEngine([
+    ("has", "at", "An email address must have an @-sign."),
+    ("check", check_email_syntax, None),
+])
+PASSWORD_VALIDATOR = ValidationEngine([
+    ("min", 8, "Too short! Must be >= 8."),
+    ("max", 16, "Too long! Must be <= 16."),
+    ("has", "uppercase", "Missing at least 1 uppercase char."),
+    ("has", "digits", "Missing at least 1 digit."),
+    ("no", "spaces", "Cannot contain spaces."),
+])
+LOGIN_PASSWORD_VALIDATOR = ValidationEngine([
+    ("min", 1, "Password required."),
+])
+
+
+def run_in_worker(fn, *args, message: str = "Working..."):
+    """
+    Runs fn on a background thread while a spinner keeps the
+    terminal responsive, and returns its result.
+    """
 
-    # Draw Kanji Crow's tagline text blurb.
-    tag_text = Text("Master Japanese Kanji - Search, view, and study 13k "
-                    "characters to strengthen your Japanese skills.",
-                    style="light blue")
-    console.print(tag_text, justify="center")
-    console.print()
+    global _worker
 
-    # Draw navigation options.
-    options = [
-        "Login",
-        "Register",
-        "-> Exit"]
-    choice = gui(options)
+    if _worker is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _worker = ThreadPoolExecutor(max_workers=1,
+                                     thread_name_prefix="kanji-crow")
 
-    # Call Login.
-    if choice == options[0]:
-        login_user()
+    future = _worker.submit(fn, *args)
+    with console.status(message):
+        return future.result()
 
-    # Call Registration.
-    elif choice == options[1]:
-        register_user()
 
-    # Terminate Program.
-    elif choice == options[2]:
-        console.print()
-        console.print("Are you sure?", style="red")
-        input = console.input(prompt="[Y/N]: ")
+_worker = None
 
-        # Exit and clear terminal.
-        if input in ["Yes", "yes", "Y", "y"]:
-            clear_terminal()
-            raise typer.Exit()
 
-        # Redirect to Welcome Menu.
-        elif input in ["No", "no", "N", "n"]:
-            welcome_menu()
+def time_bcrypt(cost: int, rounds: int = 1) -> float:
+    """
+    Returns the average seconds per bcrypt hash at a given cost.
+    """
 
-        else:
+    salt = bcrypt.gensalt(cost)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        bcrypt.hashpw(b"kanji-crow-benchmark", salt)
 
-            # Draw error message.
-            failure_msg("Invalid Input")
-            welcome_menu()
+    return (time.perf_counter() - start) / rounds
 
 
-@app.command()
-def register_user():
-    """
-    Allows users to register for Kanji Crow.
-    Requires a valid email and password.
+def calibrate_bcrypt_cost(target_ms: int = BCRYPT_TARGET_MS,
+                          samples: int = BCRYPT_SAMPLES) -> int:
     """
+    Picks the highest bcrypt cost whose hash time stays within
+    target_ms on this host (never below BCRYPT_MIN_COST).
 
-    clear_terminal()
-    page_banner("""[bold green]
-    ██████╗ ███████╗ ██████╗ ██╗███████╗████████╗███████╗██████╗
-    ██╔══██╗██╔════╝██╔════╝ ██║██╔════╝╚══██╔══╝██╔════╝██╔══██╗
-    ██████╔╝█████╗  ██║  ███╗██║███████╗   ██║   █████╗  ██████╔╝
-    ██╔══██╗██╔══╝  ██║   ██║██║╚════██║   ██║   ██╔══╝  ██╔══██╗
-    ██║  ██║███████╗╚██████╔╝██║███████║   ██║   ███████╗██║  ██║
-    ╚═╝  ╚═╝╚══════╝ ╚═════╝ ╚═╝╚══════╝   ╚═╝   ╚══════╝╚═╝  ╚═╝
-    [/bold green]""")
+    The median of several cheap cost-8 hashes gives an estimate
+    (each extra cost level doubles the work), which is then
+    confirmed by timing the candidate cost itself.
+    """
 
-    def validate_user_email(user_email):
-        """
-        Validates a user's email.
-        Ensures prefix, @, provider, ., and suffix.
-        """
-        try:
-            emailinfo = validate_email(user_email, check_deliverability=False)
-            normalized_email = emailinfo.normalized  # Recommended in docs.
-            return True
-        except EmailNotValidError as e:
-            return (str(e))
+    cost = 8
+    secs = percentile(sorted(time_bcrypt(cost) for _ in range(samples)), 50)
 
-    email = questionary.text(
-        "Email: ",
-        validate=validate_user_email
-    ).ask()
+    while cost < BCRYPT_MAX_COST and secs * 2 * 1000 <= target_ms:
+        secs *= 2
+        cost += 1
 
-    # Validator Schema & Ruleset:
-    pws = PasswordValidator()
-    pws.min(8)
-    pws.max(16)
-    pws.has().uppercase()
-    pws.has().digits()
-    pws.has().no().spaces()
+    # Extrapolation can be a level off on a loaded host.
+    while cost > BCRYPT_MIN_COST and time_bcrypt(cost) * 1000 > target_ms:
+        cost -= 1
 
-    def validate_user_password(user_password):
-        """
-        Validates a user's password.
-        Ensures length b/t 8 and 16,
-        1 upper, 1 digit, no spaces.
-        """
+    return max(BCRYPT_MIN_COST, cost)
 
-        # Check min length.
-        temp = PasswordValidator().min(8)
-        if not temp.validate(user_password):
-            return "Too short! Must be >= 8."
 
-        # Check max length.
-        temp = PasswordValidator().max(16)
-        if not temp.validate(user_password):
-            return "Too long! Must be <= 16."
+_bcrypt_cost = None
 
-        # Check uppercase char.
-        temp = PasswordValidator().has().uppercase()
-        if not temp.validate(user_password):
-            return "Missing at least 1 uppercase char."
 
-        # Check digit.
-        temp = PasswordValidator().has().digits()
-        if not temp.validate(user_password):
-            return "Missing at least 1 digit."
+def bcrypt_cost() -> int:
+    """
+    Returns this host's calibrated bcrypt cost (measured once).
+    """
 
-        # Check no spaces.
-        temp = PasswordValidator().has().no().spaces()
-        if not temp.validate(user_password):
-            return "Cannot contain spaces."
+    global _bcrypt_cost
 
-        return pws.validate(user_password)
+    if _bcrypt_cost is None:
+        _bcrypt_cost = calibrate_bcrypt_cost()
 
-    password = questionary.password(
-        "Password: ",
-        validate=validate_user_password
-    ).ask()
+    return _bcrypt_cost
 
-    def verify_user_password(user_password):
-        """
-        Compares user's first and second password entry.
-        Returns valid if both entries are identical.
-        """
 
-        # Check for mismatched passwords.
-        if user_password != password:
-            return "Passwords are not identical."
-        else:
-            return True
+def hash_cost(hashed_pw: str) -> int:
+    """
+    Returns the cost stored in a bcrypt hash ($2b$<cost>$...).
+    """
+    return int(hashed_pw.split("$")[2])
 
-    verify_password = questionary.password(
-        "Verify: ",
-        validate=verify_user_password
-    ).ask()
 
-    # Hash user password with bcrypt.
-    def hash_user_pw(password):
-        """
-        Salts and hashes user password using bcrypt.
-        """
+def hash_password(password) -> str:
+    """
+    Salts and hashes a password using bcrypt at the calibrated cost.
+    """
 
-        # Encode pw.
-        if isinstance(password, str):
-            password = password.encode('utf-8')
+    # Encode pw.
+    if isinstance(password, str):
+        password = password.encode('utf-8')
 
-        # Salt and return modified pw.
-        salt = bcrypt.gensalt(10)
+    # Salt and return modified pw.
+    salt = bcrypt.gensalt(bcrypt_cost())
+    with trace_span("bcrypt.hash"):
         hashed_pw = bcrypt.hashpw(password, salt)
 
-        return hashed_pw.decode('utf-8')
-
-    if password == verify_password:
+    return hashed_pw.decode('utf-8')
 
-        # Init file path & dict.
-        fp = "dummy_cache/user_dummy_data.json"
-        usdb = {}
 
-        # Open user database:
-        if os.path.exists(fp) and os.path.getsize(fp) > 0:
-            with open(fp, "r", encoding="utf-8") as file:
-                usdb = json.load(file)
+def verify_password(password: str, hashed_pw: str):
+    """
+    Checks a password against its bcrypt hash. Returns (valid,
+    new_hash), where new_hash is a re-hash at the current cost
+    if the stored one has fallen below it, else None.
+    """
 
-        # Duplicate email -> error:
-        if email in usdb:
-            failure_msg("Email already registered. Try another.")
+    with trace_span("bcrypt.verify"):
+        valid = bcrypt.checkpw(password.encode('utf-8'),
+                               hashed_pw.encode('utf-8'))
+    if not valid:
+        return False, None
 
-            # Restart registration process.
-            register_user()
+    if hash_cost(hashed_pw) < bcrypt_cost():
+        return True, hash_password(password)
 
-        # Valid email -> register user:
-        else:
+    return True, None
 
-            # Store (hashed) user data.
-            pw = hash_user_pw(password)
 
-            if os.path.exists(fp) and os.path.getsize(fp) > 0:
-                with open(fp, "r", encoding="utf-8") as file:
-                    usdb = json.load(file)
+def card_id(card: dict) -> int:
+    """
+    Returns a stable ordinal (unicode codepoint) for a kanji card.
+    """
 
-            usdb[email] = {
-                "password": pw,
-                "kanji_data": {
-                    "reviews": [],
-                    "known": []
-                }
-            }
+    # Prefer the API's unicode field, fall back to the character.
+    if card.get("unicode"):
+        return int(card["unicode"], 16)
 
-            with open(fp, "w", encoding="utf-8") as file:
-                json.dump(usdb, file, indent=4)
+    return ord(card["kanji"])
 
-            # Display success and return to welcome.
-            success_msg("Registered Successfully")
-            welcome_menu()
 
-    # TODO:
-    # Handle user data as microservice.
+# Known kanji bitmap covers U+3000..U+9FFF (CJK symbols, kana,
+# Extension A and the unified ideographs). Rarer codepoints
+# spill into a small overflow set.
+KNOWN_BASE = 0x3000
+KNOWN_BITS = 0x7000
 
 
-def login_user():
+class KnownSet:
     """
-    Allows users to login with their credentials.
-    Successful logins redirect to the dashboard.
+    Set of known kanji ids backed by a fixed-size bitmap.
+    Membership, add and remove are all O(1).
     """
 
-    clear_terminal()
-    page_banner("""[bold green]
-    ██╗      ██████╗  ██████╗ ██╗███╗   ██╗
-    ██║     ██╔═══██╗██╔════╝ ██║████╗  ██║
-    ██║     ██║   ██║██║  ███╗██║██╔██╗ ██║
-    ██║     ██║   ██║██║   ██║██║██║╚██╗██║
-    ███████╗╚██████╔╝╚██████╔╝██║██║ ╚████║
-    ╚══════╝ ╚═════╝  ╚═════╝ ╚═╝╚═╝  ╚═══╝
-    [/bold green]""")
+    def __init__(self):
+        self.bits = bytearray(KNOWN_BITS // 8)
+        self.extra = set()
+        self.count = 0
+
+    def _slot(self, kid: int):
+        off = kid - KNOWN_BASE
+        if 0 <= off < KNOWN_BITS:
+            return off >> 3, 1 << (off & 7)
+        return None
+
+    def __contains__(self, kid: int) -> bool:
+        slot = self._slot(kid)
+        if slot is None:
+            return kid in self.extra
+        return bool(self.bits[slot[0]] & slot[1])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        for i, byte in enumerate(self.bits):
+            if byte:
+                for b in range(8):
+                    if byte >> b & 1:
+                        yield KNOWN_BASE + (i << 3) + b
+        yield from sorted(self.extra)
+
+    def add(self, kid: int):
+        if kid in self:
+            return
+
+        slot = self._slot(kid)
+        if slot is None:
+            self.extra.add(kid)
+        else:
+            self.bits[slot[0]] |= slot[1]
+        self.count += 1
 
-    email = questionary.text(
-        "Email: ",
-    ).ask()
+    def discard(self, kid: int):
+        if kid not in self:
+            return
 
-    pw = questionary.password(
-        "Password: ",
-    ).ask()
+        slot = self._slot(kid)
+        if slot is None:
+            self.extra.discard(kid)
+        else:
+            self.bits[slot[0]] &= ~slot[1]
+        self.count -= 1
 
-    ud = []
-    ud.append(email)
-    ud.append(pw)
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the set as a compressed bitmap + overflow ids.
+        """
+        raw = bytes(self.bits) + b"".join(
+            kid.to_bytes(4, "big") for kid in sorted(self.extra))
+        return zlib.compress(raw)
 
-    # Init file path & dict.
-    fp = "dummy_cache/user_dummy_data.json"
-    usdb = {}
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KnownSet":
+        ks = cls()
+        if not data:
+            return ks
 
-    # Open user database:
-    if os.path.exists(fp) and os.path.getsize(fp) > 0:
-        with open(fp, "r", encoding="utf-8") as file:
-            usdb = json.load(file)
+        raw = zlib.decompress(data)
+        n = len(ks.bits)
+        ks.bits[:] = raw[:n]
+        for i in range(n, len(raw), 4):
+            ks.extra.add(int.from_bytes(raw[i:i + 4], "big"))
 
-    if email not in usdb:
-        failure_msg("No account found with this email. Please register.")
-        welcome_menu()
+        ks.count = int.from_bytes(ks.bits, "big").bit_count() + len(ks.extra)
+        return ks
 
-    else:
+    def encode(self) -> str:
+        return base64.b64encode(self.to_bytes()).decode("ascii")
 
-        hpw = usdb[email]['password']
+    @classmethod
+    def decode(cls, text: str) -> "KnownSet":
+        return cls.from_bytes(base64.b64decode(text))
 
-        if bcrypt.checkpw(pw.encode('utf-8'), hpw.encode('utf-8')):
 
-            success_msg("Login Successful")
+# SM-2 scheduling parameters.
+SM2_START_EASE = 2.5
+SM2_MIN_EASE = 1.3
+SM2_RELEARN_DELAY = 10 * 60
+SM2_QUALITY = {"again": 1, "hard": 3, "good": 4, "easy": 5}
+DAY = 24 * 60 * 60
 
-            update_session_email(email)
-            dashboard()
 
-        else:
-            failure_msg("Incorrect Password. Try again.")
+def new_schedule(now: float = None) -> dict:
+    """
+    Returns the schedule of a freshly queued card (due immediately).
+    """
 
-            welcome_menu()
+    return {
+        "ease": SM2_START_EASE,
+        "interval": 0,
+        "due": time.time() if now is None else now,
+        "reps": 0
+    }
+
+
+def sm2_schedule(sched: dict, rating: str, now: float = None) -> dict:
+    """
+    Returns a card's next schedule after a rating
+    ('again', 'hard', 'good' or 'easy') using SM-2.
+    Intervals are in days, due times are epoch seconds.
+    """
+
+    now = time.time() if now is None else now
+    q = SM2_QUALITY[rating]
+
+    ease = sched["ease"] + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)
+    ease = max(SM2_MIN_EASE, ease)
+
+    # Lapse: relearn shortly.
+    if q < 3:
+        return {"ease": ease, "interval": 0,
+                "due": now + SM2_RELEARN_DELAY, "reps": 0}
+
+    if sched["reps"] == 0:
+        interval = 1
+    elif sched["reps"] == 1:
+        interval = 6
+    elif rating == "hard":
+        interval = sched["interval"] * 1.2
+    else:
+        interval = sched["interval"] * ease
+
+    return {"ease": ease, "interval": interval,
+            "due": now + interval * DAY, "reps": sched["reps"] + 1}
+
+
+class DueIndex:
+    """
+    Per-user index of review cards ordered by due time.
+
+    Cards wait in a 'pending' heap until due, then move to a
+    'ready' heap (most overdue first). The next card is O(log n),
+    the due count is O(1) amortized, and a rating only pushes one
+    new heap entry; superseded entries are skipped lazily.
+    """
+
+    def __init__(self, schedule: dict):
+        # kanji id -> schedule dict.
+        self.schedule = dict(schedule)
+
+        self._pending = [(s["due"], kid) for kid, s in schedule.items()]
+        heapq.heapify(self._pending)
+        self._ready = []
+        self._ready_ids = set()
+
+    def __len__(self) -> int:
+        return len(self.schedule)
+
+    def __contains__(self, kid: int) -> bool:
+        return kid in self.schedule
+
+    def _advance(self, now: float):
+        while self._pending and self._pending[0][0] <= now:
+            due, kid = heapq.heappop(self._pending)
+            sched = self.schedule.get(kid)
+
+            # Stale entry (rescheduled or removed).
+            if sched is None or sched["due"] != due or kid in self._ready_ids:
+                continue
+
+            heapq.heappush(self._ready, (due, kid))
+            self._ready_ids.add(kid)
+
+    def due_count(self, now: float = None) -> int:
+        self._advance(time.time() if now is None else now)
+        return len(self._ready_ids)
+
+    def next_due(self, now: float = None):
+        """
+        Returns the most overdue card id, or None if nothing is due.
+        """
+
+        self._advance(time.time() if now is None else now)
+
+        while self._ready:
+            due, kid = self._ready[0]
+            sched = self.schedule.get(kid)
+            if kid in self._ready_ids and sched and sched["due"] == due:
+                return kid
+            heapq.heappop(self._ready)
+
+        return None
+
+    def next_due_time(self):
+        """
+        Returns when the next not-yet-due card becomes due.
+        """
+
+        while self._pending:
+            due, kid = self._pending[0]
+            sched = self.schedule.get(kid)
+            if sched and sched["due"] == due and kid not in self._ready_ids:
+                return due
+            heapq.heappop(self._pending)
+
+        return None
+
+    def update(self, kid: int, sched: dict):
+        self.schedule[kid] = sched
+        self._ready_ids.discard(kid)
+        heapq.heappush(self._pending, (sched["due"], kid))
+
+    def remove(self, kid: int):
+        self.schedule.pop(kid, None)
+        self._ready_ids.discard(kid)
+
+
+class UserStore:
+    """
+    Shared behaviour for user store backends: a per-user due
+    index cache kept in sync with review queue changes.
+    """
+
+    def due_index(self, email: str) -> DueIndex:
+        """
+        Returns the user's due index, built on first use.
+        """
+
+        if email not in self._due:
+            self._due[email] = DueIndex(self.get_schedule(email))
+        return self._due[email]
+
+    def _index_update(self, email: str, kid: int, sched):
+        index = self._due.get(email)
+        if index is None:
+            return
+        if sched is None:
+            index.remove(kid)
+        else:
+            index.update(kid, sched)
+
+    def _index_apply(self, email: str, changes: list):
+        # (kid, sched or None) pairs from _add/_remove, applied once
+        # the write that made them has landed.
+        for change in changes:
+            if change is not None:
+                self._index_update(email, *change)
+
+
+class ConcurrentUpdateError(RuntimeError):
+    """
+    Raised when a write keeps losing races with other processes.
+    """
+
+
+def atomic_write_json(fp: str, data, **kwargs):
+    """
+    Writes JSON via temp file + fsync + atomic rename, so a crash
+    leaves either the old or the new file, never a truncated one.
+    """
+    atomic_write(fp, lambda file: json.dump(data, file, **kwargs))
+
+
+def atomic_write(fp: str, write):
+    """
+    Calls write(file) on a temp text file, then fsyncs it and
+    atomically renames it over fp.
+    """
+
+    dir = os.path.dirname(os.path.abspath(fp))
+    fd, tmp = tempfile.mkstemp(dir=dir, suffix=".tmp",
+                               prefix=os.path.basename(fp) + ".")
+    try:
+        with trace_span("file.write") as span:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                write(file)
+                file.flush()
+                os.fsync(file.fileno())
+                span["bytes_written"] = file.tell()
+            span["file"] = os.path.basename(fp)
+        os.replace(tmp, fp)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    # Persist the rename itself.
+    if os.name != "nt":
+        dir_fd = os.open(dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+@contextmanager
+def file_lock(fp: str):
+    """
+    Holds an exclusive advisory lock on fp (created if missing).
+    """
+
+    with open(fp, "a+b") as lock:
+        if os.name == "nt":
+            import msvcrt
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+# Current user file layout version.
+USER_FILE_FORMAT = 2
+
+# Attempts before a conflicting JSON user file write gives up.
+JSON_WRITE_RETRIES = 50
+
+
+# Recently learned kanji kept per user (oldest dropped first).
+RECENT_LEARNED = 10
+
+
+def new_user_stats() -> dict:
+    """
+    Returns empty dashboard stats: known kanji per JLPT level and
+    grade, review queue size and the recently learned kanji ids.
+    """
+    return {"known": 0, "jlpt": {}, "grade": {}, "backlog": 0, "recent": []}
+
+
+def count_card(stats: dict, deck: str, card: dict, delta: int):
+    """
+    Applies a card entering (+1) or leaving (-1) a deck to a user's
+    stats. Callers only pass real membership changes.
+    """
+
+    if deck != "known":
+        stats["backlog"] += delta
+        return
+
+    stats["known"] += delta
+    for facet in ("jlpt", "grade"):
+        if card.get(facet) is None:
+            continue
+
+        key = str(card[facet])
+        n = stats[facet].get(key, 0) + delta
+        if n:
+            stats[facet][key] = n
+        else:
+            stats[facet].pop(key, None)
+
+    kid = card_id(card)
+    recent = stats["recent"]
+    if kid in recent:
+        recent.remove(kid)
+    if delta > 0:
+        recent.append(kid)
+        del recent[:-RECENT_LEARNED]
+
+
+def build_user_stats(known_cards, backlog: int) -> dict:
+    """
+    Computes stats from scratch (for users predating them).
+    """
+
+    stats = new_user_stats()
+    stats["backlog"] = backlog
+    for card in known_cards:
+        count_card(stats, "known", card, 1)
+    return stats
+
+
+def new_user_record(password: str) -> dict:
+    """
+    Returns an empty user record in the compact layout.
+    """
+
+    return {
+        "password": password,
+        "kanji_data": {
+            "reviews": [],
+            "known": KnownSet().encode(),
+            "schedule": {}
+        },
+        "stats": new_user_stats()
+    }
+
+
+def upgrade_user_file(usdb: dict) -> dict:
+    """
+    Converts a legacy user file (full kanji dicts per user) to the
+    compact layout. Card dicts move into a shared catalog keyed by
+    codepoint, so no data is lost.
+    """
+
+    if usdb.get("format") == USER_FILE_FORMAT:
+        return usdb
+
+    doc = {"format": USER_FILE_FORMAT, "users": {}, "cards": {}}
+
+    for email, user in usdb.items():
+        reviews, seen = [], set()
+        known = KnownSet()
+
+        for card in user["kanji_data"]["reviews"]:
+            kid = card_id(card)
+            doc["cards"].setdefault(format(kid, "X"), card)
+            if kid not in seen:
+                seen.add(kid)
+                reviews.append(kid)
+
+        for card in user["kanji_data"]["known"]:
+            kid = card_id(card)
+            doc["cards"].setdefault(format(kid, "X"), card)
+            known.add(kid)
+
+        doc["users"][email] = {
+            "password": user["password"],
+            "kanji_data": {
+                "reviews": reviews,
+                "known": known.encode()
+            }
+        }
+
+    return doc
+
+
+class JsonUserStore(UserStore):
+    """
+    User store backed by a single JSON file.
+
+    Writes are atomic (temp file + fsync + rename) and guarded by
+    an advisory lock plus a version stamp: a writer whose snapshot
+    is stale retries instead of overwriting another process's
+    update. Every write still rewrites the whole file, so this
+    backend is only suited to small setups.
+    """
+
+    def __init__(self, fp: str = USER_DATA_FP):
+        self.fp = fp
+        self.conflicts = 0
+        self._due = {}
+
+    def _load(self) -> dict:
+        usdb = {}
+        if os.path.exists(self.fp) and os.path.getsize(self.fp) > 0:
+            with trace_span("user_file.load") as span:
+                with open(self.fp, "rb") as file:
+                    raw = file.read()
+                usdb = json.loads(raw)
+                span["bytes_read"] = len(raw)
+        return upgrade_user_file(usdb)
+
+    def _dump(self, doc: dict):
+        atomic_write_json(self.fp, doc, ensure_ascii=False, indent=4)
+
+    def _update(self, mutate):
+        """
+        Applies mutate(doc) and writes the result. The file is read
+        without locking; the write only lands (under the lock) if no
+        other writer has bumped the version since, else it retries.
+        Returns mutate's result.
+        """
+
+        for attempt in range(JSON_WRITE_RETRIES):
+            doc = self._load()
+            version = doc.get("version", 0)
+            result = mutate(doc)
+
+            with file_lock(self.fp + ".lock"):
+                if self._load().get("version", 0) == version:
+                    doc["version"] = version + 1
+                    self._dump(doc)
+                    return result
+
+            # Lost the race: back off, then re-apply on fresh data.
+            self.conflicts += 1
+            time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+
+        raise ConcurrentUpdateError(
+            f"{self.fp}: gave up after {JSON_WRITE_RETRIES} conflicts")
+
+    def has_user(self, email: str) -> bool:
+        return email in self._load()["users"]
+
+    def get_password(self, email: str):
+        user = self._load()["users"].get(email)
+        return user["password"] if user else None
+
+    def create_user(self, email: str, password: str) -> bool:
+        def mutate(doc):
+            if email in doc["users"]:
+                return False
+            doc["users"][email] = new_user_record(password)
+            return True
+
+        return self._update(mutate)
+
+    def set_password(self, email: str, password: str):
+        def mutate(doc):
+            doc["users"][email]["password"] = password
+
+        self._update(mutate)
+
+    def _ids(self, doc: dict, email: str, deck: str):
+        kd = doc["users"][email]["kanji_data"]
+        if deck == "known":
+            return KnownSet.decode(kd["known"])
+        return kd["reviews"]
+
+    @staticmethod
+    def _queued(kd: dict) -> set:
+        # The reviews list only keeps queue order; membership
+        # checks go through a set built once per load.
+        return set(kd["reviews"])
+
+    def get_cards(self, email: str, deck: str) -> List[dict]:
+        doc = self._load()
+        return [doc["cards"][format(kid, "X")]
+                for kid in self._ids(doc, email, deck)]
+
+    def count_cards(self, email: str, deck: str) -> int:
+        return len(self._ids(self._load(), email, deck))
+
+    def has_card(self, email: str, deck: str, card: dict) -> bool:
+        doc = self._load()
+        if deck == "known":
+            return card_id(card) in self._ids(doc, email, deck)
+        return card_id(card) in self._queued(doc["users"][email]["kanji_data"])
+
+    def get_card(self, kid: int) -> dict:
+        return self._load()["cards"][format(kid, "X")]
+
+    def _stats(self, doc: dict, email: str) -> dict:
+        user = doc["users"][email]
+        if "stats" not in user:
+            kd = user["kanji_data"]
+            user["stats"] = build_user_stats(
+                (doc["cards"][format(kid, "X")]
+                 for kid in KnownSet.decode(kd["known"])),
+                len(kd["reviews"]))
+        return user["stats"]
+
+    def get_stats(self, email: str) -> dict:
+        user = self._load()["users"][email]
+        if "stats" in user:
+            return user["stats"]
+
+        # Legacy users have no stats yet: count once and save them.
+        return self._update(lambda doc: self._stats(doc, email))
+
+    def get_schedule(self, email: str) -> dict:
+        kd = self._load()["users"][email]["kanji_data"]
+        saved = kd.get("schedule", {})
+
+        # Cards queued before scheduling existed are due now.
+        return {kid: saved.get(format(kid, "X"), new_schedule(0))
+                for kid in kd["reviews"]}
+
+    def rate_card(self, email: str, kid: int, sched: dict):
+        def mutate(doc):
+            kd = doc["users"][email]["kanji_data"]
+            kd.setdefault("schedule", {})[format(kid, "X")] = sched
+
+        self._update(mutate)
+        self._index_update(email, kid, sched)
+
+    def commit_reviews(self, email: str, schedules: dict, known: list):
+        """
+        Applies a batch of review results with a single file write.
+        The caller's due index is expected to be up to date.
+        """
+
+        def mutate(doc):
+            stats = self._stats(doc, email)
+            kd = doc["users"][email]["kanji_data"]
+            saved = kd.setdefault("schedule", {})
+            queued = self._queued(kd)
+
+            for kid, sched in schedules.items():
+                if kid in queued:
+                    saved[format(kid, "X")] = sched
+
+            if known:
+                known_set = KnownSet.decode(kd["known"])
+                for kid in known:
+                    card = doc["cards"][format(kid, "X")]
+                    if kid in queued:
+                        queued.discard(kid)
+                        count_card(stats, "reviews", card, -1)
+                    saved.pop(format(kid, "X"), None)
+                    if kid not in known_set:
+                        known_set.add(kid)
+                        count_card(stats, "known", card, 1)
+                kd["known"] = known_set.encode()
+                kd["reviews"] = [k for k in kd["reviews"] if k in queued]
+
+        self._update(mutate)
+
+    def _add(self, doc: dict, email: str, deck: str, card: dict):
+        # Pure on doc (it may be retried); returns the due index
+        # change, if any, for the caller to apply after the write.
+        stats = self._stats(doc, email)
+        kid = card_id(card)
+        doc["cards"].setdefault(format(kid, "X"), card)
+
+        kd = doc["users"][email]["kanji_data"]
+        if deck == "known":
+            known = KnownSet.decode(kd["known"])
+            if kid not in known:
+                known.add(kid)
+                count_card(stats, deck, card, 1)
+            kd["known"] = known.encode()
+        elif kid not in self._queued(kd):
+            sched = new_schedule()
+            kd["reviews"].append(kid)
+            kd.setdefault("schedule", {})[format(kid, "X")] = sched
+            count_card(stats, deck, card, 1)
+            return kid, sched
+        return None
+
+    def _remove(self, doc: dict, email: str, deck: str, card: dict):
+        stats = self._stats(doc, email)
+        kid = card_id(card)
+        card = doc["cards"].get(format(kid, "X"), card)
+
+        kd = doc["users"][email]["kanji_data"]
+        if deck == "known":
+            known = KnownSet.decode(kd["known"])
+            if kid in known:
+                known.discard(kid)
+                count_card(stats, deck, card, -1)
+            kd["known"] = known.encode()
+        elif kid in self._queued(kd):
+            kd["reviews"].remove(kid)
+            count_card(stats, deck, card, -1)
+            kd.get("schedule", {}).pop(format(kid, "X"), None)
+            return kid, None
+        return None
+
+    def add_card(self, email: str, deck: str, card: dict):
+        change = self._update(lambda doc: self._add(doc, email, deck, card))
+        self._index_apply(email, [change])
+
+    def remove_card(self, email: str, deck: str, card: dict):
+        change = self._update(
+            lambda doc: self._remove(doc, email, deck, card))
+        self._index_apply(email, [change])
+
+    def move_card(self, email: str, src: str, dest: str, card: dict):
+        def mutate(doc):
+            return [self._remove(doc, email, src, card),
+                    self._add(doc, email, dest, card)]
+
+        self._index_apply(email, self._update(mutate))
+
+    def add_cards(self, email: str, deck: str, cards: list) -> int:
+        """
+        Adds many cards with a single file write.
+        Returns how many were not in the deck yet.
+        """
+
+        def mutate(doc):
+            stats = self._stats(doc, email)
+            kd = doc["users"][email]["kanji_data"]
+            for card in cards:
+                doc["cards"].setdefault(format(card_id(card), "X"), card)
+
+            if deck == "known":
+                known = KnownSet.decode(kd["known"])
+                before = len(known)
+                for card in cards:
+                    if card_id(card) not in known:
+                        known.add(card_id(card))
+                        count_card(stats, deck, card, 1)
+                kd["known"] = known.encode()
+                return len(known) - before
+
+            queued = self._queued(kd)
+            before = len(queued)
+            saved = kd.setdefault("schedule", {})
+            for card in cards:
+                kid = card_id(card)
+                if kid not in queued:
+                    queued.add(kid)
+                    kd["reviews"].append(kid)
+                    saved[format(kid, "X")] = new_schedule()
+                    count_card(stats, deck, card, 1)
+            return len(queued) - before
+
+        added = self._update(mutate)
+
+        # Rebuilt lazily on next use.
+        self._due.pop(email, None)
+        return added
+
+    def remove_cards(self, email: str, deck: str, cards: list) -> int:
+        """
+        Removes many cards with a single file write.
+        Returns how many were actually in the deck.
+        """
+
+        kids = {card_id(card) for card in cards}
+
+        def mutate(doc):
+            stats = self._stats(doc, email)
+            kd = doc["users"][email]["kanji_data"]
+            if deck == "known":
+                known = KnownSet.decode(kd["known"])
+                before = len(known)
+                for kid in kids:
+                    if kid in known:
+                        known.discard(kid)
+                        count_card(stats, deck,
+                                   doc["cards"][format(kid, "X")], -1)
+                kd["known"] = known.encode()
+                return before - len(known)
+
+            before = len(kd["reviews"])
+            kd["reviews"] = [kid for kid in kd["reviews"] if kid not in kids]
+            saved = kd.get("schedule", {})
+            for kid in kids:
+                saved.pop(format(kid, "X"), None)
+            stats["backlog"] -= before - len(kd["reviews"])
+            return before - len(kd["reviews"])
+
+        removed = self._update(mutate)
+        self._due.pop(email, None)
+        return removed
+
+    def iter_cards(self, email: str, deck: str):
+        yield from self.get_cards(email, deck)
+
+    def export_users(self) -> dict:
+        return self._load()
+
+
+class SqliteUserStore(UserStore):
+    """
+    User store backed by SQLite in WAL mode.
+
+    Each user is one row holding the known-kanji bitmap, review
+    queue entries are one row per card (with their schedule), and
+    kanji details are kept once in a shared catalog. Reads and
+    updates only touch the records of the user being served.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            email TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            known BLOB,
+            stats TEXT
+        );
+        CREATE TABLE IF NOT EXISTS reviews (
+            email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+            kanji_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            ease REAL NOT NULL DEFAULT 2.5,
+            interval REAL NOT NULL DEFAULT 0,
+            due REAL NOT NULL DEFAULT 0,
+            reps INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (email, kanji_id)
+        );
+        CREATE INDEX IF NOT EXISTS reviews_by_position
+            ON reviews (email, position);
+        CREATE INDEX IF NOT EXISTS reviews_by_due
+            ON reviews (email, due);
+        CREATE TABLE IF NOT EXISTS kanji_cards (
+            kanji_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    VERSION = 5
+
+    def __init__(self, fp: str = USER_DB_FP):
+        self.fp = fp
+        self._due = {}
+
+        dir = os.path.dirname(fp)
+        if dir and not os.path.exists(dir):
+            os.makedirs(dir)
+
+        self.conn = sqlite3.connect(fp, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < self.VERSION:
+            self._upgrade_schema()
+
+    def _run_script(self, script: str):
+        # executescript() commits first; run statement by statement
+        # so a script stays inside the current transaction.
+        for statement in script.split(";"):
+            if statement.strip():
+                self.conn.execute(statement)
+
+    def _upgrade_schema(self):
+        """
+        Creates or upgrades the schema in one transaction, so an
+        interrupted upgrade leaves the old schema and data intact.
+
+        Per-card rows written by the first schema (full kanji dicts)
+        move to the compact layout; review rows from the second
+        schema gain schedule columns and users from the third a stats
+        column (filled in on first use). Stores from before the meta
+        table count as already imported (see import_json_users).
+        """
+
+        # Take the write lock first; another process may have
+        # upgraded the file in the meantime.
+        self.conn.execute("BEGIN IMMEDIATE")
+        with self._transaction("upgrade_schema") as span:
+            version = self.conn.execute(
+                "PRAGMA user_version").fetchone()[0]
+            if version < self.VERSION:
+                self._upgrade_from(version)
+                self.conn.execute(f"PRAGMA user_version = {self.VERSION}")
+            span["from_version"] = version
+
+    def _upgrade_from(self, version: int):
+        if version in (2, 3, 4):
+            if version == 2:
+                self._run_script("""
+                    ALTER TABLE reviews ADD COLUMN ease REAL NOT NULL DEFAULT 2.5;
+                    ALTER TABLE reviews ADD COLUMN interval REAL NOT NULL DEFAULT 0;
+                    ALTER TABLE reviews ADD COLUMN due REAL NOT NULL DEFAULT 0;
+                    ALTER TABLE reviews ADD COLUMN reps INTEGER NOT NULL DEFAULT 0;
+                    CREATE INDEX IF NOT EXISTS reviews_by_due
+                        ON reviews (email, due);
+                """)
+            if version in (2, 3):
+                self.conn.execute("ALTER TABLE users ADD COLUMN stats TEXT")
+            self._run_script(self.SCHEMA)
+            self._set_meta("json_import", "done")
+            return
+
+        legacy = {}
+        has_cards = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'cards'").fetchone()
+
+        if has_cards:
+            for email, password in self.conn.execute(
+                    "SELECT email, password FROM users"):
+                legacy[email] = {
+                    "password": password,
+                    "kanji_data": {"reviews": [], "known": []}
+                }
+            for email, deck, data in self.conn.execute(
+                    "SELECT email, deck, data FROM cards "
+                    "ORDER BY email, deck, position"):
+                legacy[email]["kanji_data"][deck].append(json.loads(data))
+
+            self._run_script("DROP TABLE cards; DROP TABLE users;")
+
+        self._run_script(self.SCHEMA)
+
+        if has_cards:
+            self._import_users(legacy)
+
+    def _get_meta(self, key: str):
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, value))
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self, name: str):
+        """
+        Runs the block as one transaction traced as sqlite.<name>,
+        with the commit as a child span and the rows it changed.
+        """
+
+        with trace_span("sqlite." + name) as span:
+            changes = self.conn.total_changes
+            try:
+                yield span
+            except BaseException:
+                self.conn.rollback()
+                raise
+            with trace_span("sqlite.commit"):
+                self.conn.commit()
+            span["rows_written"] = self.conn.total_changes - changes
+
+    def has_user(self, email: str) -> bool:
+        with trace_span("sqlite.has_user") as span:
+            row = self.conn.execute(
+                "SELECT 1 FROM users WHERE email = ?", (email,)).fetchone()
+            span["rows_read"] = int(row is not None)
+        return row is not None
+
+    def get_password(self, email: str):
+        with trace_span("sqlite.get_password") as span:
+            row = self.conn.execute(
+                "SELECT password FROM users WHERE email = ?",
+                (email,)).fetchone()
+            span["rows_read"] = int(row is not None)
+        return row[0] if row else None
+
+    def create_user(self, email: str, password: str) -> bool:
+        with self._transaction("create_user"):
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO users (email, password, known, stats) "
+                "VALUES (?, ?, ?, ?)", (email, password, KnownSet().to_bytes(),
+                                        json.dumps(new_user_stats())))
+        return cur.rowcount == 1
+
+    def set_password(self, email: str, password: str):
+        with self._transaction("set_password"):
+            self.conn.execute(
+                "UPDATE users SET password = ? WHERE email = ?",
+                (password, email))
+
+    def _known(self, email: str) -> KnownSet:
+        row = self.conn.execute(
+            "SELECT known FROM users WHERE email = ?", (email,)).fetchone()
+        return KnownSet.from_bytes(row[0] if row else b"")
+
+    def _set_known(self, email: str, known: KnownSet):
+        self.conn.execute(
+            "UPDATE users SET known = ? WHERE email = ?",
+            (known.to_bytes(), email))
+
+    def _stats(self, email: str) -> dict:
+        row = self.conn.execute(
+            "SELECT stats FROM users WHERE email = ?", (email,)).fetchone()
+        if row and row[0]:
+            return json.loads(row[0])
+
+        # Users imported or migrated without stats: count once.
+        stats = build_user_stats(
+            (self._card(kid) for kid in self._known(email)),
+            self.count_cards(email, "reviews"))
+        self._set_stats(email, stats)
+        return stats
+
+    def _set_stats(self, email: str, stats: dict):
+        self.conn.execute(
+            "UPDATE users SET stats = ? WHERE email = ?",
+            (json.dumps(stats), email))
+
+    def get_stats(self, email: str) -> dict:
+        with self._transaction("get_stats"):
+            return self._stats(email)
+
+    def _card(self, kid: int, default: dict = None) -> dict:
+        row = self.conn.execute(
+            "SELECT data FROM kanji_cards WHERE kanji_id = ?",
+            (kid,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _catalog(self, card: dict) -> int:
+        kid = card_id(card)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO kanji_cards (kanji_id, data) "
+            "VALUES (?, ?)", (kid, json.dumps(card, ensure_ascii=False)))
+        return kid
+
+    def get_cards(self, email: str, deck: str) -> List[dict]:
+        with trace_span("sqlite.get_cards") as span:
+            if deck == "known":
+                cards = []
+                for kid in self._known(email):
+                    row = self.conn.execute(
+                        "SELECT data FROM kanji_cards WHERE kanji_id = ?",
+                        (kid,)).fetchone()
+                    cards.append(json.loads(row[0]))
+            else:
+                rows = self.conn.execute(
+                    "SELECT k.data FROM reviews r "
+                    "JOIN kanji_cards k ON k.kanji_id = r.kanji_id "
+                    "WHERE r.email = ? ORDER BY r.position", (email,))
+                cards = [json.loads(data) for (data,) in rows]
+            span["rows_read"] = len(cards)
+        return cards
+
+    def count_cards(self, email: str, deck: str) -> int:
+        if deck == "known":
+            return len(self._known(email))
+
+        with trace_span("sqlite.count_cards") as span:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM reviews WHERE email = ?",
+                (email,)).fetchone()
+            span["rows_read"] = 1
+        return row[0]
+
+    def has_card(self, email: str, deck: str, card: dict) -> bool:
+        if deck == "known":
+            return card_id(card) in self._known(email)
+
+        with trace_span("sqlite.has_card") as span:
+            row = self.conn.execute(
+                "SELECT 1 FROM reviews WHERE email = ? AND kanji_id = ?",
+                (email, card_id(card))).fetchone()
+            span["rows_read"] = int(row is not None)
+        return row is not None
+
+    def get_card(self, kid: int) -> dict:
+        with trace_span("sqlite.get_card") as span:
+            row = self.conn.execute(
+                "SELECT data FROM kanji_cards WHERE kanji_id = ?",
+                (kid,)).fetchone()
+            span["rows_read"] = 1
+        return json.loads(row[0])
+
+    def get_schedule(self, email: str) -> dict:
+        with trace_span("sqlite.get_schedule") as span:
+            rows = self.conn.execute(
+                "SELECT kanji_id, ease, interval, due, reps FROM reviews "
+                "WHERE email = ?", (email,))
+            schedule = {kid: {"ease": ease, "interval": interval,
+                              "due": due, "reps": reps}
+                        for kid, ease, interval, due, reps in rows}
+            span["rows_read"] = len(schedule)
+        return schedule
+
+    def rate_card(self, email: str, kid: int, sched: dict):
+        with self._transaction("rate_card"):
+            self.conn.execute(
+                "UPDATE reviews SET ease = ?, interval = ?, due = ?, "
+                "reps = ? WHERE email = ? AND kanji_id = ?",
+                (sched["ease"], sched["interval"], sched["due"],
+                 sched["reps"], email, kid))
+        self._index_update(email, kid, sched)
+
+    def commit_reviews(self, email: str, schedules: dict, known: list):
+        """
+        Applies a batch of review results in one transaction.
+        The caller's due index is expected to be up to date.
+        """
+
+        with self._transaction("commit_reviews"):
+            self.conn.executemany(
+                "UPDATE reviews SET ease = ?, interval = ?, due = ?, "
+                "reps = ? WHERE email = ? AND kanji_id = ?",
+                [(sched["ease"], sched["interval"], sched["due"],
+                  sched["reps"], email, kid)
+                 for kid, sched in schedules.items()])
+
+            if known:
+                stats = self._stats(email)
+                known_set = self._known(email)
+
+                for kid in known:
+                    card = self._card(kid)
+                    cur = self.conn.execute(
+                        "DELETE FROM reviews WHERE email = ? AND kanji_id = ?",
+                        (email, kid))
+                    if cur.rowcount:
+                        count_card(stats, "reviews", card, -1)
+                    if kid not in known_set:
+                        known_set.add(kid)
+                        count_card(stats, "known", card, 1)
+
+                self._set_known(email, known_set)
+                self._set_stats(email, stats)
+
+    def _add(self, email: str, deck: str, card: dict):
+        stats = self._stats(email)
+        kid = self._catalog(card)
+
+        if deck == "known":
+            known = self._known(email)
+            if kid not in known:
+                known.add(kid)
+                count_card(stats, deck, card, 1)
+                self._set_known(email, known)
+                self._set_stats(email, stats)
+        else:
+            sched = new_schedule()
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO reviews "
+                "(email, kanji_id, position, ease, interval, due, reps) "
+                "SELECT ?, ?, COALESCE(MAX(position), 0) + 1, ?, ?, ?, ? "
+                "FROM reviews WHERE email = ?",
+                (email, kid, sched["ease"], sched["interval"],
+                 sched["due"], sched["reps"], email))
+            if cur.rowcount == 1:
+                count_card(stats, deck, card, 1)
+                self._set_stats(email, stats)
+                return kid, sched
+        return None
+
+    def _remove(self, email: str, deck: str, card: dict):
+        stats = self._stats(email)
+        kid = card_id(card)
+        card = self._card(kid, card)
+
+        if deck == "known":
+            known = self._known(email)
+            if kid in known:
+                known.discard(kid)
+                count_card(stats, deck, card, -1)
+                self._set_known(email, known)
+                self._set_stats(email, stats)
+        else:
+            cur = self.conn.execute(
+                "DELETE FROM reviews WHERE email = ? AND kanji_id = ?",
+                (email, kid))
+            if cur.rowcount:
+                count_card(stats, deck, card, -1)
+                self._set_stats(email, stats)
+                return kid, None
+        return None
+
+    def add_card(self, email: str, deck: str, card: dict):
+        with self._transaction("add_card"):
+            change = self._add(email, deck, card)
+        self._index_apply(email, [change])
+
+    def remove_card(self, email: str, deck: str, card: dict):
+        with self._transaction("remove_card"):
+            change = self._remove(email, deck, card)
+        self._index_apply(email, [change])
+
+    def move_card(self, email: str, src: str, dest: str, card: dict):
+        with self._transaction("move_card"):
+            changes = [self._remove(email, src, card),
+                       self._add(email, dest, card)]
+        self._index_apply(email, changes)
+
+    def add_cards(self, email: str, deck: str, cards: list) -> int:
+        """
+        Adds many cards in one transaction.
+        Returns how many were not in the deck yet.
+        """
+
+        kids = [card_id(card) for card in cards]
+
+        with self._transaction("add_cards"):
+            stats = self._stats(email)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO kanji_cards (kanji_id, data) "
+                "VALUES (?, ?)",
+                [(kid, json.dumps(card, ensure_ascii=False))
+                 for kid, card in zip(kids, cards)])
+
+            if deck == "known":
+                known = self._known(email)
+                before = len(known)
+                for kid, card in zip(kids, cards):
+                    if kid not in known:
+                        known.add(kid)
+                        count_card(stats, deck, card, 1)
+                self._set_known(email, known)
+                self._set_stats(email, stats)
+                return len(known) - before
+
+            last = self.conn.execute(
+                "SELECT COALESCE(MAX(position), 0) FROM reviews "
+                "WHERE email = ?", (email,)).fetchone()[0]
+            sched = new_schedule()
+            cur = self.conn.executemany(
+                "INSERT OR IGNORE INTO reviews "
+                "(email, kanji_id, position, ease, interval, due, reps) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(email, kid, last + pos, sched["ease"], sched["interval"],
+                  sched["due"], sched["reps"])
+                 for pos, kid in enumerate(kids, 1)])
+
+            stats["backlog"] += cur.rowcount
+            self._set_stats(email, stats)
+
+        # Rebuilt lazily on next use.
+        self._due.pop(email, None)
+        return cur.rowcount
+
+    def remove_cards(self, email: str, deck: str, cards: list) -> int:
+        """
+        Removes many cards in one transaction.
+        Returns how many were actually in the deck.
+        """
+
+        kids = {card_id(card) for card in cards}
+
+        with self._transaction("remove_cards"):
+            stats = self._stats(email)
+            if deck == "known":
+                known = self._known(email)
+                before = len(known)
+                for kid in kids:
+                    if kid in known:
+                        known.discard(kid)
+                        count_card(stats, deck, self._card(kid), -1)
+                self._set_known(email, known)
+                self._set_stats(email, stats)
+                return before - len(known)
+
+            cur = self.conn.executemany(
+                "DELETE FROM reviews WHERE email = ? AND kanji_id = ?",
+                [(email, kid) for kid in kids])
+
+            stats["backlog"] -= cur.rowcount
+            self._set_stats(email, stats)
+
+        self._due.pop(email, None)
+        return cur.rowcount
+
+    def iter_cards(self, email: str, deck: str):
+        """
+        Yields a deck's cards straight off the cursor.
+        """
+
+        if deck == "known":
+            for kid in self._known(email):
+                yield self.get_card(kid)
+            return
+
+        rows = self.conn.execute(
+            "SELECT k.data FROM reviews r "
+            "JOIN kanji_cards k ON k.kanji_id = r.kanji_id "
+            "WHERE r.email = ? ORDER BY r.position", (email,))
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def import_users(self, usdb: dict) -> int:
+        """
+        Imports users from a JSON user file (legacy or compact
+        layout) in one transaction. Existing users are replaced.
+        """
+
+        with self._transaction("import_users"):
+            return self._import_users(usdb)
+
+    def import_json_users(self, fp: str = USER_DATA_FP) -> bool:
+        """
+        Imports a JSON user file unless this store has already had
+        users imported. The import and its record commit together,
+        so an interrupted import is retried on the next open.
+        Returns whether it ran.
+        """
+
+        if self._get_meta("json_import") is not None:
+            return False
+
+        # Take the write lock, then check again: another process
+        # may have imported in the meantime.
+        self.conn.execute("BEGIN IMMEDIATE")
+        with self._transaction("import_json_users"):
+            if self._get_meta("json_import") is not None:
+                return False
+            self._import_users(JsonUserStore(fp).export_users())
+        return True
+
+    def _import_users(self, usdb: dict) -> int:
+        # Marks the store as imported in the caller's transaction.
+        self._set_meta("json_import", "done")
+        doc = upgrade_user_file(usdb)
+
+        for key, card in doc["cards"].items():
+            self.conn.execute(
+                "INSERT OR IGNORE INTO kanji_cards (kanji_id, data) "
+                "VALUES (?, ?)",
+                (int(key, 16), json.dumps(card, ensure_ascii=False)))
+
+        for email, user in doc["users"].items():
+            kd = user["kanji_data"]
+            known = KnownSet.decode(kd["known"])
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO users (email, password, known) "
+                "VALUES (?, ?, ?)",
+                (email, user["password"], known.to_bytes()))
+            self.conn.execute(
+                "DELETE FROM reviews WHERE email = ?", (email,))
+            self._due.pop(email, None)
+
+            saved = kd.get("schedule", {})
+            rows = []
+            for pos, kid in enumerate(kd["reviews"], 1):
+                sched = saved.get(format(kid, "X"), new_schedule(0))
+                rows.append((email, kid, pos, sched["ease"],
+                             sched["interval"], sched["due"],
+                             sched["reps"]))
+
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO reviews (email, kanji_id, "
+                "position, ease, interval, due, reps) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+        return len(doc["users"])
+
+    def export_users(self) -> dict:
+        doc = {"format": USER_FILE_FORMAT, "users": {}, "cards": {}}
+
+        with trace_span("sqlite.export_users") as span:
+            for kid, data in self.conn.execute(
+                    "SELECT kanji_id, data FROM kanji_cards"):
+                doc["cards"][format(kid, "X")] = json.loads(data)
+
+            for email, password, known in self.conn.execute(
+                    "SELECT email, password, known FROM users").fetchall():
+                reviews = [kid for (kid,) in self.conn.execute(
+                    "SELECT kanji_id FROM reviews WHERE email = ? "
+                    "ORDER BY position", (email,))]
+                schedule = {format(kid, "X"): sched for kid, sched
+                            in self.get_schedule(email).items()}
+                doc["users"][email] = {
+                    "password": password,
+                    "kanji_data": {
+                        "reviews": reviews,
+                        "known": KnownSet.from_bytes(known).encode(),
+                        "schedule": schedule
+                    }
+                }
+
+            span["rows_read"] = len(doc["cards"]) + len(doc["users"])
+
+        return doc
+
+
+class MemoryUserStore(JsonUserStore):
+    """
+    JSON user store held entirely in memory, for the user service.
+
+    Reads and writes run against the resident document; the file
+    is only rewritten by flush() (write-behind). While the service
+    runs it owns the user file: changes written to it by processes
+    not going through the service are overwritten by the next flush.
+    """
+
+    def __init__(self, fp: str = USER_DATA_FP):
+        super().__init__(fp)
+        self.doc = super()._load()
+        self.dirty = False
+
+    def _load(self) -> dict:
+        return self.doc
+
+    def _update(self, mutate):
+        result = mutate(self.doc)
+        self.dirty = True
+        return result
+
+    def snapshot(self) -> str:
+        """
+        Serializes the current state and clears the dirty flag.
+        """
+
+        self.doc["version"] = self.doc.get("version", 0) + 1
+        self.dirty = False
+        return json.dumps(self.doc, ensure_ascii=False)
+
+    def persist(self, text: str):
+        with file_lock(self.fp + ".lock"):
+            atomic_write(self.fp, lambda file: file.write(text))
+
+
+# Store methods callable over the user service.
+USER_SERVICE_OPS = {
+    "has_user", "get_password", "create_user", "set_password",
+    "get_cards", "count_cards", "has_card", "get_card", "get_schedule",
+    "get_stats", "rate_card", "commit_reviews", "add_card", "remove_card",
+    "move_card", "add_cards", "remove_cards", "export_users"
+}
+
+
+# Requests/responses are one JSON line each; allow big ones.
+SERVICE_LINE_LIMIT = 64 * 1024 * 1024
+
+
+class ServiceError(RuntimeError):
+    """
+    Raised on the client when a service request fails.
+    """
+
+
+def parse_request(line: bytes):
+    """
+    Returns (id, op, args) from one request line, raising
+    ValueError unless it is a {"op", "args"} JSON object.
+    """
+
+    req = json.loads(line)
+    if (not isinstance(req, dict) or not isinstance(req.get("op"), str)
+            or not isinstance(req.get("args", []), list)):
+        raise ValueError("Malformed request")
+    return req.get("id"), req["op"], req.get("args", [])
+
+
+def parse_service_addr(addr: str):
+    """
+    Returns (host, port) for "host:port" addresses, else the
+    Unix socket path.
+    """
+
+    host, sep, port = addr.rpartition(":")
+    if sep and port.isdigit() and os.sep not in host:
+        return host, int(port)
+    return addr
+
+
+def connect_service(addr: str):
+    """
+    Opens a blocking connection to a local service.
+    """
+
+    import socket
+
+    target = parse_service_addr(addr)
+    if isinstance(target, tuple):
+        sock = socket.create_connection(target)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target)
+    return sock
+
+
+class AsyncServiceClient:
+    """
+    Asyncio counterpart of ServiceClient, for load tests.
+    """
+
+    async def connect(self, addr: str):
+        import asyncio
+
+        target = parse_service_addr(addr)
+        if isinstance(target, tuple):
+            self.reader, self.writer = await asyncio.open_connection(
+                *target, limit=SERVICE_LINE_LIMIT)
+        else:
+            self.reader, self.writer = await asyncio.open_unix_connection(
+                target, limit=SERVICE_LINE_LIMIT)
+        return self
+
+    async def call(self, op: str, *args):
+        self.writer.write(json.dumps({"op": op, "args": args},
+                                     ensure_ascii=False).encode("utf-8")
+                          + b"\n")
+        await self.writer.drain()
+
+        res = json.loads(await self.reader.readline())
+        if not res["ok"]:
+            raise ServiceError(res["error"])
+        return res["result"]
+
+    def close(self):
+        self.writer.close()
+
+
+async def start_service(handle, addr: str):
+    """
+    Starts an asyncio server for handle(reader, writer) on a
+    "host:port" or Unix socket address.
+    """
+
+    import asyncio
+
+    target = parse_service_addr(addr)
+    if isinstance(target, tuple):
+        return await asyncio.start_server(handle, *target,
+                                          limit=SERVICE_LINE_LIMIT)
+
+    # Clear a socket left behind by a previous run.
+    if os.path.exists(target):
+        os.remove(target)
+    return await asyncio.start_unix_server(handle, target,
+                                           limit=SERVICE_LINE_LIMIT)
+
+
+async def serve_until_stopped(server, addr: str):
+    """
+    Serves until Ctrl+C or SIGTERM, then removes a Unix socket.
+    """
+
+    import asyncio
+
+    if os.name != "nt":
+        import signal
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, asyncio.current_task().cancel)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        target = parse_service_addr(addr)
+        if not isinstance(target, tuple) and os.path.exists(target):
+            os.remove(target)
+
+
+class ServiceClient:
+    """
+    Persistent connection to a local service speaking one JSON
+    object per line: {"id", "op", "args"} -> {"id", "ok", ...}.
+    """
+
+    def __init__(self, addr: str):
+        self.addr = addr
+        try:
+            self.sock = connect_service(addr)
+        except OSError as err:
+            raise ServiceError(f"No service reachable at {addr} ({err})")
+        self.file = self.sock.makefile("rwb")
+        self._id = 0
+
+    def call(self, op: str, *args):
+        self._id += 1
+        req = {"id": self._id, "op": op, "args": args}
+        self.file.write(json.dumps(req, ensure_ascii=False).encode("utf-8")
+                        + b"\n")
+        self.file.flush()
+
+        line = self.file.readline()
+        if not line:
+            raise ServiceError(f"{self.addr}: connection closed")
+
+        res = json.loads(line)
+        if not res["ok"]:
+            raise ServiceError(res["error"])
+        return res["result"]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class UserServiceClient(UserStore):
+    """
+    User store that forwards every call to the user service.
+    """
+
+    def __init__(self, addr: str = None):
+        self.client = ServiceClient(addr or USER_SERVICE_ADDR)
+        self._due = {}
+
+    def __getattr__(self, op: str):
+        if op not in USER_SERVICE_OPS:
+            raise AttributeError(op)
+        return lambda *args: self.client.call(op, *args)
+
+    def get_schedule(self, email: str) -> dict:
+        # JSON object keys come back as strings.
+        return {int(kid): sched for kid, sched in
+                self.client.call("get_schedule", email).items()}
+
+    def iter_cards(self, email: str, deck: str):
+        yield from self.client.call("get_cards", email, deck)
+
+    def rate_card(self, email: str, kid: int, sched: dict):
+        self.client.call("rate_card", email, kid, sched)
+        self._index_update(email, kid, sched)
+
+    def _changed(self, op: str, email: str, *args):
+        # Queue changed server-side: rebuild the due index lazily.
+        result = self.client.call(op, email, *args)
+        self._due.pop(email, None)
+        return result
+
+    def add_card(self, email, deck, card):
+        return self._changed("add_card", email, deck, card)
+
+    def remove_card(self, email, deck, card):
+        return self._changed("remove_card", email, deck, card)
+
+    def move_card(self, email, src, dest, card):
+        return self._changed("move_card", email, src, dest, card)
+
+    def add_cards(self, email, deck, cards):
+        return self._changed("add_cards", email, deck, cards)
+
+    def remove_cards(self, email, deck, cards):
+        return self._changed("remove_cards", email, deck, cards)
+
+    def close(self):
+        self.client.close()
+
+
+class UserService:
+    """
+    Asyncio daemon that serves the configured user store (the same
+    SQLite database or JSON file a normal run uses) to any number
+    of CLI clients.
+
+    Requests run one at a time on the event loop, so writes are
+    serialized without locks or file contention. SQLite writes are
+    committed as they happen; the JSON store is held in memory and
+    written behind: at most every flush_secs, and on shutdown.
+    """
+
+    def __init__(self, backend: str = USER_SERVICE_BACKEND,
+                 fp: str = None,
+                 flush_secs: float = USER_SERVICE_FLUSH_SECS):
+        if backend == "json":
+            self.store = MemoryUserStore(fp or USER_DATA_FP)
+        elif backend == "sqlite":
+            self.store = open_user_store("sqlite", fp)
+        else:
+            raise ValueError(f"User service cannot serve '{backend}'")
+
+        self.backend = backend
+        self.fp = self.store.fp
+        self.flush_secs = flush_secs
+        self.stats = {"requests": 0, "errors": 0, "flushes": 0}
+        self._flushing = None
+
+    def dispatch(self, op: str, args: list):
+        if op not in USER_SERVICE_OPS:
+            raise ValueError(f"Unknown operation '{op}'")
+
+        if op == "commit_reviews":
+            email, schedules, known = args
+            args = [email, {int(k): v for k, v in schedules.items()}, known]
+
+        return getattr(self.store, op)(*args)
+
+    async def handle(self, reader, writer):
+        while True:
+            try:
+                line = await reader.readline()
+            except ConnectionError:
+                break
+            if not line:
+                break
+
+            self.stats["requests"] += 1
+            rid = None
+            try:
+                rid, op, args = parse_request(line)
+                res = {"id": rid, "ok": True,
+                       "result": self.dispatch(op, args)}
+            except Exception as err:
+                self.stats["errors"] += 1
+                res = {"id": rid, "ok": False,
+                       "error": f"{type(err).__name__}: {err}"}
+
+            writer.write(json.dumps(res, ensure_ascii=False).encode("utf-8")
+                         + b"\n")
+            await writer.drain()
+
+        writer.close()
+
+    async def flush(self):
+        """
+        Writes the store to disk if it changed. The snapshot is
+        taken on the loop; the file I/O runs on a worker thread.
+        """
+
+        import asyncio
+
+        # One flush at a time; a later change waits for the next.
+        if self._flushing is not None:
+            await self._flushing
+
+        if getattr(self.store, "dirty", False):
+            text = self.store.snapshot()
+            loop = asyncio.get_running_loop()
+            self._flushing = loop.run_in_executor(
+                None, self.store.persist, text)
+            try:
+                await self._flushing
+            finally:
+                self._flushing = None
+            self.stats["flushes"] += 1
+
+    async def flush_loop(self):
+        import asyncio
+
+        while True:
+            await asyncio.sleep(self.flush_secs)
+            await self.flush()
+
+    async def serve(self, addr: str = None):
+        import asyncio
+
+        addr = addr or USER_SERVICE_ADDR
+        server = await start_service(self.handle, addr)
+        flusher = asyncio.create_task(self.flush_loop())
+
+        console.print(f"User service listening on {addr} "
+                      f"({self.backend}: {self.fp})")
+        try:
+            await serve_until_stopped(server, addr)
+        finally:
+            flusher.cancel()
+            await self.flush()
+            console.print("User service stopped.")
+
+
+class ReviewSession:
+    """
+    Buffers a user's review results in memory and commits them to
+    the store in batches: every `checkpoint` ratings, at least every
+    `checkpoint_secs` seconds, and when the session ends. Each commit
+    is a single store transaction, so an interrupted session loses
+    at most one checkpoint interval.
+    """
+
+    def __init__(self, store, email: str,
+                 checkpoint: int = REVIEW_CHECKPOINT,
+                 checkpoint_secs: float = REVIEW_CHECKPOINT_SECS):
+        self.store = store
+        self.email = email
+        self.checkpoint = checkpoint
+        self.checkpoint_secs = checkpoint_secs
+
+        # Queue is loaded once per session.
+        self.due = store.due_index(email)
+
+        self._schedules = {}
+        self._known = []
+        self._last_commit = time.time()
+
+    def pending(self) -> int:
+        return len(self._schedules) + len(self._known)
+
+    def rate(self, kid: int, rating: str, now: float = None):
+        sched = sm2_schedule(self.due.schedule[kid], rating, now)
+        self.due.update(kid, sched)
+        self._schedules[kid] = sched
+        self._maybe_commit()
+
+    def mark_known(self, kid: int):
+        self.due.remove(kid)
+        self._schedules.pop(kid, None)
+        self._known.append(kid)
+        self._maybe_commit()
+
+    def _maybe_commit(self):
+        if (self.pending() >= self.checkpoint
+                or time.time() - self._last_commit >= self.checkpoint_secs):
+            self.commit()
+
+    def commit(self):
+        """
+        Writes all buffered results in one transaction.
+        """
+
+        if self.pending():
+            self.store.commit_reviews(self.email, self._schedules,
+                                      self._known)
+            self._schedules = {}
+            self._known = []
+
+        self._last_commit = time.time()
+
+
+_review_session = None
+
+
+def get_review_session(email: str) -> ReviewSession:
+    """
+    Returns the active review session for a user, starting one
+    (and committing any other user's session) as needed.
+    """
+
+    global _review_session
+
+    if _review_session is None or _review_session.email != email:
+        end_review_session()
+        _review_session = ReviewSession(get_user_store(), email)
+
+    return _review_session
+
+
+def end_review_session():
+    """
+    Commits and closes the active review session, if any.
+    """
+
+    global _review_session
+
+    if _review_session is not None:
+        _review_session.commit()
+        _review_session = None
+
+
+_user_store = None
+
+
+def get_user_store():
+    """
+    Returns the process-wide user store for the configured backend.
+    A fresh SQLite store imports any existing JSON user data.
+    """
+
+    global _user_store
+
+    if _user_store is None:
+        if USER_STORE_BACKEND == "service":
+            _user_store = UserServiceClient(USER_SERVICE_ADDR)
+        else:
+            _user_store = open_user_store(USER_STORE_BACKEND)
+
+    return _user_store
+
+
+def open_user_store(backend: str, fp: str = None):
+    """
+    Opens a local 'json' or 'sqlite' user store. A SQLite store
+    imports any existing JSON user data once.
+    """
+
+    if backend == "json":
+        return JsonUserStore(fp or USER_DATA_FP)
+
+    store = SqliteUserStore(fp or USER_DB_FP)
+    store.import_json_users(USER_DATA_FP)
+    return store
+
+
+def file_signature(fp: str) -> list:
+    """
+    Returns a cheap change signature (size, mtime) for a file.
+    """
+
+    stat = os.stat(fp)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class KanjiRepository:
+    """
+    Process-wide, lazily loaded copy of the kanji dataset.
+
+    The dataset is parsed on first use and then served from memory.
+    Changes on disk (size/mtime, confirmed by content hash) trigger
+    a reload into a fresh snapshot that is swapped in atomically, so
+    readers never wait on or observe a half-loaded dataset.
+    """
+
+    def __init__(self, fp: str = KANJI_DATA_FP):
+        self.fp = fp
+        self.stats = {"loads": 0, "hits": 0, "reloads": 0}
+        self._lock = threading.Lock()
+
+        # Snapshot: (file signature, sha256 digest, kanjis dict).
+        self._snapshot = None
+
+    def kanjis(self) -> dict:
+        """
+        Returns the current {kanji: entry} mapping.
+        """
+
+        snap = self._snapshot
+        sig = file_signature(self.fp)
+
+        if snap is not None and snap[0] == sig:
+            self.stats["hits"] += 1
+            return snap[2]
+
+        # Another reader is already reloading: keep serving the old copy.
+        if not self._lock.acquire(blocking=snap is None):
+            self.stats["hits"] += 1
+            return snap[2]
+
+        try:
+            snap = self._snapshot
+            if snap is not None and snap[0] == sig:
+                self.stats["hits"] += 1
+                return snap[2]
+
+            with trace_span("kanji_data.load") as span:
+                with open(self.fp, "rb") as kapi:
+                    raw = kapi.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                span["bytes_read"] = len(raw)
+
+                # Touched but unchanged: keep the parsed copy.
+                if snap is not None and snap[1] == digest:
+                    self._snapshot = (sig, digest, snap[2])
+                    self.stats["hits"] += 1
+                    return snap[2]
+
+                kanjis = json.loads(raw).get("kanjis", {})
+            self._snapshot = (sig, digest, kanjis)
+
+            self.stats["loads"] += 1
+            if snap is not None:
+                self.stats["reloads"] += 1
+
+            return kanjis
+
+        finally:
+            self._lock.release()
+
+    def get(self, kanji: str):
+        return self.kanjis().get(kanji)
+
+    def digest(self) -> str:
+        """
+        Returns the content hash of the currently loaded dataset.
+        """
+        self.kanjis()
+        return self._snapshot[1]
+
+
+_kanji_repository = None
+
+
+def get_kanji_repository(fp: str = KANJI_DATA_FP) -> KanjiRepository:
+    """
+    Returns the shared repository for a kanji dataset.
+    """
+
+    global _kanji_repository
+
+    if _kanji_repository is None or _kanji_repository.fp != fp:
+        _kanji_repository = KanjiRepository(fp)
+
+    return _kanji_repository
+
+
+# Longest n-gram kept in the English search index.
+SEARCH_GRAM = 3
+SEARCH_INDEX_VERSION = 2
+
+# Typo tolerance: shortest query matched fuzzily (one edit), and
+# the length from which two edits are allowed.
+SEARCH_FUZZY_MIN_LEN = 4
+SEARCH_FUZZY_LONG_LEN = 8
+
+
+def edit_distance(a: str, b: str, bound: int) -> int:
+    """
+    Returns the edit distance between a and b, counting a swap of
+    adjacent letters as one edit, or bound + 1 as soon as it is
+    known to exceed bound.
+    """
+
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+
+    before, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        curr = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(prev[j] + 1, curr[j - 1] + 1,
+                       prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            curr.append(cost)
+
+        # Every alignment passes through this row.
+        if min(curr) > bound:
+            return bound + 1
+        before, prev = prev, curr
+
+    return min(prev[-1], bound + 1)
+
+
+def padded_trigrams(term: str) -> set:
+    padded = f"^^{term}$$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def split_words(text: str) -> List[str]:
+    return "".join(c if c.isalnum() else " " for c in text).split()
+
+
+def popularity(entry: dict) -> tuple:
+    """
+    Sort key putting common kanji first: newspaper frequency rank,
+    then JLPT level (N5 first); kanji without either go last.
+    """
+
+    freq = entry.get("freq_mainichi_shinbun")
+    jlpt = entry.get("jlpt")
+    return (freq is None, freq or 0, jlpt is None, -(jlpt or 0))
+
+
+class EnglishSearchIndex:
+    """
+    Ranked English search over each kanji's Heisig keyword and
+    meanings.
+
+    Docs are numbered from most to least common kanji, so every
+    posting list is already in rank order. Matches are produced
+    lazily, tier by tier (exact word, word prefix, substring, then
+    typos within a bounded edit distance) and in posting order
+    within a tier, so the top k cost about k checks, not a scan.
+    """
+
+    def __init__(self, docs: list, grams: dict, prefixes: dict,
+                 terms: list, term_docs: list, term_grams: dict):
+        # docs: [kanji, display keyword, [lowercased texts]]
+        self.docs = docs
+        # n-gram -> doc ids, for substring matches, and word-initial
+        # n-gram -> doc ids, for short prefixes.
+        self.grams = grams
+        self.prefixes = prefixes
+        # Sorted words and whole texts, the doc ids of each,
+        # and padded trigram -> term ids, for typos.
+        self.terms = terms
+        self.term_docs = term_docs
+        self.term_grams = term_grams
+
+    @classmethod
+    def build(cls, kanjis: dict) -> "EnglishSearchIndex":
+        docs = []
+        grams = {}
+        prefixes = {}
+        vocab = {}
+
+        # Stable sort: ties keep dataset order.
+        entries = sorted(kanjis.items(), key=lambda i: popularity(i[1]))
+
+        for kanji, entry in entries:
+            heisig_en = entry.get("heisig_en")
+            meanings = entry.get("meanings") or []
+
+            texts = [heisig_en.lower()] if heisig_en else []
+            texts.extend(m.lower() for m in meanings)
+            if not texts:
+                continue
+
+            # Postings are appended in rank order, so they stay sorted.
+            doc_id = len(docs)
+            docs.append([kanji, heisig_en or ", ".join(meanings), texts])
+
+            doc_grams = set()
+            doc_terms = set(texts)
+            for text in texts:
+                doc_terms.update(split_words(text))
+                for n in range(1, SEARCH_GRAM + 1):
+                    for i in range(len(text) - n + 1):
+                        doc_grams.add(text[i:i + n])
+
+            for gram in doc_grams:
+                grams.setdefault(gram, []).append(doc_id)
+            for term in doc_terms:
+                vocab.setdefault(term, []).append(doc_id)
+            for prefix in {term[:n] for term in doc_terms
+                           for n in range(1, SEARCH_GRAM + 1)}:
+                prefixes.setdefault(prefix, []).append(doc_id)
+
+        terms = sorted(vocab)
+        term_grams = {}
+        for term_id, term in enumerate(terms):
+            for gram in padded_trigrams(term):
+                term_grams.setdefault(gram, []).append(term_id)
+
+        return cls(docs, grams, prefixes, terms,
+                   [vocab[t] for t in terms], term_grams)
+
+    def _exact(self, kq: str):
+        i = bisect_left(self.terms, kq)
+        if i < len(self.terms) and self.terms[i] == kq:
+            yield from self.term_docs[i]
+
+    def _prefixed(self, kq: str):
+        if len(kq) <= SEARCH_GRAM:
+            yield from self.prefixes.get(kq, [])
+            return
+
+        # Terms starting with kq form one run of the sorted list.
+        lo = bisect_left(self.terms, kq)
+        hi = bisect_left(self.terms, kq[:-1] + chr(ord(kq[-1]) + 1))
+        yield from heapq.merge(*self.term_docs[lo:hi])
+
+    def _substring(self, kq: str):
+        # Short queries are exact posting lookups.
+        if len(kq) <= SEARCH_GRAM:
+            yield from self.grams.get(kq, [])
+            return
+
+        postings = [self.grams.get(kq[i:i + SEARCH_GRAM])
+                    for i in range(len(kq) - SEARCH_GRAM + 1)]
+        if not all(postings):
+            return
+
+        # Walk the shortest posting list, verifying each candidate.
+        for d in min(postings, key=len):
+            if any(kq in text for text in self.docs[d][2]):
+                yield d
+
+    def typos(self, kq: str) -> List[list]:
+        """
+        Returns the term ids within 1, 2, ... edits of kq (but not
+        equal to it), one list per distance.
+        """
+
+        if len(kq) < SEARCH_FUZZY_MIN_LEN:
+            return []
+        bound = 1 if len(kq) < SEARCH_FUZZY_LONG_LEN else 2
+
+        # Each edit breaks at most four of kq's trigrams (a swap
+        # touches four), so a close term shares all but 4 * bound.
+        kq_grams = padded_trigrams(kq)
+        need = len(kq_grams) - 4 * bound
+
+        shared = {}
+        for gram in kq_grams:
+            for t in self.term_grams.get(gram, ()):
+                shared[t] = shared.get(t, 0) + 1
+
+        # Too few distinct trigrams (e.g. "aaaaaaaa") to filter.
+        candidates = shared if need > 0 else range(len(self.terms))
+
+        tiers = [[] for _ in range(bound)]
+        for t in candidates:
+            if need > 0 and shared[t] < need:
+                continue
+            dist = edit_distance(kq, self.terms[t], bound)
+            if 0 < dist <= bound:
+                tiers[dist - 1].append(t)
+
+        return tiers
+
+    def _fuzzy(self, kq: str):
+        for term_ids in self.typos(kq):
+            yield from heapq.merge(*(self.term_docs[t] for t in term_ids))
+
+    def ranked(self, kq: str):
+        """
+        Yields the doc ids matching kq, best match first.
+        """
+
+        if not kq:
+            return
+
+        seen = set()
+        for tier in (self._exact(kq), self._prefixed(kq),
+                     self._substring(kq), self._fuzzy(kq)):
+            for d in tier:
+                if d not in seen:
+                    seen.add(d)
+                    yield d
+
+    def result(self, d: int) -> dict:
+        return {'kanji': self.docs[d][0], 'heisig_en': self.docs[d][1]}
+
+    def search(self, kq: str, limit: int = None) -> List[dict]:
+        """
+        Returns the (top limit) kanji whose keyword or meanings
+        match kq, allowing typos, best match first.
+        """
+        return [self.result(d) for d in islice(self.ranked(kq), limit)]
+
+
+def search_index_path(fp: str) -> str:
+    return os.path.splitext(fp)[0] + ".index.json"
+
+
+def load_search_index(fp: str = KANJI_DATA_FP) -> EnglishSearchIndex:
+    """
+    Loads the persisted search index for a kanji dataset, rebuilding
+    and saving it when the dataset has changed since it was built.
+    """
+
+    source = file_signature(fp)
+    ipath = search_index_path(fp)
+
+    if os.path.exists(ipath):
+        with trace_span("search_index.load") as span:
+            with open(ipath, "rb") as file:
+                raw = file.read()
+            saved = json.loads(raw)
+            span["bytes_read"] = len(raw)
+
+        if (saved.get("version") == SEARCH_INDEX_VERSION
+                and saved.get("source") == source):
+            return EnglishSearchIndex(
+                saved["docs"], saved["grams"], saved["prefixes"],
+                saved["terms"], saved["term_docs"], saved["term_grams"])
+
+    kanjis = get_kanji_repository(fp).kanjis()
+    with trace_span("search_index.build"):
+        index = EnglishSearchIndex.build(kanjis)
+
+    # Readers never see a partial index.
+    atomic_write_json(ipath, {
+        "version": SEARCH_INDEX_VERSION,
+        "source": source,
+        "docs": index.docs,
+        "grams": index.grams,
+        "prefixes": index.prefixes,
+        "terms": index.terms,
+        "term_docs": index.term_docs,
+        "term_grams": index.term_grams
+    }, ensure_ascii=False)
+
+    return index
+
+
+_search_index = None
+_search_index_source = None
+
+
+def get_search_index(fp: str = KANJI_DATA_FP) -> EnglishSearchIndex:
+    """
+    Returns the in-memory search index, reloading on dataset changes.
+    """
+
+    global _search_index, _search_index_source
+
+    source = [fp] + file_signature(fp)
+    if _search_index is None or _search_index_source != source:
+        _search_index = load_search_index(fp)
+        _search_index_source = source
+
+    return _search_index
+
+
+class ShuffledCursor:
+    """
+    Draws from a pool without repeats using an incremental
+    Fisher-Yates shuffle. Each draw is O(1); the pool is
+    reshuffled once every element has been served.
+    """
+
+    def __init__(self, pool: list):
+        self.pool = list(pool)
+        self.pos = 0
+
+    def next(self):
+        if not self.pool:
+            return None
+
+        if self.pos >= len(self.pool):
+            self.pos = 0
+
+        j = random.randrange(self.pos, len(self.pool))
+        self.pool[self.pos], self.pool[j] = self.pool[j], self.pool[self.pos]
+        self.pos += 1
+
+        return self.pool[self.pos - 1]
+
+    def take(self, n: int) -> list:
+        """
+        Returns up to n distinct kanji.
+        """
+        return [self.next() for _ in range(min(n, len(self.pool)))]
+
+
+class KanjiSampler:
+    """
+    Random kanji sampler built once per dataset snapshot.
+
+    Only kanji with a Heisig keyword are eligible. Their bitset is
+    computed once and ANDed into every FacetIndex selection; each
+    pool is resolved once and cached, so every draw is O(1).
+    """
+
+    def __init__(self, facets: "FacetIndex"):
+        self.facets = facets
+        self.kanjis = facets.kanjis
+        self.eligible = 0
+        for i, entry in enumerate(self.kanjis.values()):
+            if entry.get("heisig_en"):
+                self.eligible |= 1 << i
+        self._pools = {}
+        self._cursors = {}
+
+    @staticmethod
+    def _key(filters: dict) -> tuple:
+        # Ranges arrive as lists over JSON; None means no filter.
+        return tuple(sorted(
+            (name, tuple(spec) if isinstance(spec, list) else spec)
+            for name, spec in filters.items() if spec is not None))
+
+    def pool(self, **filters) -> list:
+        """
+        Returns the kanji matching every given filter (as for
+        FacetIndex.select), in dataset order.
+        """
+
+        key = self._key(filters)
+        if key not in self._pools:
+            bits = self.facets.select(**dict(key)) if key else self.facets.all
+            self._pools[key] = self.facets.kanji(bits & self.eligible)
+        return self._pools[key]
+
+    def levels(self, facet: str) -> list:
+        """
+        Returns the sorted values of a facet (jlpt, grade, ...) that
+        have eligible kanji.
+        """
+
+        values, bitsets, _ = self.facets.facets[facet]
+        return [v for v in values if bitsets[v] & self.eligible]
+
+    def draw(self, **filters):
+        """
+        Returns one random kanji entry, or None if nothing matches.
+        """
+
+        pool = self.pool(**filters)
+        return self.kanjis[random.choice(pool)] if pool else None
+
+    def cursor(self, **filters) -> ShuffledCursor:
+        """
+        Returns the shared no-repeat cursor for a filter combination.
+        """
+
+        key = self._key(filters)
+        if key not in self._cursors:
+            self._cursors[key] = ShuffledCursor(self.pool(**filters))
+        return self._cursors[key]
+
+    def draw_unique(self, n: int, **filters) -> List[dict]:
+        """
+        Returns up to n random kanji entries without repeats.
+        """
+        return [self.kanjis[k] for k in self.cursor(**filters).take(n)]
+
+
+_kanji_sampler = None
+
+
+def get_kanji_sampler(fp: str = KANJI_DATA_FP) -> KanjiSampler:
+    """
+    Returns the sampler for the current dataset snapshot.
+    """
+
+    global _kanji_sampler
+
+    facets = get_facet_index(fp)
+    if _kanji_sampler is None or _kanji_sampler.facets is not facets:
+        _kanji_sampler = KanjiSampler(facets)
+
+    return _kanji_sampler
+
+
+# Facet filter names -> dataset fields.
+FACET_FIELDS = {
+    "jlpt": "jlpt",
+    "grade": "grade",
+    "strokes": "stroke_count",
+    "freq": "freq_mainichi_shinbun"
+}
+
+
+class FacetIndex:
+    """
+    Precomputed filter index over JLPT level, grade, stroke count
+    and newspaper frequency.
+
+    Each kanji gets a bit position (dataset order). Every facet
+    keeps its distinct values sorted, a bitset per value and a
+    running (cumulative) bitset, so any value range resolves with
+    two bisects and one AND-NOT, and combined filters with one
+    AND per facet.
+    """
+
+    def __init__(self, kanjis: dict):
+        self.kanjis = kanjis
+        self.ids = list(kanjis)
+        self.pos = {kanji: i for i, kanji in enumerate(self.ids)}
+        self.all = (1 << len(self.ids)) - 1
+        self.facets = {}
+
+        for name, field in FACET_FIELDS.items():
+            bitsets = {}
+            for i, entry in enumerate(kanjis.values()):
+                value = entry.get(field)
+                if value is not None:
+                    bitsets[value] = bitsets.get(value, 0) | 1 << i
+
+            values = sorted(bitsets)
+            running, acc = [], 0
+            for value in values:
+                acc |= bitsets[value]
+                running.append(acc)
+
+            self.facets[name] = (values, bitsets, running)
+
+    def range(self, name: str, lo=None, hi=None) -> int:
+        """
+        Returns the bitset of kanji with lo <= facet value <= hi.
+        """
+
+        values, bitsets, running = self.facets[name]
+
+        if lo is not None and lo == hi:
+            return bitsets.get(lo, 0)
+
+        end = len(values) if hi is None else bisect_right(values, hi)
+        start = 0 if lo is None else bisect_left(values, lo)
+        if start >= end:
+            return 0
+
+        bits = running[end - 1]
+        if start:
+            bits &= ~running[start - 1]
+        return bits
+
+    def select(self, **filters) -> int:
+        """
+        Returns the bitset matching every filter. A filter is either
+        a value or an inclusive (lo, hi) range with None for open.
+        """
+
+        bits = self.all
+        for name, spec in filters.items():
+            if isinstance(spec, tuple):
+                bits &= self.range(name, *spec)
+            else:
+                bits &= self.range(name, spec, spec)
+            if not bits:
+                break
+        return bits
+
+    def contains(self, bits: int, kanji: str) -> bool:
+        i = self.pos.get(kanji)
+        return i is not None and bool(bits >> i & 1)
+
+    def kanji(self, bits: int) -> List[str]:
+        """
+        Returns the kanji in a bitset, in dataset order.
+        """
+
+        out = []
+        while bits:
+            low = bits & -bits
+            out.append(self.ids[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+
+def parse_facet_filters(text: str) -> dict:
+    """
+    Parses filters like "jlpt=3 grade<=6 strokes=10-14 freq<500"
+    into FacetIndex.select() keyword arguments.
+    """
+
+    filters = {}
+    for term in (text or "").replace(",", " ").split():
+        for op in ("<=", ">=", "=", "<", ">"):
+            name, sep, value = term.partition(op)
+            if sep:
+                break
+
+        name = name.strip().lower()
+        if not sep or name not in FACET_FIELDS:
+            raise ValueError(f"Invalid filter '{term}'. Use "
+                             f"{', '.join(FACET_FIELDS)} with =, <=, >=.")
+
+        try:
+            if op == "=" and "-" in value.strip("-"):
+                lo, hi = value.split("-", 1)
+                filters[name] = (int(lo), int(hi))
+            else:
+                n = int(value)
+                filters[name] = {"=": n, "<=": (None, n), ">=": (n, None),
+                                 "<": (None, n - 1), ">": (n + 1, None)}[op]
+        except ValueError:
+            raise ValueError(f"Invalid number in filter '{term}'.")
+
+    return filters
+
+
+_facet_index = None
+
+
+def get_facet_index(fp: str = KANJI_DATA_FP) -> FacetIndex:
+    """
+    Returns the facet index for the current dataset snapshot.
+    """
+
+    global _facet_index
+
+    kanjis = get_kanji_repository(fp).kanjis()
+    if _facet_index is None or _facet_index.kanjis is not kanjis:
+        _facet_index = FacetIndex(kanjis)
+
+    return _facet_index
+
+
+# Reading fields searched by the kana reading index.
+READING_FIELDS = ("on_readings", "kun_readings", "name_readings")
+
+# Katakana U+30A1..U+30F6 sit exactly 0x60 above their hiragana.
+KATA_TO_HIRA = {cp: cp - 0x60 for cp in range(0x30A1, 0x30F7)}
+KATA_TO_HIRA.update({ord("-"): None, ord("."): None, ord(" "): None})
+
+
+def normalize_reading(text: str) -> str:
+    """
+    Folds katakana to hiragana and drops okurigana/affix markers,
+    so "スイ", "みず-" and "あ.がる" become "すい", "みず", "あがる".
+    """
+    return text.translate(KATA_TO_HIRA)
+
+
+class ReadingTrie:
+    """
+    Prefix trie over every kanji's normalized on/kun/name readings.
+
+    Each node stores the kanji of its whole subtree (deduplicated,
+    in dataset order), so a prefix query is a walk down the prefix
+    plus a copy of the result: proportional to the result size,
+    not to the dataset or the subtree.
+    """
+
+    def __init__(self, kanjis: dict):
+        self.kanjis = kanjis
+
+        # Node: [children {kana: node}, [kanji], last kanji added].
+        self.root = [{}, [], None]
+
+        for kanji, entry in kanjis.items():
+            for field in READING_FIELDS:
+                for reading in entry.get(field) or []:
+                    self._insert(normalize_reading(reading), kanji)
+
+    def _insert(self, reading: str, kanji: str):
+        node = self.root
+        for kana in reading:
+            node = node[0].setdefault(kana, [{}, [], None])
+
+            # Kanji arrive in dataset order, so a repeat is always
+            # the last one added.
+            if node[2] != kanji:
+                node[1].append(kanji)
+                node[2] = kanji
+
+    def search(self, kq: str) -> List[dict]:
+        """
+        Returns kanji with a reading starting with kq, in dataset order.
+        """
+
+        kq = normalize_reading(kq.strip())
+        if not kq:
+            return []
+
+        node = self.root
+        for kana in kq:
+            node = node[0].get(kana)
+            if node is None:
+                return []
+
+        return [self.kanjis[kanji] for kanji in node[1]]
+
+
+_reading_trie = None
+
+
+def get_reading_trie(fp: str = KANJI_DATA_FP) -> ReadingTrie:
+    """
+    Returns the reading trie for the current dataset snapshot.
+    """
+
+    global _reading_trie
+
+    kanjis = get_kanji_repository(fp).kanjis()
+    if _reading_trie is None or _reading_trie.kanjis is not kanjis:
+        _reading_trie = ReadingTrie(kanjis)
+
+    return _reading_trie
+
+
+class KanjiResolver:
+    """
+    Resolves Kanji Lookup queries through a chain of tiers:
+    in-memory LRU -> local datasets -> on-disk response cache ->
+    kanjiapi.dev over a pooled HTTP session.
+
+    Misses (404s) are cached as well, for a shorter TTL.
+    """
+
+    def __init__(self,
+                 base_url: str = KAPI_BASE_URL,
+                 cache_dir: str = LOOKUP_CACHE_DIR,
+                 local_sources: list = None,
+                 lru_size: int = 512,
+                 ttl: int = LOOKUP_TTL,
+                 negative_ttl: int = LOOKUP_NEGATIVE_TTL,
+                 timeout: float = LOOKUP_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.cache_dir = cache_dir
+        self.local_sources = local_sources or []
+        self.lru_size = lru_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+
+        self.stats = {"memory": 0, "local": 0, "disk": 0,
+                      "network": 0, "errors": 0}
+        self._lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=4)
+            self._session.mount("http://", adapter)
+            self._session.mount("https://", adapter)
+        return self._session
+
+    def _remember(self, kq: str, res, expires):
+        with self._lru_lock:
+            self._lru[kq] = (res, expires)
+            self._lru.move_to_end(kq)
+            if len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _cache_path(self, kq: str) -> str:
+        name = "-".join(format(ord(c), "X") for c in kq)
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _read_disk(self, kq: str):
+        """
+        Returns (found, result, expires) from the on-disk cache.
+        """
+
+        fp = self._cache_path(kq)
+        if not os.path.exists(fp):
+            return False, None, None
+
+        with open(fp, "r", encoding="utf-8") as file:
+            entry = json.load(file)
+
+        ttl = self.ttl if entry["data"] is not None else self.negative_ttl
+        expires = entry["fetched"] + ttl
+        if expires <= time.time():
+            return False, None, None
+
+        return True, entry["data"], expires
+
+    def _write_disk(self, kq: str, res):
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        atomic_write_json(self._cache_path(kq),
+                          {"fetched": time.time(), "data": res},
+                          ensure_ascii=False)
+
+    def lookup(self, kq: str):
+        """
+        Returns the kanjiapi entry for kq, or None if there is no
+        such kanji or the API could not be reached.
+        """
+
+        found, res = self.cached(kq)
+        return res if found else self.fetch(kq)
+
+    def cached(self, kq: str):
+        """
+        Returns (found, result) from the tiers that need no
+        network: memory, local datasets and the disk cache.
+        """
+
+        # Tier 1: in-memory LRU.
+        with self._lru_lock:
+            hit = self._lru.get(kq)
+            if hit is not None and (hit[1] is None or hit[1] > time.time()):
+                self._lru.move_to_end(kq)
+                self.stats["memory"] += 1
+                return True, hit[0]
+
+        # Tier 2: local datasets.
+        for source in self.local_sources:
+            res = source.get(kq)
+            if res is not None:
+                self.stats["local"] += 1
+                self._remember(kq, res, None)
+                return True, res
+
+        # Tier 3: on-disk response cache.
+        found, res, expires = self._read_disk(kq)
+        if found:
+            self.stats["disk"] += 1
+            self._remember(kq, res, expires)
+            return True, res
+
+        return False, None
+
+    def fetch(self, kq: str):
+        """
+        Tier 4: asks kanjiapi.dev and caches the answer.
+        """
+
+        url = f"{self.base_url}/kanji/{urllib.parse.quote(kq)}"
+        try:
+            with trace_span("lookup.http") as span:
+                response = self.session.get(url, timeout=self.timeout)
+                span["bytes_read"] = len(response.content)
+                span["status"] = response.status_code
+
+            if response.status_code == 200:
+                res = response.json()
+                if not isinstance(res, dict):
+                    raise ValueError("not a kanji entry")
+                ttl = self.ttl
+            elif response.status_code == 404:
+                res = None
+                ttl = self.negative_ttl
+            else:
+                raise ValueError(f"HTTP {response.status_code}")
+
+        # Unreachable API, transient errors and bad bodies are
+        # counted but not cached.
+        except (requests.RequestException, ValueError):
+            self.stats["errors"] += 1
+            return None
+
+        self.stats["network"] += 1
+        self._write_disk(kq, res)
+        self._remember(kq, res, time.time() + ttl)
+
+        return res
+
+
+def local_kanji_sources(fp: str = KANJI_DATA_FP) -> list:
+    """
+    Returns repositories for every locally available kanji dataset.
+    """
+
+    sources = [get_kanji_repository(fp)]
+
+    if os.path.exists(KAPI_DATA_FP):
+        sources.append(KanjiRepository(KAPI_DATA_FP))
+
+    return sources
+
+
+_kanji_resolver = None
+
+
+def get_kanji_resolver() -> KanjiResolver:
+    """
+    Returns the process-wide Kanji Lookup resolver.
+    """
+
+    global _kanji_resolver
+
+    if _kanji_resolver is None:
+        _kanji_resolver = KanjiResolver(local_sources=local_kanji_sources())
+
+    return _kanji_resolver
+
+
+class KanjiQueries:
+    """
+    Search, random and lookup queries against the in-process
+    dataset and indexes. QueryServiceClient offers the same
+    calls, answered by the query service instead.
+    """
+
+    def __init__(self, fp: str = KANJI_DATA_FP):
+        self.fp = fp
+        self._resolver = None
+        self._cursors = OrderedDict()
+
+    def lookup(self, kq: str):
+        return self.resolver().lookup(kq)
+
+    def resolver(self) -> KanjiResolver:
+        if self.fp == KANJI_DATA_FP:
+            return get_kanji_resolver()
+
+        # Another dataset gets its own resolver chain.
+        if self._resolver is None:
+            self._resolver = KanjiResolver(
+                local_sources=local_kanji_sources(self.fp))
+        return self._resolver
+
+    def iter_search(self, kq: str, filters: dict = None):
+        """
+        Yields the English search matches for kq, narrowed by
+        facet filters, best first. Nothing is computed ahead of
+        what the caller consumes.
+        """
+
+        index = get_search_index(self.fp)
+        hits = index.ranked(kq)
+
+        # Narrow by facets via one bitset test per hit.
+        if filters:
+            facets = get_facet_index(self.fp)
+
+            # Ranges arrive as lists over JSON.
+            bits = facets.select(**{
+                name: tuple(spec) if isinstance(spec, list) else spec
+                for name, spec in filters.items()})
+            hits = (d for d in hits
+                    if facets.contains(bits, index.docs[d][0]))
+
+        for d in hits:
+            yield index.result(d)
+
+    def search(self, kq: str, filters: dict = None, limit: int = None,
+               offset: int = 0) -> List[dict]:
+        """
+        Returns matches offset to offset + limit of iter_search.
+
+        The search stays open between calls (per kq and filters),
+        so paging forward ranks each match once instead of starting
+        over from the best match for every page. Only the last page
+        is kept: going back re-runs the search.
+        """
+
+        index = get_search_index(self.fp)
+        key = (kq, json.dumps(filters, sort_keys=True))
+        stop = None if limit is None else offset + limit
+
+        # Cursor: [index, hits, hits consumed, page offset, page].
+        cursor = self._cursors.get(key)
+        if cursor is None or cursor[0] is not index:
+            cursor = [index, self.iter_search(kq, filters), 0, 0, []]
+            self._cursors[key] = cursor
+            if len(self._cursors) > SEARCH_CURSORS:
+                self._cursors.popitem(last=False)
+        self._cursors.move_to_end(key)
+
+        _, hits, pos, start, page = cursor
+
+        # Asked again for (part of) the kept page.
+        if start <= offset and stop is not None \
+                and stop <= start + len(page):
+            return page[offset - start:stop - start]
+
+        if offset < pos:
+            hits, pos = self.iter_search(kq, filters), 0
+
+        page = list(islice(hits, offset - pos,
+                           None if stop is None else stop - pos))
+        cursor[1:] = [hits, offset + len(page), offset, page]
+        return page
+
+    def reading(self, kq: str) -> List[dict]:
+        return get_reading_trie(self.fp).search(kq)
+
+    def random(self, filters: dict = None):
+        """
+        Returns the next entry of a no-repeat shuffle of the
+        filtered pool, or None if nothing matches.
+        """
+
+        sampler = get_kanji_sampler(self.fp)
+        key = sampler.cursor(**(filters or {})).next()
+        return None if key is None else sampler.kanjis[key]
+
+    def levels(self, facet: str) -> list:
+        """
+        Returns the sorted values of a facet (jlpt, grade).
+        """
+        return get_kanji_sampler(self.fp).levels(facet)
+
+    def total(self) -> int:
+        return len(get_kanji_repository(self.fp).kanjis())
+
+
+QUERY_OPS = {"lookup", "search", "reading", "random", "levels", "total"}
+
+# Lookups have their own LRU; random draws must not repeat.
+QUERY_CACHED_OPS = {"search", "reading", "levels", "total"}
+
+
+class QueryServiceClient:
+    """
+    KanjiQueries calls forwarded to the query service.
+    """
+
+    def __init__(self, addr: str = None):
+        self.client = ServiceClient(addr or QUERY_SERVICE_ADDR)
+
+    def __getattr__(self, op: str):
+        if op not in QUERY_OPS:
+            raise AttributeError(op)
+        return lambda *args: self.client.call(op, *args)
+
+    def iter_search(self, kq: str, filters: dict = None,
+                    chunk: int = SEARCH_PAGE_SIZE + 1):
+        # Fetched a chunk at a time, as the caller pages through.
+        offset = 0
+        while True:
+            rows = self.client.call("search", kq, filters, chunk, offset)
+            yield from rows
+            if len(rows) < chunk:
+                return
+            offset += chunk
+
+    def close(self):
+        self.client.close()
+
+
+_kanji_queries = None
+
+
+def get_kanji_queries():
+    """
+    Returns the configured query backend. The service client
+    never loads the dataset in this process.
+    """
+
+    global _kanji_queries
+
+    if _kanji_queries is None:
+        if QUERY_BACKEND == "service":
+            _kanji_queries = QueryServiceClient(QUERY_SERVICE_ADDR)
+        else:
+            _kanji_queries = KanjiQueries(KANJI_DATA_FP)
+
+    return _kanji_queries
+
+
+class QueryService:
+    """
+    Asyncio daemon that keeps the kanji dataset and its indexes
+    resident and answers KanjiQueries calls for CLI clients.
+
+    Requests from every connection are queued and run in batches
+    on one worker thread, keeping the loop free for I/O. A batch
+    takes whatever queued up while the previous one ran (plus
+    anything arriving within batch_window), up to batch_size.
+    Identical queries in a batch are computed once, and results
+    of deterministic queries are kept in an LRU cache that is
+    dropped when the dataset file changes.
+
+    Lookups skip the batches: memory, local and disk hits are
+    answered directly, and network fetches run on a separate pool
+    so a slow API call never holds up other clients' queries.
+    """
+
+    def __init__(self, fp: str = KANJI_DATA_FP,
+                 batch_size: int = QUERY_BATCH_SIZE,
+                 batch_window: float = QUERY_BATCH_WINDOW,
+                 cache_size: int = QUERY_CACHE_SIZE):
+        self.fp = fp
+        self.queries = KanjiQueries(fp)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+
+        self.stats = {"requests": 0, "errors": 0, "batches": 0,
+                      "coalesced": 0, "cache_hits": 0}
+        self._cache = OrderedDict()
+        self._source = None
+        self._checked = 0.0
+        self._seq = 0
+        self._queue = None
+        self._worker = None
+        self._fetcher = None
+
+    def warm(self):
+        """
+        Loads the dataset and builds every index up front.
+        """
+
+        self.queries.total()
+        get_search_index(self.fp)
+        get_facet_index(self.fp)
+        get_reading_trie(self.fp)
+        get_kanji_sampler(self.fp)
+
+    def run_batch(self, keys: list) -> dict:
+        """
+        Runs each distinct query once, on the worker thread.
+        Returns {key: (ok, result or error)}.
+        """
+
+        out = {}
+        for key in keys:
+            op, args = key[0], json.loads(key[1])
+            try:
+                out[key] = (True, getattr(self.queries, op)(*args))
+            except Exception as err:
+                out[key] = (False, f"{type(err).__name__}: {err}")
+        return out
+
+    def _check_source(self):
+        # A changed dataset invalidates every cached result.
+        source = file_signature(self.fp)
+        if source != self._source:
+            self._cache.clear()
+            self._source = source
+        self._checked = time.monotonic()
+
+    def _cached(self, key):
+        # Checked once per batch; at most once a second when every
+        # request is a cache hit and no batch runs.
+        if time.monotonic() - self._checked > 1.0:
+            self._check_source()
+
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+        return hit
+
+    def _remember(self, key, res):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = res
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def query(self, op: str, args: list):
+        """
+        Returns (ok, result or error) for one request.
+        """
+
+        import asyncio
+
+        if op not in QUERY_OPS:
+            return False, f"ValueError: Unknown operation '{op}'"
+
+        if op == "lookup":
+            return await self.lookup(*args)
+
+        key = (op, json.dumps(args, ensure_ascii=False))
+        if op in QUERY_CACHED_OPS:
+            hit = self._cached(key)
+            if hit is not None:
+                return True, hit
+        else:
+            # Never coalesced with another request.
+            self._seq += 1
+            key += (self._seq,)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((key, fut))
+        return await fut
+
+    async def lookup(self, kq: str):
+        import asyncio
+
+        resolver = self.queries.resolver()
+        try:
+            found, res = resolver.cached(kq)
+            if not found:
+                res = await asyncio.get_running_loop().run_in_executor(
+                    self._fetcher, resolver.fetch, kq)
+        except Exception as err:
+            return False, f"{type(err).__name__}: {err}"
+        return True, res
+
+    async def batcher(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+
+            # Under load, requests pile up while a batch runs.
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(
+                        self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            pending = {}
+            for key, fut in batch:
+                pending.setdefault(key, []).append(fut)
+            self.stats["batches"] += 1
+            self.stats["coalesced"] += len(batch) - len(pending)
+
+            self._check_source()
+            results = await loop.run_in_executor(
+                self._worker, self.run_batch, list(pending))
+
+            for key, futs in pending.items():
+                ok, res = results[key]
+                if ok and key[0] in QUERY_CACHED_OPS:
+                    self._remember(key, res)
+                for fut in futs:
+                    if not fut.done():
+                        fut.set_result((ok, res))
+
+    async def handle(self, reader, writer):
+        while True:
+            try:
+                line = await reader.readline()
+            except ConnectionError:
+                break
+            if not line:
+                break
+
+            self.stats["requests"] += 1
+            rid = None
+            try:
+                rid, op, args = parse_request(line)
+            except ValueError as err:
+                ok, result = False, f"{type(err).__name__}: {err}"
+            else:
+                ok, result = await self.query(op, args)
+
+            if ok:
+                res = {"id": rid, "ok": True, "result": result}
+            else:
+                self.stats["errors"] += 1
+                res = {"id": rid, "ok": False, "error": result}
+
+            writer.write(json.dumps(res, ensure_ascii=False).encode("utf-8")
+                         + b"\n")
+            await writer.drain()
+
+        writer.close()
+
+    async def serve(self, addr: str = None):
+        import asyncio
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        addr = addr or QUERY_SERVICE_ADDR
+
+        # Build every index before accepting the first client.
+        self.warm()
+        self._queue = asyncio.Queue()
+        self._worker = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="queries")
+        self._fetcher = ThreadPoolExecutor(max_workers=4,
+                                           thread_name_prefix="lookups")
+
+        server = await start_service(self.handle, addr)
+        batcher = asyncio.create_task(self.batcher())
+
+        console.print(f"Query service listening on {addr} "
+                      f"({self.queries.total()} kanji)")
+        try:
+            await serve_until_stopped(server, addr)
+        finally:
+            batcher.cancel()
+            self._worker.shutdown(wait=False)
+            self._fetcher.shutdown(wait=False)
+            console.print("Query service stopped: " + ", ".join(
+                f"{name} {n}" for name, n in self.stats.items()))
+
+
+def draw_welcome_menu():
+    """
+    Draws the Welcome Menu's logo and tagline.
+    """
+
+    # Kanji Crow's ASCII Logo.
+    kc_logo = """[bold blue]
+    ██╗  ██╗ █████╗ ███╗   ██╗     ██╗██╗     ██████╗██████╗  ██████╗ ██╗    ██╗
+    ██║ ██╔╝██╔══██╗████╗  ██║     ██║██║    ██╔════╝██╔══██╗██╔═══██╗██║    ██║
+    █████╔╝ ███████║██╔██╗ ██║     ██║██║    ██║     ██████╔╝██║   ██║██║ █╗ ██║
+    ██╔═██╗ ██╔══██║██║╚██╗██║██   ██║██║    ██║     ██╔══██╗██║   ██║██║███╗██║
+    ██║  ██╗██║  ██║██║ ╚████║╚█████╔╝██║    ╚██████╗██║  ██║╚██████╔╝╚███╔███╔╝
+    ╚═╝  ╚═╝╚═╝  ╚═╝╚═╝  ╚═══╝ ╚════╝ ╚═╝     ╚═════╝╚═╝  ╚═╝ ╚═════╝  ╚══╝╚══╝
+    [/bold blue]"""
+
+    # Draw banner.
+    clear_terminal()
+    page_banner(kc_logo)
+
+    # Draw Kanji Crow's tagline text blurb.
+    tag_text = Text("Master Japanese Kanji - Search, view, and study 13k "
+                    "characters to strengthen your Japanese skills.",
+                    style="light blue")
+    console.print(tag_text, justify="center")
+    console.print()
+
+
+def welcome_menu():
+    """
+    Kanji Crow Welcome Menu. Allows users to
+    login, register, or exit from the service.
+    """
+
+    draw_welcome_menu()
+
+    # Draw navigation options.
+    options = [
+        "Login",
+        "Register",
+        "-> Exit"]
+    choice = gui(options)
+
+    # Go to Login.
+    if choice == options[0]:
+        return "login"
+
+    # Go to Registration.
+    elif choice == options[1]:
+        return "register"
+
+    # Terminate Program.
+    elif choice == options[2]:
+        console.print()
+        console.print("Are you sure?", style="red")
+        input = console.input(prompt="[Y/N]: ")
+
+        # Exit and clear terminal.
+        if input in ["Yes", "yes", "Y", "y"]:
+            clear_terminal()
+            return None
+
+        # Redirect to Welcome Menu.
+        elif input in ["No", "no", "N", "n"]:
+            return "welcome"
+
+        else:
+
+            # Draw error message.
+            failure_msg("Invalid Input")
+
+    return "welcome"
+
+
+def register_user():
+    """
+    Allows users to register for Kanji Crow.
+    Requires a valid email and password.
+    """
+
+    clear_terminal()
+    page_banner("""[bold green]
+    ██████╗ ███████╗ ██████╗ ██╗███████╗████████╗███████╗██████╗
+    ██╔══██╗██╔════╝██╔════╝ ██║██╔════╝╚══██╔══╝██╔════╝██╔══██╗
+    ██████╔╝█████╗  ██║  ███╗██║███████╗   ██║   █████╗  ██████╔╝
+    ██╔══██╗██╔══╝  ██║   ██║██║╚════██║   ██║   ██╔══╝  ██╔══██╗
+    ██║  ██║███████╗╚██████╔╝██║███████║   ██║   ███████╗██║  ██║
+    ╚═╝  ╚═╝╚══════╝ ╚═════╝ ╚═╝╚══════╝   ╚═╝   ╚══════╝╚═╝  ╚═╝
+    [/bold green]""")
+
+    email = questionary.text(
+        "Email: ",
+        validate=EMAIL_VALIDATOR
+    ).ask()
+
+    # Ensures length b/t 8 and 16, 1 upper, 1 digit, no spaces.
+    password = questionary.password(
+        "Password: ",
+        validate=PASSWORD_VALIDATOR
+    ).ask()
+
+    def verify_user_password(user_password):
+        """
+        Compares user's first and second password entry.
+        Returns valid if both entries are identical.
+        """
+
+        # Check for mismatched passwords.
+        if user_password != password:
+            return "Passwords are not identical."
+        else:
+            return True
+
+    verify_password = questionary.password(
+        "Verify: ",
+        validate=verify_user_password
+    ).ask()
+
+    if password == verify_password:
+
+        # Open user database.
+        store = get_user_store()
+
+        # Duplicate email -> error:
+        if store.has_user(email):
+            failure_msg("Email already registered. Try another.")
+
+            # Restart registration process.
+            return "register"
+
+        # Valid email -> register user:
+        else:
+
+            # Store (hashed) user data, hashing off the UI thread.
+            pw = run_in_worker(hash_password, password,
+                               message="Securing password...")
+            store.create_user(email, pw)
+
+            # Display success and return to welcome.
+            success_msg("Registered Successfully")
+
+    return "welcome"
+
+
+def login_user():
+    """
+    Allows users to login with their credentials.
+    Successful logins redirect to the dashboard.
+    """
+
+    clear_terminal()
+    page_banner("""[bold green]
+    ██╗      ██████╗  ██████╗ ██╗███╗   ██╗
+    ██║     ██╔═══██╗██╔════╝ ██║████╗  ██║
+    ██║     ██║   ██║██║  ███╗██║██╔██╗ ██║
+    ██║     ██║   ██║██║   ██║██║██║╚██╗██║
+    ███████╗╚██████╔╝╚██████╔╝██║██║ ╚████║
+    ╚══════╝ ╚═════╝  ╚═════╝ ╚═╝╚═╝  ╚═══╝
+    [/bold green]""")
+
+    email = questionary.text(
+        "Email: ",
+        validate=EMAIL_VALIDATOR
+    ).ask()
+
+    pw = questionary.password(
+        "Password: ",
+        validate=LOGIN_PASSWORD_VALIDATOR
+    ).ask()
+
+    ud = []
+    ud.append(email)
+    ud.append(pw)
+
+    # Open user database.
+    store = get_user_store()
+    hpw = store.get_password(email)
+
+    if hpw is None:
+        failure_msg("No account found with this email. Please register.")
+        return "welcome"
+
+    else:
+
+        valid, new_hpw = run_in_worker(verify_password, pw, hpw,
+                                       message="Verifying password...")
+
+        if valid:
+
+            # Upgrade hashes made at an outdated cost.
+            if new_hpw:
+                store.set_password(email, new_hpw)
+
+            success_msg("Login Successful")
+
+            update_session_email(email)
+            return "dashboard"
+
+        else:
+            failure_msg("Incorrect Password. Try again.")
+
+            return "welcome"
+
+
+def dashboard():
+    """
+    Permits user navigation to various pages.
+    Provides kanji statistics overview to user.
+    """
+
+    clear_terminal()
+    page_banner("""[bold blue]
+    ██████╗  █████╗ ███████╗██╗  ██╗██████╗  ██████╗  █████╗ ██████╗ ██████╗
+    ██╔══██╗██╔══██╗██╔════╝██║  ██║██╔══██╗██╔═══██╗██╔══██╗██╔══██╗██╔══██╗
+    ██║  ██║███████║███████╗███████║██████╔╝██║   ██║███████║██████╔╝██║  ██║
+    ██║  ██║██╔══██║╚════██║██╔══██║██╔══██╗██║   ██║██╔══██║██╔══██╗██║  ██║
+    ██████╔╝██║  ██║███████║██║  ██║██████╔╝╚██████╔╝██║  ██║██║  ██║██████╔╝
+    ╚═════╝ ╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝╚═════╝  ╚═════╝ ╚═╝  ╚═╝╚═╝  ╚═╝╚═════╝
+    [/bold blue]""")
+
+    nav_bar("Dashboard")
+
+    store = get_user_store()
+
+    # Get user specific data (kept up to date on every change).
+    curr_user = session_email
+    stats = store.get_stats(curr_user)
+    total = get_kanji_queries().total()
+
+    stat_text = Text()
+    stat_text.append(f"Known: {stats['known']} / {total}\n")
+    stat_text.append(f"Review Queue: {stats['backlog']}\n")
+
+    # Known per JLPT level (N5 first) and grade.
+    jlpt = sorted(stats["jlpt"].items(), key=lambda i: -int(i[0]))
+    grade = sorted(stats["grade"].items(), key=lambda i: int(i[0]))
+    stat_text.append("JLPT: " + (" | ".join(
+        f"N{lvl} {n}" for lvl, n in jlpt) or "-") + "\n")
+    stat_text.append("Grade: " + (" | ".join(
+        f"{lvl}: {n}" for lvl, n in grade) or "-") + "\n")
+
+    # Newest first.
+    recent = " ".join(chr(kid) for kid in reversed(stats["recent"]))
+    stat_text.append("Recently Learned: ")
+    stat_text.append(recent or "-", style="green")
+
+    stat_panel = Panel(
+        stat_text,
+        title="Kanji Stats",
+        border_style="bright_blue"
+    )
+
+    console.print(Align.center(stat_panel))
+    console.print()
+
+    pg = questionary.text("Input: ").ask()
+    return navigate_to_page(pg, "dashboard")
+
+
+def kanji_reviewer():
+    """
+    Enables users to review kanji in their
+    review queue in a flashcard format.
+    """
+
+    clear_terminal()
+    pg_banner = ("""[bold blue]
+    ██████╗ ███████╗██╗   ██╗██╗███████╗██╗    ██╗
+    ██╔══██╗██╔════╝██║   ██║██║██╔════╝██║    ██║
+    ██████╔╝█████╗  ██║   ██║██║█████╗  ██║ █╗ ██║
+    ██╔══██╗██╔══╝  ╚██╗ ██╔╝██║██╔══╝  ██║███╗██║
+    ██║  ██║███████╗ ╚████╔╝ ██║███████╗╚███╔███╔╝
+    ╚═╝  ╚═╝╚══════╝  ╚═══╝  ╚═╝╚══════╝ ╚══╝╚══╝
+    [/bold blue]""")
+    page_banner(pg_banner)
+
+    nav_bar("Review")
+
+    store = get_user_store()
+
+    # Get user specific data (queue is loaded once per session).
+    curr_user = session_email
+    session = get_review_session(curr_user)
+    due = session.due
+    now = time.time()
+
+    # Most overdue card first.
+    kid = due.next_due(now)
+
+    if kid is None:
+        if len(due) == 0:
+            failure_msg("No kanji in review queue!")
+        else:
+            wait = max(1, round((due.next_due_time() - now) / 60))
+            failure_msg(f"No reviews due! Next review in {wait} min.")
+        end_review_session()
+        return "dashboard"
+
+    ck = store.get_card(kid)
+
+    kanji_char = Text(ck["kanji"], style="bold magenta", justify="center")
+
+    # Kanji Card (Front):
+    front_panel = Panel(
+        kanji_char,
+        width=20,
+        padding=(2, 5),
+        title="Front",
+        border_style="bright_blue"
+    )
+
+    # Review Queue:
+    rem_str = f"{due.due_count(now)} due / {len(due)} queued"
+    rem_reviews = Text(rem_str, style="bold magenta", justify="center")
+
+    review_queue = Panel(
+        rem_reviews,
+        title="Review Count",
+        border_style="bright_blue"
+    )
+
+    console.print(Align.center(front_panel))
+    console.print(Align.center(review_queue))
+
+    console.input(prompt="Press enter to flip card!")
+
+    clear_terminal()
+    page_banner(pg_banner)
+    nav_bar("Review")
+
+    kanji_info = Table(show_header=False, padding=(0, 2), box=None)
+    kanji_info.add_row("JLPT Level:", f"{ck['jlpt']}")
+
+    meanings = ", ".join(ck["meanings"])
+    kanji_info.add_row("Keyword:", ck["heisig_en"])
+    kanji_info.add_row("Meanings:", meanings)
+
+    kun = ck["kun_readings"][0] if ck["kun_readings"] else "N/A"
+    on = ck["on_readings"][0] if ck["on_readings"] else "N/A"
+    kanji_info.add_row("On Reading", on)
+    kanji_info.add_row("Kun Reading", kun)
+
+    card_group = Group(
+        kanji_char,
+        "",
+        kanji_info
+    )
+
+    back_panel = Panel(
+        card_group,
+        width=40,
+        padding=(1, 2),
+        title=(f"Back: - Kanji Info: {ck['kanji']}"),
+        border_style="bright_blue",
+    )
+
+    console.print(Align.center(back_panel))
+    console.print(Align.center(review_queue))
+
+    options = [
+        "Again",
+        "Hard",
+        "Good",
+        "Easy",
+        "Known (Remove)",
+        "-> Dashboard"]
+    choice = gui(options, "Rate Review:")
+
+    # Reschedule the card (SM-2); saved at the next checkpoint.
+    if choice in options[:4]:
+        session.rate(kid, choice.lower())
+
+        return "review"
+
+    elif choice == options[4]:
+        session.mark_known(kid)
+        success_msg(f"{ck['kanji']} removed from Review Queue")
+
+        return "review"
+
+    else:
+        end_review_session()
+        return "dashboard"
+
+
+def show_result_pages(pg_banner: str, headers: tuple, rows,
+                      page_size: int = SEARCH_PAGE_SIZE) -> int:
+    """
+    Shows rows (any iterable, consumed lazily) one table of
+    page_size at a time, asking before each further page.
+    Returns the number of rows shown.
+    """
+
+    rows = iter(rows)
+
+    # One row of lookahead tells whether another page follows.
+    page = list(islice(rows, page_size + 1))
+    shown = 0
+
+    while page:
+
+        # Re-render page:
+        clear_terminal()
+        page_banner(pg_banner)
+        nav_bar('search')
+
+        first, last = shown + 1, shown + min(len(page), page_size)
+        caption = (f"Results {first}-{last}" if last > first
+                   else f"Result {first}")
+
+        kanji_table = Table(*headers, caption=caption)
+        for row in page[:page_size]:
+            kanji_table.add_row(*row)
+        console.print(kanji_table, justify="center")
+
+        shown = last
+
+        if len(page) > page_size:
+            options = [
+                "Yes",
+                "No"]
+            choice = gui(options, "Show more?")
+
+            if choice == options[1]:
+                return shown
+
+            page = page[page_size:] + list(islice(rows, page_size))
+
+        else:
+            console.print()
+            failure_msg("End of results")
+            return shown
+
+    return shown
+
+
+def kanji_search():
+    """
+    Allows users to search for kanji directly using
+    the KanjiAPI or to search in English or by kana
+    reading using a locally cached download of the KanjiAPI.
+
+    Users can add or remove direct kanji lookup results
+    to their review queue from the search page.
+    """
+
+    clear_terminal()
+    pg_banner = """[bold blue]
+    ███████╗███████╗ █████╗ ██████╗  ██████╗██╗  ██╗
+    ██╔════╝██╔════╝██╔══██╗██╔══██╗██╔════╝██║  ██║
+    ███████╗█████╗  ███████║██████╔╝██║     ███████║
+    ╚════██║██╔══╝  ██╔══██║██╔══██╗██║     ██╔══██║
+    ███████║███████╗██║  ██║██║  ██║╚██████╗██║  ██║
+    ╚══════╝╚══════╝╚═╝  ╚═╝╚═╝  ╚═╝ ╚═════╝╚═╝  ╚═╝
+    [/bold blue]"""
+    page_banner(pg_banner)
+
+    nav_bar("Search")
+
+    options = [
+        "Kanji Lookup",
+        "English to Kanji",
+        "Reading to Kanji",
+        "-> Dashboard"]
+    choice = gui(options)
+
+    # Kanji Lookup.
+    if choice == options[0]:
+
+        # Get kanji input.
+        kq = questionary.text("Input: ").ask()
+
+        # Check if valid query.
+        if not kq.strip():
+            failure_msg("Empty query. Try again.")
+            return "search"
+
+        else:
+
+            # Resolve locally where possible, else via the API.
+            res = get_kanji_queries().lookup(kq.strip())
+
+            if res is None:
+                failure_msg("No Result / API Error.")
+
+            else:
+
+                # Handle JSON edge case issues:
+                kun = res["kun_readings"][0] if res["kun_readings"] else "N/A"
+                on = res["on_readings"][0] if res["on_readings"] else "N/A"
+
+                # Build kanji search results table:
+                kanji_table = Table("Kanji", "Meaning", "JLPT", "Kun", "On")
+                kanji_table.add_row(res["kanji"], res["heisig_en"],
+                                    str(res["jlpt"]), kun, on)
+
+                # Render Table:
+                console.print(kanji_table, justify="center")
+                console.print()
+
+                # Prompt to add to db:
+                return add_remove_kanji_to_db(res, "search")
+
+    # English -> Kanji
+    elif choice == options[1]:
+
+        # Get user kanji query:
+        msg = "Input (Type 'quit' to END): "
+        kq = questionary.text(msg).ask().lstrip().strip().lower()
+
+        if not kq.strip():
+            failure_msg("Empty query. Try again.")
+            return "search"
+
+        # Terminate search commands:
+        if kq in ['Quit', 'quit', 'Q', 'q',]:
+            return "search"
+
+        # Optional filters, e.g. "jlpt=3 grade<=6 strokes=10-14".
+        # Cancelling the prompt (None) means no filters.
+        spec = questionary.text("Filters (blank for none): ").ask()
+        try:
+            filters = parse_facet_filters(spec or "")
+        except ValueError as err:
+            failure_msg(str(err))
+            return "search"
+
+        # Stream matches best first; only a page is held at once.
+        matching_kanji = get_kanji_queries().iter_search(kq, filters)
+        rows = ((k['kanji'], k['heisig_en']) for k in matching_kanji)
+
+        # No matching kanji:
+        if not show_result_pages(pg_banner, ("Kanji", "Meaning"), rows):
+            failure_msg("No matching kanji")
+        return "search"
+
+    # Reading -> Kanji
+    elif choice == options[2]:
+
+        # Kana prefix, e.g. "みず" or "スイ".
+        kq = questionary.text("Reading (kana): ").ask()
+
+        if not kq.strip():
+            failure_msg("Empty query. Try again.")
+            return "search"
+
+        matching_kanji = get_kanji_queries().reading(kq)
+
+        rows = ((k["kanji"], k.get("heisig_en") or "N/A",
+                 "、".join(k["on_readings"] + k["kun_readings"]))
+                for k in matching_kanji)
+        headers = ("Kanji", "Meaning", "Readings")
+        if not show_result_pages(pg_banner, headers, rows):
+            failure_msg("No matching kanji")
+
+    elif choice == options[3]:
+        return "dashboard"
 
     # TODO:
-    # Handle user data as Microservice.
+    # Copy result to clipboard?
 
+    return "search"
 
-def dashboard():
+
+def kanji_wildcard_search():
     """
-    Permits user navigation to various pages.
-    Provides kanji statistics overview to user.
+    Allows users to generate a random kanji
+    from a locally cached version of the KanjiAPI.
     """
 
     clear_terminal()
     page_banner("""[bold blue]
-    ██████╗  █████╗ ███████╗██╗  ██╗██████╗  ██████╗  █████╗ ██████╗ ██████╗
-    ██╔══██╗██╔══██╗██╔════╝██║  ██║██╔══██╗██╔═══██╗██╔══██╗██╔══██╗██╔══██╗
-    ██║  ██║███████║███████╗███████║██████╔╝██║   ██║███████║██████╔╝██║  ██║
-    ██║  ██║██╔══██║╚════██║██╔══██║██╔══██╗██║   ██║██╔══██║██╔══██╗██║  ██║
-    ██████╔╝██║  ██║███████║██║  ██║██████╔╝╚██████╔╝██║  ██║██║  ██║██████╔╝
-    ╚═════╝ ╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝╚═════╝  ╚═════╝ ╚═╝  ╚═╝╚═╝  ╚═╝╚═════╝
+    ██████╗  █████╗ ███╗   ██╗██████╗  ██████╗ ███╗   ███╗
+    ██╔══██╗██╔══██╗████╗  ██║██╔══██╗██╔═══██╗████╗ ████║
+    ██████╔╝███████║██╔██╗ ██║██║  ██║██║   ██║██╔████╔██║
+    ██╔══██╗██╔══██║██║╚██╗██║██║  ██║██║   ██║██║╚██╔╝██║
+    ██║  ██║██║  ██║██║ ╚████║██████╔╝╚██████╔╝██║ ╚═╝ ██║
+    ╚═╝  ╚═╝╚═╝  ╚═╝╚═╝  ╚═══╝╚═════╝  ╚═════╝ ╚═╝     ╚═╝
     [/bold blue]""")
 
-    nav_bar("Dashboard")
+    nav_bar("Random")
+
+    options = [
+        "Generate Random Kanji",
+        "Filter by JLPT",
+        "Filter by Grade",
+        "-> Dashboard"]
+    choice = gui(options)
+
+    if choice == options[3]:
+        return "dashboard"
+
+    queries = get_kanji_queries()
+    filters = {}
+
+    # JLPT filter (N5 -> N1).
+    if choice == options[1]:
+        levels = [f"N{lvl}" for lvl in
+                  reversed(queries.levels("jlpt"))]
+        level = gui(levels, "JLPT Level:")
+        if level is None:
+            return "random"
+        filters["jlpt"] = int(level[1:])
+
+    # Grade filter.
+    elif choice == options[2]:
+        grades = [str(g) for g in queries.levels("grade")]
+        grade = gui(grades, "Grade:")
+        if grade is None:
+            return "random"
+        filters["grade"] = int(grade)
+
+    # Next kanji from a no-repeat shuffle of the filtered pool.
+    rk = queries.random(filters)
+
+    if rk is None:
+        failure_msg("No kanji match this filter.")
+        return "random"
+
+    console.print()
+
+    kun = rk["kun_readings"][0] if rk["kun_readings"] else "N/A"
+    on = rk["on_readings"][0] if rk["on_readings"] else "N/A"
+
+    kanji_table = Table("Kanji", "Meaning", "JLPT", "Kun", "On")
+    kanji_table.add_row(rk["kanji"], rk["heisig_en"],
+                        str(rk["jlpt"]), kun, on)
+
+    console.print(kanji_table, justify="center")
+    console.print()
+    return add_remove_kanji_to_db(rk, "random")
+
+    # TODO for later:
+    # Copy first result to clipboard?
+
+
+def user_help():
+    """
+    Allows users to explore a brief
+    overview of the features of Kanji Crow.
+    """
+
+    clear_terminal()
+    page_banner("""[bold green]
+        ██╗  ██╗███████╗██╗     ██████╗
+        ██║  ██║██╔════╝██║     ██╔══██╗
+        ███████║█████╗  ██║     ██████╔╝
+        ██╔══██║██╔══╝  ██║     ██╔═══╝
+    ██║  ██║███████╗███████╗██║
+    ╚═╝  ╚═╝╚══════╝╚══════╝╚═╝
+    [bold green]""")
+
+    nav_bar("Help")
+
+    # Help Sections:
+    options = [
+        "Review",
+        "Search",
+        "Random",
+        "-> Dashboard"]
+    choice = gui(options, "Select a feature to learn about:")
+
+    if choice == options[0]:
+        console.print()
+        console.print("[bold magenta]Select 'Review' to access " \
+                      "your Kanji review queue. Reviews are presented "
+                      "in flashcard format. Flip the card to see " \
+                      "additional details - e.g. pronunciation, " \
+                      "English meaning, JLPT ranking, and status. " \
+                      "Rate each card 'Again', 'Hard', 'Good' or 'Easy' " \
+                      "to schedule its next review; the most overdue " \
+                      "cards are shown first. Marking a card 'Known' " \
+                      "automatically removes it from your " \
+                      "review queue.[/bold magenta]")
+        console.print()
+        console.input(prompt="Press enter to continue...")
+        return "help"
+
+    if choice == options[1]:
+        console.print()
+        console.print("[bold magenta]Select 'Search' to find specific " \
+                      "kanji of interest. 'Kanji Lookup' allows users " \
+                      "to directly search-up a kanji. Users can add or "\
+                      "remove direct lookup results to or from their" \
+                      " review queue. 'English -> Kanji' search allows users" \
+                      " to search for kanji using an english keyword;" \
+                      " small typos are forgiven and the most common" \
+                      " kanji are listed first." \
+                      " 'Reading -> Kanji' finds kanji whose on, kun or" \
+                      " name readings start with the given kana." \
+                      "[/bold magenta]")
+
+        console.print()
+        console.input(prompt="Press enter to continue...")
+        return "help"
+
+    if choice == options[2]:
+        console.print()
+        console.print("[bold magenta]Select 'Random' to be served " \
+                      "a random kanji, optionally filtered by JLPT " \
+                      "level or grade. Random kanji results can be " \
+                      "added or removed to or from a user's review queue." \
+                      "[/bold magenta]")
+        console.print()
+        console.input(prompt="Press enter to continue...")
+        return "help"
+
+    return "dashboard"
+
+
+# Page routes -> page handlers.
+PAGES = {
+    "welcome": welcome_menu,
+    "register": register_user,
+    "login": login_user,
+    "dashboard": dashboard,
+    "review": kanji_reviewer,
+    "search": kanji_search,
+    "random": kanji_wildcard_search,
+    "help": user_help,
+}
+
+
+def run_pages(route: str = "welcome", max_steps: int = None):
+    """
+    Runs Kanji Crow's page loop. Each page handler returns the
+    route of the next page (None exits), so navigation never
+    grows the call stack. Returns the route it stopped at.
+    """
+
+    steps = 0
+
+    try:
+        while route is not None:
+            if max_steps is not None and steps >= max_steps:
+                break
+
+            with trace_span("page." + route):
+                route = PAGES[route]()
+            steps += 1
+
+    # Never drop buffered review results (incl. on Ctrl+C).
+    finally:
+        end_review_session()
+
+    return route
+
+
+@app.command("welcome-menu")
+def welcome_menu_command():
+    """
+    Kanji Crow Welcome Menu. Allows users to
+    login, register, or exit from the service.
+    """
+    run_pages("welcome")
+
+
+@app.command("register-user")
+def register_user_command():
+    """
+    Allows users to register for Kanji Crow.
+    Requires a valid email and password.
+    """
+    run_pages("register")
+
+
+@app.command()
+def migrate_users(src: str = USER_DATA_FP, dest: str = USER_DB_FP):
+    """
+    Imports users from a JSON user file into the SQLite user store.
+    """
+
+    with open(src, "r", encoding="utf-8") as file:
+        usdb = json.load(file)
+
+    store = SqliteUserStore(dest)
+    count = store.import_users(usdb)
+    store.close()
+
+    console.print(f"Imported {count} users into {dest}")
+
+
+@app.command()
+def upgrade_users(fp: str = USER_DATA_FP):
+    """
+    Rewrites a legacy JSON user file in the compact id-based layout.
+    The original file is kept alongside as a .bak copy.
+    """
+
+    with open(fp, "r", encoding="utf-8") as file:
+        usdb = json.load(file)
+
+    if usdb.get("format") == USER_FILE_FORMAT:
+        console.print(f"{fp} is already up to date")
+        return
+
+    os.replace(fp, fp + ".bak")
+    JsonUserStore(fp)._dump(upgrade_user_file(usdb))
+
+    console.print(f"Upgraded {len(usdb)} users in {fp}")
+
+
+@app.command()
+def bcrypt_bench(min_cost: int = 4, max_cost: int = 14, rounds: int = 3):
+    """
+    Benchmarks bcrypt on this host: hash time and hashes/sec per cost.
+    """
+
+    table = Table("Cost", "ms / hash", "Hashes / sec", title="bcrypt")
+    for cost in range(min_cost, max_cost + 1):
+        secs = time_bcrypt(cost, rounds)
+        table.add_row(str(cost), f"{secs * 1000:.1f}", f"{1 / secs:.1f}")
+
+    console.print(table)
+    console.print(f"Calibrated cost ({BCRYPT_TARGET_MS} ms target): "
+                  f"{calibrate_bcrypt_cost()}")
+
+
+def contention_worker(backend: str, fp: str, email: str, base: int,
+                      ops: int) -> int:
+    """
+    Adds `ops` unique synthetic cards to the review deck and removes
+    every other one again. Returns the write conflicts it hit.
+    """
+
+    if backend == "json":
+        store = JsonUserStore(fp)
+    else:
+        store = SqliteUserStore(fp)
+
+    for i in range(ops):
+        card = {"kanji": chr(base + i), "unicode": format(base + i, "X")}
+        store.add_card(email, "reviews", card)
+        if i % 2:
+            store.remove_card(email, "reviews", card)
+
+    if backend != "json":
+        store.close()
+        return 0
+    return store.conflicts
+
+
+@app.command()
+def contention_bench(procs: int = 4, ops: int = 50, backend: str = "json",
+                     fp: str = None):
+    """
+    Hammers one user store from several processes at once, then
+    checks that no update was lost.
+    """
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    suffix = ".json" if backend == "json" else ".db"
+    fp = fp or os.path.join(tempfile.mkdtemp(), "contention" + suffix)
+    email = "bench@example.com"
+
+    store = JsonUserStore(fp) if backend == "json" else SqliteUserStore(fp)
+    store.create_user(email, "")
 
-    fp = "dummy_cache/user_dummy_data.json"
-    with open(fp, 'r', encoding='utf-8') as usdb:
-        ud = json.load(usdb)
+    # Supplementary-plane codepoints never clash with real kanji.
+    bases = [0x20000 + n * ops for n in range(procs)]
+    ctx = multiprocessing.get_context("spawn")
 
-    # Get user specific data.
-    curr_user = session_email
-    known_kanji = len(ud[curr_user]["kanji_data"]["known"])
-    kanji_count = "Known: " + str(known_kanji) + " / " + "13108"
+    start = time.perf_counter()
+    with ProcessPoolExecutor(procs, mp_context=ctx) as pool:
+        conflicts = sum(pool.map(
+            contention_worker, [backend] * procs, [fp] * procs,
+            [email] * procs, bases, [ops] * procs))
+    secs = time.perf_counter() - start
 
-    stat_panel = Panel(
-        kanji_count,
-        title="Kanji Stats",
-        border_style="bright_blue"
-    )
+    expected = {base + i for base in bases for i in range(0, ops, 2)}
+    actual = {card_id(c) for c in store.get_cards(email, "reviews")}
+    lost = len(expected - actual) + len(actual - expected)
 
-    console.print(Align.center(stat_panel))
-    console.print()
+    table = Table("Metric", "Value", title=f"Contention ({backend})")
+    table.add_row("Processes", str(procs))
+    table.add_row("Writes", str(procs * (ops + ops // 2)))
+    table.add_row("Writes / sec", f"{procs * (ops + ops // 2) / secs:.1f}")
+    table.add_row("Conflicts retried", str(conflicts))
+    table.add_row("Lost updates", str(lost))
+    console.print(table)
 
-    pg = questionary.text("Input: ").ask()
-    navigate_to_page(pg, "dashboard")
+    if backend != "json":
+        store.close()
 
-    # TODO:
-    # Handle dashboard stats as Microservice
-    # ADD: RECENTLY LEARNED KANJI
 
+queue_app = typer.Typer(help="Bulk, non-interactive queue operations.")
+app.add_typer(queue_app, name="queue")
 
-def kanji_reviewer():
+QUEUE_DECKS = ("reviews", "known")
+EXPORT_FORMATS = ("txt", "jsonl", "json")
+
+
+def open_queue_store(email: str, deck: str):
     """
-    Enables users to review kanji in their
-    review queue in a flashcard format.
+    Returns the user store for a headless queue command, or exits
+    with an error if the user or deck does not exist.
     """
 
-    clear_terminal()
-    pg_banner = ("""[bold blue]
-    ██████╗ ███████╗██╗   ██╗██╗███████╗██╗    ██╗
-    ██╔══██╗██╔════╝██║   ██║██║██╔════╝██║    ██║
-    ██████╔╝█████╗  ██║   ██║██║█████╗  ██║ █╗ ██║
-    ██╔══██╗██╔══╝  ╚██╗ ██╔╝██║██╔══╝  ██║███╗██║
-    ██║  ██║███████╗ ╚████╔╝ ██║███████╗╚███╔███╔╝
-    ╚═╝  ╚═╝╚══════╝  ╚═══╝  ╚═╝╚══════╝ ╚══╝╚══╝
-    [/bold blue]""")
-    page_banner(pg_banner)
+    if deck not in QUEUE_DECKS:
+        console.print(f"[red]Unknown deck '{deck}'.[/red] "
+                      f"Use one of: {', '.join(QUEUE_DECKS)}")
+        raise typer.Exit(1)
 
-    nav_bar("Review")
+    store = get_user_store()
+    if not store.has_user(email):
+        console.print(f"[red]No user registered as {email}.[/red]")
+        raise typer.Exit(1)
 
-    fp = "dummy_cache/user_dummy_data.json"
-    with open(fp, 'r', encoding='utf-8') as usdb:
-        ud = json.load(usdb)
+    return store
 
-    # Get user specific data.
-    curr_user = session_email
-    user_reviews = ud[curr_user]["kanji_data"]["reviews"]
 
-    if len(user_reviews) > 0:
-        ck = random.choice(user_reviews)
-    else:
-        failure_msg("No kanji in review queue!")
-        navigate_to_page("Dashboard")
+def iter_kanji_file(fp: str):
+    """
+    Yields kanji from a text file: every non-space character, or
+    the "kanji" field of lines holding JSON objects (jsonl).
+    Lines starting with # are skipped.
+    """
 
-    kanji_char = Text(ck["kanji"], style="bold magenta", justify="center")
+    with open(fp, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                yield json.loads(line)["kanji"]
+            else:
+                yield from (ch for ch in line if not ch.isspace())
 
-    # Kanji Card (Front):
-    front_panel = Panel(
-        kanji_char,
-        width=20,
-        padding=(2, 5),
-        title="Front",
-        border_style="bright_blue"
-    )
 
-    # Review Queue:
-    rem_str = str(len(ud[curr_user]["kanji_data"]["reviews"]))
-    rem_reviews = Text(rem_str, style="bold magenta", justify="center")
+def select_kanji(kanji: list, jlpt: int = None, grade: int = None):
+    """
+    Resolves kanji characters and/or a JLPT/grade filter to dataset
+    entries. Returns (entries, characters not in the dataset).
+    """
 
-    review_queue = Panel(
-        rem_reviews,
-        title="Review Count",
-        border_style="bright_blue"
-    )
+    kanjis = get_kanji_repository().kanjis()
+    entries, missing, seen = [], [], set()
 
-    console.print(Align.center(front_panel))
-    console.print(Align.center(review_queue))
+    for kq in kanji:
+        if kq in seen:
+            continue
+        seen.add(kq)
 
-    console.input(prompt="Press enter to flip card!")
+        if kq in kanjis:
+            entries.append(kanjis[kq])
+        else:
+            missing.append(kq)
 
-    clear_terminal()
-    page_banner(pg_banner)
-    nav_bar("Review")
+    filters = {name: value for name, value in
+               (("jlpt", jlpt), ("grade", grade)) if value is not None}
+    if filters:
+        facets = get_facet_index()
+        for kq in facets.kanji(facets.select(**filters)):
+            if kq not in seen:
+                seen.add(kq)
+                entries.append(kanjis[kq])
 
-    kanji_info = Table(show_header=False, padding=(0, 2), box=None)
-    kanji_info.add_row("JLPT Level:", f"{ck['jlpt']}")
+    return entries, missing
 
-    meanings = ", ".join(ck["meanings"])
-    kanji_info.add_row("Keyword:", ck["heisig_en"])
-    kanji_info.add_row("Meanings:", meanings)
 
-    kun = ck["kun_readings"][0] if ck["kun_readings"] else "N/A"
-    on = ck["on_readings"][0] if ck["on_readings"] else "N/A"
-    kanji_info.add_row("On Reading", on)
-    kanji_info.add_row("Kun Reading", kun)
+def split_other_deck(store, email: str, deck: str, entries: list):
+    """
+    Splits entries into those that may join deck and those in the
+    user's other deck: as on the search page, a kanji is either
+    queued or known, never both.
+    """
 
-    card_group = Group(
-        kanji_char,
-        "",
-        kanji_info
-    )
+    other = "known" if deck == "reviews" else "reviews"
+    taken = {card["kanji"] for card in store.iter_cards(email, other)}
 
-    back_panel = Panel(
-        card_group,
-        width=40,
-        padding=(1, 2),
-        title=(f"Back: - Kanji Info: {ck['kanji']}"),
-        border_style="bright_blue",
-    )
+    free = [e for e in entries if e["kanji"] not in taken]
+    return free, [e["kanji"] for e in entries if e["kanji"] in taken]
 
-    console.print(Align.center(back_panel))
-    console.print(Align.center(review_queue))
 
-    options = [
-        "Good (Known)",
-        "Hard (Again)",
-        "-> Dashboard"]
-    choice = gui(options, "Rate Review:")
+def report_missing(missing: list):
+    if missing:
+        console.print(f"[yellow]Skipped {len(missing)} unknown kanji:"
+                      f"[/yellow] {''.join(missing[:50])}")
 
-    if choice == options[0]:
-        ud[curr_user]["kanji_data"]["known"].append(ck)
-        user_reviews.remove(ck)
-        success_msg(f"{ck['kanji']} removed from Review Queue")
 
-        with open(fp, 'w', encoding='utf-8') as usdb:
-            json.dump(ud, usdb, ensure_ascii=False, indent=4)
+def report_other_deck(deck: str, taken: list):
+    if taken:
+        other = "known" if deck == "reviews" else "reviews"
+        console.print(f"[yellow]Skipped {len(taken)} kanji already in "
+                      f"{other}:[/yellow] {''.join(taken[:50])} (remove "
+                      f"them with 'queue remove --deck {other}' first)")
 
-        navigate_to_page("Review")
 
-    elif choice == options[1]:
-        navigate_to_page("Review")
+@queue_app.command("add")
+def queue_add(kanji: List[str] = typer.Argument(None),
+              email: str = typer.Option(..., help="User to modify."),
+              deck: str = "reviews",
+              jlpt: int = None,
+              grade: int = None):
+    """
+    Adds kanji (given directly and/or by JLPT level or grade)
+    to a user's deck in a single transaction. Kanji in the user's
+    other deck are skipped.
+    """
 
-    else:
-        navigate_to_page("Dashboard")
+    store = open_queue_store(email, deck)
+    entries, missing = select_kanji("".join(kanji or []), jlpt, grade)
+    entries, taken = split_other_deck(store, email, deck, entries)
 
+    added = store.add_cards(email, deck, entries)
 
-def kanji_search():
+    report_missing(missing)
+    report_other_deck(deck, taken)
+    console.print(f"Added {added} kanji to {deck} "
+                  f"({len(entries) - added} already there)")
+
+
+@queue_app.command("remove")
+def queue_remove(kanji: List[str] = typer.Argument(None),
+                 email: str = typer.Option(..., help="User to modify."),
+                 deck: str = "reviews",
+                 jlpt: int = None,
+                 grade: int = None):
+    """
+    Removes kanji (given directly and/or by JLPT level or grade)
+    from a user's deck in a single transaction.
     """
-    Allows users to search for kanji directly using
-    the KanjiAPI or to search in English using a locally
-    cached download of the KanjiAPI.
 
-    Users can add or remove direct kanji lookup results
-    to their review queue from the search page.
+    store = open_queue_store(email, deck)
+    entries, missing = select_kanji("".join(kanji or []), jlpt, grade)
+
+    # Removal only needs the codepoint, not the dataset entry.
+    cards = entries + [{"kanji": kq} for kq in missing]
+    removed = store.remove_cards(email, deck, cards)
+
+    console.print(f"Removed {removed} kanji from {deck}")
+
+
+@queue_app.command("import")
+def queue_import(fp: str,
+                 email: str = typer.Option(..., help="User to modify."),
+                 deck: str = "reviews"):
+    """
+    Adds every kanji listed in a text or jsonl file to a user's
+    deck in a single transaction. Kanji in the user's other deck
+    are skipped.
     """
 
-    clear_terminal()
-    pg_banner = """[bold blue]
-    ███████╗███████╗ █████╗ ██████╗  ██████╗██╗  ██╗
-    ██╔════╝██╔════╝██╔══██╗██╔══██╗██╔════╝██║  ██║
-    ███████╗█████╗  ███████║██████╔╝██║     ███████║
-    ╚════██║██╔══╝  ██╔══██║██╔══██╗██║     ██╔══██║
-    ███████║███████╗██║  ██║██║  ██║╚██████╗██║  ██║
-    ╚══════╝╚══════╝╚═╝  ╚═╝╚═╝  ╚═╝ ╚═════╝╚═╝  ╚═╝
-    [/bold blue]"""
-    page_banner(pg_banner)
+    store = open_queue_store(email, deck)
+    entries, missing = select_kanji(iter_kanji_file(fp))
+    entries, taken = split_other_deck(store, email, deck, entries)
 
-    nav_bar("Search")
+    added = store.add_cards(email, deck, entries)
 
-    options = [
-        "Kanji Lookup",
-        "English to Kanji",
-        "-> Dashboard"]
-    choice = gui(options)
+    report_missing(missing)
+    report_other_deck(deck, taken)
+    console.print(f"Imported {added} kanji into {deck} "
+                  f"({len(entries) - added} already there)")
 
-    # Kanji Lookup.
-    if choice == options[0]:
 
-        # Get kanji input.
-        kq = questionary.text("Input: ").ask()
+@queue_app.command("export")
+def queue_export(email: str = typer.Option(..., help="User to export."),
+                 deck: str = "reviews",
+                 format: str = "jsonl",
+                 output: str = typer.Option(
+                     "-", "--output", "-o",
+                     help="Output file, or - for stdout.")):
+    """
+    Streams a user's deck out as plain kanji (txt), one JSON entry
+    per line (jsonl) or a JSON array (json).
+    """
 
-        # Check if valid query.
-        if not kq.strip():
-            failure_msg("Empty query. Try again.")
-            navigate_to_page("Search")
+    if format not in EXPORT_FORMATS:
+        console.print(f"[red]Unknown format '{format}'.[/red] "
+                      f"Use one of: {', '.join(EXPORT_FORMATS)}")
+        raise typer.Exit(1)
 
-        else:
+    store = open_queue_store(email, deck)
 
-            base_url = "https://kanjiapi.dev/v1"
-            url = f"{base_url}/kanji/{kq}"
-            response = requests.get(url)
+    out = sys.stdout
+    if output != "-":
+        out = open(output, "w", encoding="utf-8")
 
-            if response.status_code != 200:
-                failure_msg("No Result / API Error.")
+    try:
+        if format == "json":
+            out.write("[")
 
+        for n, card in enumerate(store.iter_cards(email, deck)):
+            if format == "txt":
+                out.write(card["kanji"] + "\n")
+            elif format == "jsonl":
+                out.write(json.dumps(card, ensure_ascii=False) + "\n")
             else:
+                out.write(("," if n else "") + "\n  "
+                          + json.dumps(card, ensure_ascii=False))
 
-                res = response.json()
+        if format == "json":
+            out.write("\n]\n")
 
-                # Handle JSON edge case issues:
-                kun = res["kun_readings"][0] if res["kun_readings"] else "N/A"
-                on = res["on_readings"][0] if res["on_readings"] else "N/A"
+    finally:
+        if out is not sys.stdout:
+            out.close()
 
-                # Build kanji search results table:
-                kanji_table = Table("Kanji", "Meaning", "JLPT", "Kun", "On")
-                kanji_table.add_row(res["kanji"], res["heisig_en"],
-                                    str(res["jlpt"]), kun, on)
 
-                # Render Table:
-                console.print(kanji_table, justify="center")
-                console.print()
+def profile_startup(top: int = 15) -> dict:
+    """
+    Measures a cold start in a fresh interpreter: the import cost of
+    each module Kanji Crow pulls in (via -X importtime) and the time
+    until the Welcome Menu's first frame is drawn. Raises
+    RuntimeError if the measured run fails.
+    """
 
-                # Prompt to add to db:
-                add_remove_kanji_to_db(res, "search")
+    import subprocess
+
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    code = ("import time; t0 = time.perf_counter(); "
+            f"import {module} as kc; t1 = time.perf_counter(); "
+            "kc.console.quiet = True; kc.draw_welcome_menu(); "
+            "print(t1 - t0, time.perf_counter() - t0)")
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True)
+
+    # The last stderr line is the child's exception, if any.
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+        raise RuntimeError(f"Startup run exited with {proc.returncode}: "
+                           f"{error}")
+
+    try:
+        import_s, frame_s = map(float, proc.stdout.split()[-2:])
+    except ValueError:
+        raise RuntimeError(f"Unexpected startup run output: "
+                           f"{proc.stdout.strip()[-200:]!r}")
+
+    # Lines look like "import time: self | cumulative |   name",
+    # with two spaces of indent per nesting level.
+    entries = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        entries.append((depth, parts[2].strip(), int(parts[1])))
+
+    # Direct imports of this module are the depth-1 entries just
+    # before its own depth-0 entry.
+    own = [i for i, e in enumerate(entries) if e[1] == module]
+    if not own:
+        raise RuntimeError(f"No import timing for '{module}' in the "
+                           "-X importtime output")
+
+    modules = {}
+    end = own[-1]
+    for depth, name, cumulative in reversed(entries[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            modules[name] = cumulative / 1000
+
+    ranked = sorted(modules.items(), key=lambda m: m[1], reverse=True)
+
+    table = Table("Module", "Import (ms)", title="Startup Profile")
+    for name, ms in ranked[:top]:
+        table.add_row(name, f"{ms:.1f}")
+    console.print(table)
+    console.print(f"Module import: {import_s * 1000:.1f} ms")
+    console.print(f"Time to first frame: {frame_s * 1000:.1f} ms")
+
+    return {"modules": dict(ranked),
+            "import_ms": import_s * 1000,
+            "first_frame_ms": frame_s * 1000}
 
-    # English -> Kanji
-    elif choice == options[1]:
 
-        fp = 'dummy_cache/kanji_dummy_data.json'
-        with open(fp, 'r', encoding='utf-8') as kapi:
-            kanji_data = json.load(kapi)
+@app.command()
+def user_service(addr: str = None,
+                 backend: str = USER_SERVICE_BACKEND, fp: str = None,
+                 flush_secs: float = USER_SERVICE_FLUSH_SECS):
+    """
+    Runs the local user data service until Ctrl+C / SIGTERM.
+    Point clients at it with KANJI_CROW_USER_STORE=service.
 
-        # Create Kanji API dictionary.
-        kd = kanji_data.get("kanjis", {})
+    It serves the same store a normal run uses ('sqlite' unless
+    KANJI_CROW_USER_STORE=json), so no data is split between them.
+    """
 
-        # Get user kanji query:
-        msg = "Input (Type 'quit' to END): "
-        kq = questionary.text(msg).ask().lstrip().strip().lower()
+    import asyncio
 
-        while True:
+    try:
+        service = UserService(backend, fp, flush_secs)
+        asyncio.run(service.serve(addr))
+    except KeyboardInterrupt:
+        pass
 
-            if not kq.strip():
-                failure_msg("Empty query. Try again.")
-                navigate_to_page("search")
-                break
 
-            # Terminate search commands:
-            if kq in ['Quit', 'quit', 'Q', 'q',]:
-                navigate_to_page("search")
-                break
+async def run_service_load(addr: str, clients: int, per_client: int,
+                           worker_setup, send):
+    """
+    Runs `clients` concurrent connections, each sending `per_client`
+    back-to-back requests via send(client, rng, state). Returns
+    (latencies in s, elapsed s).
+    """
 
-            # Init match list.
-            matching_kanji = []
+    import asyncio
 
-            # Parse kd for matching kanji.
-            for kanji, entry in kd.items():
+    latencies = []
 
-                # Get English 'Heisig' Keyword.
-                heisig_en = entry.get("heisig_en")
+    async def worker(n: int):
+        rng = random.Random(n)
+        client = await AsyncServiceClient().connect(addr)
+        state = await worker_setup(client, n)
 
-                # Check if not NULL and matches user kq:
-                if heisig_en and kq in heisig_en.lower():
-                    res = {
-                        'kanji': kanji,
-                        'heisig_en': heisig_en
-                    }
+        for _ in range(per_client):
+            start = time.perf_counter()
+            await send(client, rng, state)
+            latencies.append(time.perf_counter() - start)
 
-                    # Update match list.
-                    matching_kanji.append(res)
+        client.close()
 
-            # No matching kanji:
-            if not matching_kanji:
-                failure_msg("No matching kanji")
-                navigate_to_page("search")
-                break
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(clients)))
+    return latencies, time.perf_counter() - start
 
-            else:
 
-                # Result vars:
-                curr_res = 0
-                res_count = 3
-                tot_res = len(matching_kanji)
+def print_load_report(title: str, clients: int, latencies: list,
+                      secs: float, extra: dict = None):
+    ms = sorted(s * 1000 for s in latencies)
 
-                while curr_res < tot_res:
+    table = Table("Metric", "Value", title=title)
+    table.add_row("Clients", str(clients))
+    table.add_row("Requests", str(len(ms)))
+    for name, value in (extra or {}).items():
+        table.add_row(name, value)
+    table.add_row("Requests / sec", f"{len(ms) / secs:.0f}")
+    for q in (50, 95, 99):
+        table.add_row(f"p{q} latency", f"{percentile(ms, q):.3f} ms")
+    console.print(table)
 
-                    # Re-render page:
-                    clear_terminal()
-                    page_banner(pg_banner)
-                    nav_bar('search')
 
-                    # Limit results to 3 kanji per 'page.'
-                    end_res = min(curr_res + res_count, tot_res)
-                    for i in range(curr_res, end_res):
-                        kanji = matching_kanji[i]
-                        kanji_table = Table("Kanji", "Meaning")
-                        kanji_table.add_row(kanji['kanji'], kanji['heisig_en'])
-                        console.print(kanji_table, justify="center")
+async def user_load_setup(client, n: int) -> str:
+    email = f"load{n}@example.com"
+    await client.call("create_user", email, "")
+    return email
 
-                    curr_res += res_count
 
-                    if curr_res < tot_res:
-                        options = [
-                            "Yes",
-                            "No"]
-                        choice = gui(options, "Show more?")
+def user_load_request(write_ratio: float):
+    """
+    Returns a load-test request mixing reads with
+    write_ratio queue writes.
+    """
 
-                        if choice == options[1]:
-                            navigate_to_page("search")
-                            break
+    reads = ["get_stats", "has_user", "count_cards", "has_card"]
 
-                    else:
-                        console.print()
-                        failure_msg("End of results")
-                        navigate_to_page("search")
-                        break
+    async def send(client, rng, email: str):
+        kid = 0x4E00 + rng.randrange(2000)
+        card = {"kanji": chr(kid), "unicode": format(kid, "X")}
 
-    elif choice == options[2]:
-        navigate_to_page("dashboard")
+        if rng.random() < write_ratio:
+            op = rng.choice(["add_card", "remove_card"])
+            await client.call(op, email, "reviews", card)
+            return
 
-    # TODO:
-    # Handle API and local search (maybe?) as Microservice.
-    # Filter by JLPT
-    # Filter by grade
-    # Copy result to clipboard?
+        op = rng.choice(reads)
+        if op in ("get_stats", "has_user"):
+            await client.call(op, email)
+        elif op == "count_cards":
+            await client.call(op, email, "reviews")
+        else:
+            await client.call(op, email, "reviews", card)
 
-    navigate_to_page("search")  # Redundant
+    return send
 
 
-def kanji_wildcard_search():
+@app.command()
+def user_service_load(addr: str = None, clients: int = 32,
+                      per_client: int = 500, write_ratio: float = 0.2):
     """
-    Allows users to generate a random kanji
-    from a locally cached version of the KanjiAPI.
+    Load-tests a running user service: requests/sec and latency.
     """
 
-    clear_terminal()
-    page_banner("""[bold blue]
-    ██████╗  █████╗ ███╗   ██╗██████╗  ██████╗ ███╗   ███╗
-    ██╔══██╗██╔══██╗████╗  ██║██╔══██╗██╔═══██╗████╗ ████║
-    ██████╔╝███████║██╔██╗ ██║██║  ██║██║   ██║██╔████╔██║
-    ██╔══██╗██╔══██║██║╚██╗██║██║  ██║██║   ██║██║╚██╔╝██║
-    ██║  ██║██║  ██║██║ ╚████║██████╔╝╚██████╔╝██║ ╚═╝ ██║
-    ╚═╝  ╚═╝╚═╝  ╚═╝╚═╝  ╚═══╝╚═════╝  ╚═════╝ ╚═╝     ╚═╝
-    [/bold blue]""")
+    import asyncio
 
-    nav_bar("Random")
+    latencies, secs = asyncio.run(run_service_load(
+        addr or USER_SERVICE_ADDR, clients, per_client,
+        user_load_setup, user_load_request(write_ratio)))
 
-    options = [
-        "Generate Random Kanji", "-> Dashboard"]
-    choice = gui(options)
+    print_load_report("User Service Load Test", clients, latencies, secs,
+                      {"Writes": f"{write_ratio:.0%}"})
 
-    # Kanji Lookup.
-    if choice == options[0]:
 
-        fp = 'dummy_cache/kanji_dummy_data.json'
-        with open(fp, 'r', encoding='utf-8') as kapi:
-            kanji_data = json.load(kapi)
+@app.command()
+def query_service(addr: str = None, fp: str = KANJI_DATA_FP,
+                  batch_size: int = QUERY_BATCH_SIZE,
+                  batch_window: float = QUERY_BATCH_WINDOW,
+                  cache_size: int = QUERY_CACHE_SIZE):
+    """
+    Runs the kanji search/random/lookup service until Ctrl+C /
+    SIGTERM. Point clients at it with KANJI_CROW_QUERIES=service.
+    """
 
-        keys = list(kanji_data["kanjis"].keys())
+    import asyncio
 
-        while True:
+    service = QueryService(fp, batch_size, batch_window, cache_size)
+    try:
+        asyncio.run(service.serve(addr))
+    except KeyboardInterrupt:
+        pass
 
-            random_key = keys[random.randint(0, len(keys)-1)]
-            rk = kanji_data['kanjis'][random_key]
 
-            if rk.get('heisig_en'):
-                break
+# Common English queries for the load test; the rest are cold.
+QUERY_LOAD_WORDS = ("water", "fire", "tree", "person", "day", "mountain",
+                    "river", "sun", "moon", "gold", "one", "big", "small",
+                    "eye", "hand", "mouth", "heart", "rain", "white", "king")
 
-        console.print()
 
-        kun = rk["kun_readings"][0] if rk["kun_readings"] else "N/A"
-        on = rk["on_readings"][0] if rk["on_readings"] else "N/A"
+async def query_load_setup(client, n: int) -> list:
+    # Lookups use real kanji, drawn through the service itself.
+    return [(await client.call("random"))["kanji"] for _ in range(20)]
 
-        kanji_table = Table("Kanji", "Meaning", "JLPT", "Kun", "On")
-        kanji_table.add_row(rk["kanji"], rk["heisig_en"],
-                            str(rk["jlpt"]), kun, on)
 
-        console.print(kanji_table, justify="center")
-        console.print()
-        add_remove_kanji_to_db(rk, "random")
+def query_load_request(hot_ratio: float):
+    """
+    Returns a load-test request: English searches (hot_ratio of
+    them for common words), random draws and kanji lookups.
+    """
 
-    elif choice == options[1]:
-        navigate_to_page('dashboard')
+    letters = "abcdefghijklmnopqrstuvwxyz"
 
-    # TODO for later:
-    # Handle wildcard search as Microservice
-    # Filter by JLPT
-    # Filter by grade
-    # Copy first result to clipboard?
+    async def send(client, rng, pool: list):
+        roll = rng.random()
+        if roll < 0.7:
+            if rng.random() < hot_ratio:
+                kq = rng.choice(QUERY_LOAD_WORDS)
+            else:
+                kq = "".join(rng.choice(letters) for _ in range(3))
+            await client.call("search", kq)
+        elif roll < 0.85:
+            await client.call("random")
+        else:
+            await client.call("lookup", rng.choice(pool))
 
+    return send
 
-def user_help():
+
+@app.command()
+def query_service_load(addr: str = None, clients: int = 32,
+                       per_client: int = 500, hot_ratio: float = 0.8):
     """
-    Allows users to explore a brief
-    overview of the features of Kanji Crow.
+    Load-tests a running query service: requests/sec and latency.
     """
 
-    clear_terminal()
-    page_banner("""[bold green]
-        ██╗  ██╗███████╗██╗     ██████╗
-        ██║  ██║██╔════╝██║     ██╔══██╗
-        ███████║█████╗  ██║     ██████╔╝
-        ██╔══██║██╔══╝  ██║     ██╔═══╝
-    ██║  ██║███████╗███████╗██║
-    ╚═╝  ╚═╝╚══════╝╚══════╝╚═╝
-    [bold green]""")
+    import asyncio
 
-    nav_bar("Help")
+    latencies, secs = asyncio.run(run_service_load(
+        addr or QUERY_SERVICE_ADDR, clients, per_client,
+        query_load_setup, query_load_request(hot_ratio)))
 
-    # Help Sections:
-    options = [
-        "Review",
-        "Search",
-        "Random",
-        "-> Dashboard"]
-    choice = gui(options, "Select a feature to learn about:")
+    print_load_report("Query Service Load Test", clients, latencies, secs,
+                      {"Hot searches": f"{hot_ratio:.0%}"})
 
-    if choice == options[0]:
-        console.print()
-        console.print("[bold magenta]Select 'Review' to access " \
-                      "your Kanji review queue. Reviews are presented "
-                      "in flashcard format. Flip the card to see " \
-                      "additional details - e.g. pronunciation, " \
-                      "English meaning, JLPT ranking, and status. " \
-                      "Card status can be updated by selecting either "
-                      "'learning' or 'known.' Marking a card 'Known' " \
-                      "automatically removes it from your " \
-                      "review queue.[/bold magenta]")
-        console.print()
-        console.input(prompt="Press enter to continue...")
-        navigate_to_page("help")
 
-    if choice == options[1]:
-        console.print()
-        console.print("[bold magenta]Select 'Search' to find specific " \
-                      "kanji of interest. 'Kanji Lookup' allows users " \
-                      "to directly search-up a kanji. Users can add or "\
-                      "remove direct lookup results to or from their" \
-                      " review queue. 'English -> Kanji' search allows users" \
-                      " to search for kanji using an english keyword." \
-                      "[/bold magenta]")
+@app.command()
+def trace_summary(fp: str, top: int = 30):
+    """
+    Aggregates a --trace file: p50/p95 wall time, CPU time, bytes
+    and net memory change per span name, slowest total first.
+    """
 
-        console.print()
-        console.input(prompt="Press enter to continue...")
-        navigate_to_page("help")
+    spans = {}
+    with open(fp, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                span = json.loads(line)
+                spans.setdefault(span["name"], []).append(span)
 
-    if choice == options[2]:
-        console.print()
-        console.print("[bold magenta]Select 'Random' to be served " \
-                      "a random kanji. Random kanji results can be " \
-                      "added or removed to or from a user's review queue." \
-                      "[/bold magenta]")
-        console.print()
-        console.input(prompt="Press enter to continue...")
-        navigate_to_page("help")
+    table = Table(title=f"Trace Summary ({fp})")
+    table.add_column("Span", no_wrap=True)
+    for header in ("N", "Total ms", "p50 ms", "p95 ms", "CPU p50",
+                   "Read B", "Write B", "Mem Δ KB"):
+        table.add_column(header, justify="right")
 
-    if choice == options[3]:
-        navigate_to_page("dashboard")
+    ranked = sorted(spans.items(),
+                    key=lambda i: sum(s["ms"] for s in i[1]), reverse=True)
+
+    for name, group in ranked[:top]:
+        ms = sorted(s["ms"] for s in group)
+        cpu = sorted(s["cpu_ms"] for s in group)
+        read = sum(s.get("bytes_read", 0) for s in group) / len(group)
+        written = sum(s.get("bytes_written", 0) for s in group) / len(group)
+        mem = sum(s["mem_delta_bytes"] for s in group) / len(group) / 1024
+
+        table.add_row(name, str(len(group)), f"{sum(ms):.1f}",
+                      f"{percentile(ms, 50):.1f}", f"{percentile(ms, 95):.1f}",
+                      f"{percentile(cpu, 50):.1f}", f"{read:.0f}",
+                      f"{written:.0f}", f"{mem:.1f}")
+
+    console.print(table)
 
 
 @app.callback(invoke_without_command=True)
-def main():
-    welcome_menu()
+def main(ctx: typer.Context,
+         startup_profile: bool = typer.Option(
+             False, "--startup-profile",
+             help="Report per-module import cost and time-to-first-frame."),
+         trace: str = typer.Option(
+             None, "--trace",
+             help="Append per-page and I/O spans to this JSONL file.")):
+    if startup_profile:
+        try:
+            profile_startup()
+        except RuntimeError as err:
+            console.print(f"[red]Startup profile failed:[/red] {err}")
+            raise typer.Exit(1)
+        raise typer.Exit()
+
+    if trace:
+        start_tracing(trace)
+        ctx.call_on_close(stop_tracing)
+
+    if ctx.invoked_subcommand is None:
+        run_pages("welcome")
 
 
 if __name__ == '__main__':
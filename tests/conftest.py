@@ -0,0 +1,131 @@
+import http.server
+import threading
+import json
+import sys
+import os
+
+import pytest
+
+# The app is a single module at the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_entry(kanji: str, heisig_en: str = None, jlpt: int = None,
+               grade: int = None, freq: int = None, strokes: int = 4,
+               meanings: list = None, on: list = None, kun: list = None):
+    return {
+        "kanji": kanji,
+        "unicode": format(ord(kanji), "X"),
+        "heisig_en": heisig_en,
+        "meanings": meanings if meanings is not None else (
+            [heisig_en] if heisig_en else []),
+        "jlpt": jlpt,
+        "grade": grade,
+        "freq_mainichi_shinbun": freq,
+        "stroke_count": strokes,
+        "on_readings": on or [],
+        "kun_readings": kun or [],
+        "name_readings": [],
+    }
+
+
+KANJI = [
+    make_entry("日", "day", 5, 1, 1, meanings=["day", "sun", "Japan"],
+               on=["ニチ"], kun=["ひ"]),
+    make_entry("水", "water", 5, 1, 223, meanings=["water"],
+               on=["スイ"], kun=["みず"]),
+    make_entry("木", "tree", 5, 1, 317, meanings=["tree", "wood"],
+               on=["モク"], kun=["き"]),
+    make_entry("火", "fire", 5, 1, 574, meanings=["fire"],
+               on=["カ"], kun=["ひ"]),
+    make_entry("氷", "icicle", 2, 3, 1290, strokes=5,
+               meanings=["icicle", "ice", "freeze"],
+               on=["ヒョウ"], kun=["こおり"]),
+    make_entry("雨", "rain", 5, 1, 950, strokes=8, meanings=["rain"],
+               on=["ウ"], kun=["あめ"]),
+    # No keyword: still searchable by meaning, and a facet member.
+    make_entry("汐", None, 1, None, None, strokes=6,
+               meanings=["eventide", "tide"], on=["セキ"], kun=["しお"]),
+]
+
+
+@pytest.fixture
+def kanjis() -> dict:
+    return {e["kanji"]: dict(e) for e in KANJI}
+
+
+@pytest.fixture
+def kanji_fp(tmp_path, kanjis) -> str:
+    fp = tmp_path / "kanji.json"
+    fp.write_text(json.dumps({"kanjis": kanjis}, ensure_ascii=False),
+                  encoding="utf-8")
+    return str(fp)
+
+
+class StubServer:
+    """
+    Local HTTP server answering from a routes dict. A route is
+    (status, body) or a callable(handler) -> (status, headers, body).
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = []
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits.append(self.path)
+                route = stub.routes.get(self.path, (404, b""))
+                if callable(route):
+                    status, headers, body = route(self)
+                else:
+                    (status, body), headers = route, {}
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                     Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       args=(0.05,), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def http_stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def app_dir(tmp_path, kanjis, monkeypatch):
+    """
+    Runs the test inside a fresh app directory: the dataset at
+    KANJI_DATA_FP and an empty SQLite user store.
+    """
+
+    import kanji_crow_monolith as kc
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(kc.KANJI_DATA_FP))
+    with open(kc.KANJI_DATA_FP, "w", encoding="utf-8") as file:
+        json.dump({"kanjis": kanjis}, file, ensure_ascii=False)
+
+    store = kc.SqliteUserStore(kc.USER_DB_FP)
+    monkeypatch.setattr(kc, "_user_store", store)
+    yield store
+    store.close()
@@ -0,0 +1,120 @@
+import hashlib
+import os
+
+import pytest
+
+import kanji_crow_monolith as kc
+
+BODY = bytes(range(256)) * 40
+SHA = hashlib.sha256(BODY).hexdigest()
+ETAG = '"v1"'
+
+
+def serve_ranges(handler):
+    """
+    Answers like a static file server: honours Range when If-Range
+    matches the ETag, and 416 for a range starting at the end.
+    """
+
+    headers = {"ETag": ETAG}
+    spec = handler.headers.get("Range")
+    if not spec or handler.headers.get("If-Range") != ETAG:
+        return 200, headers, BODY
+
+    start = int(spec.split("=")[1].rstrip("-"))
+    if start >= len(BODY):
+        headers["Content-Range"] = f"bytes */{len(BODY)}"
+        return 416, headers, b""
+    headers["Content-Range"] = f"bytes {start}-{len(BODY) - 1}/{len(BODY)}"
+    return 206, headers, BODY[start:]
+
+
+@pytest.fixture
+def url(http_stub):
+    http_stub.routes["/kanjiapi.zip"] = serve_ranges
+    return http_stub.url + "/kanjiapi.zip"
+
+
+def write_partial(dest, data: bytes, etag: str = ETAG):
+    with open(dest + ".part", "wb") as file:
+        file.write(data)
+    with open(dest + ".part.etag", "w", encoding="utf-8") as file:
+        file.write(etag)
+
+
+def check_finished(dest):
+    with open(dest, "rb") as file:
+        assert file.read() == BODY
+    assert not os.path.exists(dest + ".part")
+    assert not os.path.exists(dest + ".part.etag")
+
+
+def test_fresh_download(url, tmp_path):
+    dest = str(tmp_path / "dl" / "kanjiapi.zip")
+    assert kc.stream_download(url, dest, SHA, chunk_size=1000) == SHA
+    check_finished(dest)
+
+
+def test_resumes_from_partial_file(url, tmp_path, http_stub):
+    ranges = []
+
+    def record(handler):
+        ranges.append(handler.headers.get("Range"))
+        return serve_ranges(handler)
+
+    http_stub.routes["/kanjiapi.zip"] = record
+    dest = str(tmp_path / "kanjiapi.zip")
+    write_partial(dest, BODY[:3000])
+
+    assert kc.stream_download(url, dest, SHA) == SHA
+    check_finished(dest)
+    assert ranges == ["bytes=3000-"]
+
+
+def test_changed_file_starts_over(url, tmp_path):
+    dest = str(tmp_path / "kanjiapi.zip")
+    write_partial(dest, b"stale bytes", etag='"v0"')
+
+    assert kc.stream_download(url, dest, SHA) == SHA
+    check_finished(dest)
+
+
+def test_416_means_already_complete(url, tmp_path, http_stub):
+    dest = str(tmp_path / "kanjiapi.zip")
+    write_partial(dest, BODY)
+
+    assert kc.stream_download(url, dest, SHA) == SHA
+    check_finished(dest)
+    assert http_stub.hits == ["/kanjiapi.zip"]
+
+
+def test_416_with_oversized_partial_is_discarded(url, tmp_path):
+    dest = str(tmp_path / "kanjiapi.zip")
+    write_partial(dest, BODY + b"extra")
+
+    with pytest.raises(ValueError):
+        kc.stream_download(url, dest, SHA)
+    assert not os.path.exists(dest + ".part")
+    assert not os.path.exists(dest + ".part.etag")
+
+
+def test_checksum_mismatch_discards_partial(url, tmp_path):
+    dest = str(tmp_path / "kanjiapi.zip")
+    write_partial(dest, b"x" * 3000)
+
+    with pytest.raises(ValueError):
+        kc.stream_download(url, dest, SHA)
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".part")
+    assert not os.path.exists(dest + ".part.etag")
+
+    # The next attempt starts from scratch and succeeds.
+    assert kc.stream_download(url, dest, SHA) == SHA
+    check_finished(dest)
+
+
+def test_http_errors_raise(http_stub, tmp_path):
+    http_stub.routes["/gone.zip"] = (500, b"")
+    with pytest.raises(kc.requests.HTTPError):
+        kc.stream_download(http_stub.url + "/gone.zip",
+                           str(tmp_path / "gone.zip"))
@@ -0,0 +1,117 @@
+import json
+
+from contextlib import contextmanager
+
+import pytest
+
+import kanji_crow_monolith as kc
+
+
+def test_legacy_stats_are_saved_on_first_read(tmp_path, kanjis,
+                                              monkeypatch):
+    fp = str(tmp_path / "users.json")
+    legacy = {"a@x.com": {"password": "pw", "kanji_data": {
+        "reviews": [kanjis["水"], kanjis["木"]],
+        "known": [kanjis["日"]],
+    }}}
+    with open(fp, "w", encoding="utf-8") as file:
+        json.dump(legacy, file, ensure_ascii=False)
+
+    store = kc.JsonUserStore(fp)
+    stats = store.get_stats("a@x.com")
+    assert stats["known"] == 1 and stats["backlog"] == 2
+
+    with open(fp, encoding="utf-8") as file:
+        saved = json.load(file)
+    assert saved["users"]["a@x.com"]["stats"] == stats
+
+    # Later reads use the saved counts instead of recounting.
+    calls = []
+    real = kc.build_user_stats
+    monkeypatch.setattr(kc, "build_user_stats",
+                        lambda *a: calls.append(a) or real(*a))
+    assert store.get_stats("a@x.com") == stats
+    assert not calls
+
+
+def test_upgrade_drops_duplicate_reviews_in_order(kanjis):
+    legacy = {"a@x.com": {"password": "pw", "kanji_data": {
+        "reviews": [kanjis[k] for k in "水木水火木"],
+        "known": [],
+    }}}
+
+    doc = kc.upgrade_user_file(legacy)
+    assert doc["users"]["a@x.com"]["kanji_data"]["reviews"] == \
+        [ord(k) for k in "水木火"]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = kc.JsonUserStore(str(tmp_path / "users.json"))
+    store.create_user("a@x.com", "pw")
+    store.due_index("a@x.com")
+    monkeypatch.setattr(kc.time, "sleep", lambda secs: None)
+    return store
+
+
+def lose_races(monkeypatch, store, n: int):
+    # Another process bumps the file's version just before each of
+    # the next n writes, so they conflict and retry.
+    real_lock = kc.file_lock
+    left = [n]
+
+    @contextmanager
+    def racing_lock(fp):
+        if left[0] > 0:
+            left[0] -= 1
+            doc = store._load()
+            doc["version"] = doc.get("version", 0) + 1
+            store._dump(doc)
+        with real_lock(fp):
+            yield
+
+    monkeypatch.setattr(kc, "file_lock", racing_lock)
+
+
+def count_index_updates(monkeypatch, store) -> list:
+    calls = []
+    real = store._index_update
+    monkeypatch.setattr(store, "_index_update",
+                        lambda *args: calls.append(args) or real(*args))
+    return calls
+
+
+def test_retried_write_updates_the_due_index_once(store, kanjis,
+                                                  monkeypatch):
+    calls = count_index_updates(monkeypatch, store)
+    lose_races(monkeypatch, store, 2)
+
+    store.add_card("a@x.com", "reviews", kanjis["水"])
+    assert store.conflicts == 2
+    assert len(calls) == 1
+    assert kc.card_id(kanjis["水"]) in store.due_index("a@x.com")
+
+    store.move_card("a@x.com", "reviews", "known", kanjis["水"])
+    assert len(calls) == 2
+    assert len(store.due_index("a@x.com")) == 0
+
+
+def test_failed_write_leaves_the_due_index_alone(store, kanjis,
+                                                 monkeypatch):
+    lose_races(monkeypatch, store, kc.JSON_WRITE_RETRIES)
+
+    with pytest.raises(kc.ConcurrentUpdateError):
+        store.add_card("a@x.com", "reviews", kanjis["水"])
+    assert len(store.due_index("a@x.com")) == 0
+    assert store.count_cards("a@x.com", "reviews") == 0
+
+
+def test_graduated_reviews_keep_queue_order(store, kanjis):
+    store.add_cards("a@x.com", "reviews", [kanjis[k] for k in "日水木火"])
+    store.commit_reviews("a@x.com", {}, [ord("水"), ord("火")])
+
+    assert [c["kanji"] for c in store.get_cards("a@x.com", "reviews")] == \
+        ["日", "木"]
+    assert store.has_card("a@x.com", "reviews", kanjis["木"])
+    assert not store.has_card("a@x.com", "reviews", kanjis["水"])
+    assert store.has_card("a@x.com", "known", kanjis["水"])
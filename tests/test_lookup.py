@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+import kanji_crow_monolith as kc
+
+WATER = {"kanji": "水", "heisig_en": "water", "jlpt": 5,
+         "kun_readings": ["みず"], "on_readings": ["スイ"]}
+
+
+def path(kq: str) -> str:
+    return "/kanji/" + kc.urllib.parse.quote(kq)
+
+
+@pytest.fixture
+def resolver(http_stub, tmp_path):
+    http_stub.routes[path("水")] = (200, json.dumps(WATER).encode())
+    http_stub.routes[path("木")] = (503, b"busy")
+    http_stub.routes[path("火")] = (200, b"<html>oops</html>")
+    http_stub.routes[path("雨")] = (200, b"[1, 2]")
+    return kc.KanjiResolver(base_url=http_stub.url,
+                            cache_dir=str(tmp_path / "lookups"))
+
+
+def test_hit_is_cached_in_memory_and_on_disk(resolver, http_stub):
+    assert resolver.lookup("水") == WATER
+    assert resolver.lookup("水") == WATER
+    assert http_stub.hits == [path("水")]
+    assert resolver.stats["network"] == 1
+    assert resolver.stats["memory"] == 1
+
+    # A fresh resolver reads the disk cache instead of the API.
+    again = kc.KanjiResolver(base_url=http_stub.url,
+                             cache_dir=resolver.cache_dir)
+    assert again.lookup("水") == WATER
+    assert again.stats["disk"] == 1
+    assert len(http_stub.hits) == 1
+
+
+def test_miss_is_cached(resolver, http_stub):
+    assert resolver.lookup("何") is None
+    assert resolver.lookup("何") is None
+    assert len(http_stub.hits) == 1
+    assert resolver.stats["errors"] == 0
+
+
+@pytest.mark.parametrize("kq", ["木", "火", "雨"],
+                         ids=["5xx", "not-json", "not-an-entry"])
+def test_errors_are_counted_not_cached(resolver, http_stub, kq):
+    assert resolver.lookup(kq) is None
+    assert resolver.lookup(kq) is None
+    assert resolver.stats["errors"] == 2
+    assert len(http_stub.hits) == 2
+    assert not os.path.exists(resolver._cache_path(kq))
+
+
+def test_unreachable_api_is_an_error(tmp_path):
+    resolver = kc.KanjiResolver(base_url="http://127.0.0.1:9",
+                                cache_dir=str(tmp_path), timeout=1)
+    assert resolver.lookup("水") is None
+    assert resolver.stats["errors"] == 1
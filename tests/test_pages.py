@@ -0,0 +1,87 @@
+import sys
+
+import pytest
+
+import kanji_crow_monolith as kc
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """
+    Replaces every page with a stub following a scripted route
+    list, recording the pages visited and their stack depth.
+    """
+
+    visits = []
+    script = {}
+
+    def depth():
+        frame, n = sys._getframe(), 0
+        while frame:
+            frame, n = frame.f_back, n + 1
+        return n
+
+    def page(name):
+        def handler():
+            visits.append((name, depth()))
+            return script[name].pop(0)
+        return handler
+
+    for name in list(kc.PAGES):
+        monkeypatch.setitem(kc.PAGES, name, page(name))
+
+    return visits, script
+
+
+class Session:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_routes_until_a_page_exits(pages):
+    visits, script = pages
+    script.update({"welcome": ["login", None], "login": ["dashboard"],
+                   "dashboard": ["search"], "search": ["welcome"]})
+
+    assert kc.run_pages("welcome") is None
+    assert [v[0] for v in visits] == \
+        ["welcome", "login", "dashboard", "search", "welcome"]
+
+
+def test_navigation_does_not_grow_the_stack(pages):
+    visits, script = pages
+    script["dashboard"] = ["help"] * 500
+    script["help"] = ["dashboard"] * 499 + [None]
+
+    kc.run_pages("dashboard")
+    assert len(visits) == 1000
+    assert len({depth for _, depth in visits}) == 1
+
+
+def test_max_steps_returns_the_next_route(pages):
+    visits, script = pages
+    script.update({"welcome": ["register"], "register": ["login"]})
+
+    assert kc.run_pages("welcome", max_steps=2) == "login"
+    assert len(visits) == 2
+
+
+def test_review_session_is_committed_on_interrupt(pages, monkeypatch):
+    _, script = pages
+    session = Session()
+    monkeypatch.setattr(kc, "_review_session", session)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    monkeypatch.setitem(kc.PAGES, "review", interrupted)
+    script["dashboard"] = ["review"]
+
+    with pytest.raises(KeyboardInterrupt):
+        kc.run_pages("dashboard")
+
+    assert session.commits == 1
+    assert kc._review_session is None
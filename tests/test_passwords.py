@@ -0,0 +1,57 @@
+import bcrypt
+
+import kanji_crow_monolith as kc
+
+
+def weak_hash(password, cost=4):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(cost)).decode()
+
+
+def test_rehash_when_cost_is_below_host(monkeypatch):
+    monkeypatch.setattr(kc, "_bcrypt_cost", 5)
+    valid, new_hash = kc.verify_password("Kanji4Crow", weak_hash("Kanji4Crow"))
+
+    assert valid
+    assert kc.hash_cost(new_hash) == 5
+    assert bcrypt.checkpw(b"Kanji4Crow", new_hash.encode())
+
+
+def test_no_rehash_at_current_cost(monkeypatch):
+    monkeypatch.setattr(kc, "_bcrypt_cost", 4)
+    assert kc.verify_password("Kanji4Crow", weak_hash("Kanji4Crow")) == \
+        (True, None)
+
+
+def test_wrong_password_is_never_rehashed(monkeypatch):
+    monkeypatch.setattr(kc, "_bcrypt_cost", 5)
+    assert kc.verify_password("Wrong4Crow", weak_hash("Kanji4Crow")) == \
+        (False, None)
+
+
+def fake_timings(monkeypatch, base, per_level):
+    # Cost-8 samples come from base; other costs scale per_level.
+    samples = iter(base)
+
+    def time_bcrypt(cost, rounds=1):
+        if cost == 8:
+            return next(samples)
+        return per_level * 2 ** (cost - 8)
+
+    monkeypatch.setattr(kc, "time_bcrypt", time_bcrypt)
+
+
+def test_calibration_ignores_one_slow_sample(monkeypatch):
+    # 1ms per cost-8 hash reaches 128ms at cost 15.
+    fake_timings(monkeypatch, [0.001, 0.05, 0.001, 0.001, 0.001], 0.001)
+    assert kc.calibrate_bcrypt_cost(250) == 15
+
+
+def test_calibration_checks_the_candidate_cost(monkeypatch):
+    # The estimate says 15, but real hashes there take 384ms.
+    fake_timings(monkeypatch, [0.001] * 5, 0.003)
+    assert kc.calibrate_bcrypt_cost(250) == 14
+
+
+def test_calibration_has_a_floor(monkeypatch):
+    fake_timings(monkeypatch, [1.0] * 5, 1.0)
+    assert kc.calibrate_bcrypt_cost(250) == kc.BCRYPT_MIN_COST
@@ -0,0 +1,51 @@
+from typer.testing import CliRunner
+
+import kanji_crow_monolith as kc
+
+runner = CliRunner()
+
+
+def queue(*args):
+    result = runner.invoke(kc.app, ["queue", *args, "--email", "a@x.com"])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def deck(store, name: str) -> str:
+    return "".join(card["kanji"] for card in store.get_cards("a@x.com", name))
+
+
+def test_add_by_jlpt_level(app_dir):
+    app_dir.create_user("a@x.com", "pw")
+    out = queue("add", "--jlpt", "5", "--grade", "1")
+    assert "Added 5 kanji" in out
+    assert deck(app_dir, "reviews") == "日水木火雨"
+
+    # Kanji without a keyword are selectable too.
+    queue("add", "--jlpt", "1")
+    assert deck(app_dir, "reviews").endswith("汐")
+
+
+def test_add_skips_kanji_in_the_other_deck(app_dir):
+    app_dir.create_user("a@x.com", "pw")
+    queue("add", "日水", "--deck", "known")
+
+    out = queue("add", "日水木")
+    assert "Skipped 2 kanji already in known" in out
+    assert deck(app_dir, "reviews") == "木"
+    assert deck(app_dir, "known") == "日水"
+
+    out = queue("add", "木火", "--deck", "known")
+    assert "Skipped 1 kanji already in reviews" in out
+    assert deck(app_dir, "known") == "日水火"
+
+
+def test_import_skips_known_kanji(app_dir, tmp_path):
+    app_dir.create_user("a@x.com", "pw")
+    queue("add", "氷", "--deck", "known")
+    fp = tmp_path / "list.txt"
+    fp.write_text("# my list\n氷雨\n", encoding="utf-8")
+
+    out = queue("import", str(fp))
+    assert "Imported 1 kanji" in out
+    assert deck(app_dir, "reviews") == "雨"
@@ -0,0 +1,48 @@
+import pytest
+
+import kanji_crow_monolith as kc
+from conftest import make_entry
+
+
+@pytest.mark.parametrize("text, folded", [
+    ("スイ", "すい"),
+    ("みず-", "みず"),
+    ("あ.がる", "あがる"),
+    ("-ヒョウ", "ひょう"),
+])
+def test_normalize_reading(text, folded):
+    assert kc.normalize_reading(text) == folded
+
+
+@pytest.fixture
+def trie(kanjis):
+    kanjis["上"] = make_entry("上", "above", on=["ジョウ"],
+                              kun=["うえ", "あ.がる", "あ.げる"])
+    kanjis["揚"] = make_entry("揚", "hoist", on=["ヨウ"], kun=["あ.げる"])
+    return kc.ReadingTrie(kanjis)
+
+
+def kanji(results) -> str:
+    return "".join(entry["kanji"] for entry in results)
+
+
+def test_prefix_search_in_dataset_order(trie):
+    assert kanji(trie.search("ひ")) == "日火氷"
+    assert kanji(trie.search("みず")) == "水"
+    assert kanji(trie.search("みずうみ")) == ""
+
+
+def test_katakana_and_markers_fold_to_the_same_reading(trie):
+    assert kanji(trie.search("スイ")) == kanji(trie.search("すい")) == "水"
+    assert kanji(trie.search("あげ")) == "上揚"
+    assert kanji(trie.search("あ.が")) == "上"
+
+
+def test_each_kanji_listed_once(trie):
+    # 上 has two readings under "あ"; 雨 one.
+    assert kanji(trie.search("あ")) == "雨上揚"
+
+
+def test_blank_query_matches_nothing(trie):
+    assert trie.search("") == []
+    assert trie.search("  ") == []
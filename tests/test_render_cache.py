@@ -0,0 +1,42 @@
+import io
+
+import pytest
+from rich.console import Console
+
+import kanji_crow_monolith as kc
+
+
+@pytest.fixture
+def console(monkeypatch):
+    console = Console(file=io.StringIO(), width=40, color_system=None)
+    monkeypatch.setattr(kc, "console", console)
+    monkeypatch.setattr(kc, "_render_cache", {})
+    return console
+
+
+def test_static_renders_once_per_width(console):
+    builds = []
+
+    def build():
+        builds.append(console.width)
+        return "Kanji Crow"
+
+    kc.print_static("banner", build)
+    kc.print_static("banner", build)
+    assert builds == [40]
+
+    console.width = 60
+    kc.print_static("banner", build)
+    kc.print_static("banner", build)
+    assert builds == [40, 60]
+
+
+def test_cached_output_matches_a_fresh_render(console):
+    kc.print_static("banner", lambda: "Kanji Crow")
+    kc.print_static("banner", lambda: "ignored")
+
+    first, second = console.file.getvalue().splitlines()
+    assert first == second
+    assert first.strip() == "Kanji Crow"
+    # Centered in the 40 column terminal.
+    assert first.index("K") == (40 - len("Kanji Crow")) // 2
@@ -0,0 +1,54 @@
+import json
+import os
+
+import kanji_crow_monolith as kc
+
+
+def bump_mtime(fp):
+    stat = os.stat(fp)
+    os.utime(fp, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_repeat_reads_are_served_from_memory(kanji_fp):
+    repo = kc.KanjiRepository(kanji_fp)
+    first = repo.kanjis()
+
+    assert repo.kanjis() is first
+    assert repo.stats == {"loads": 1, "hits": 1, "reloads": 0}
+
+
+def test_touched_but_unchanged_file_is_not_reparsed(kanji_fp):
+    repo = kc.KanjiRepository(kanji_fp)
+    first = repo.kanjis()
+    digest = repo.digest()
+
+    bump_mtime(kanji_fp)
+
+    assert repo.kanjis() is first
+    assert repo.digest() == digest
+    assert repo.stats["loads"] == 1
+
+
+def test_changed_file_is_reloaded(kanji_fp, kanjis):
+    repo = kc.KanjiRepository(kanji_fp)
+    digest = repo.digest()
+
+    del kanjis["汐"]
+    with open(kanji_fp, "w", encoding="utf-8") as file:
+        json.dump({"kanjis": kanjis}, file, ensure_ascii=False)
+    bump_mtime(kanji_fp)
+
+    assert repo.get("汐") is None
+    assert repo.get("日")["heisig_en"] == "day"
+    assert repo.digest() != digest
+    assert repo.stats["reloads"] == 1
+
+
+def test_shared_repository_follows_the_path(kanji_fp, tmp_path,
+                                           monkeypatch):
+    monkeypatch.setattr(kc, "_kanji_repository", None)
+    repo = kc.get_kanji_repository(kanji_fp)
+    assert kc.get_kanji_repository(kanji_fp) is repo
+
+    other = str(tmp_path / "other.json")
+    assert kc.get_kanji_repository(other) is not repo
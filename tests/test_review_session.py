@@ -0,0 +1,76 @@
+import pytest
+
+import kanji_crow_monolith as kc
+
+
+@pytest.fixture
+def store(tmp_path, kanjis):
+    store = kc.SqliteUserStore(str(tmp_path / "users.db"))
+    store.create_user("a@x.com", "pw")
+    store.add_cards("a@x.com", "reviews", list(kanjis.values()))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def commits(store, monkeypatch):
+    calls = []
+    real = store.commit_reviews
+    monkeypatch.setattr(store, "commit_reviews", lambda *args: (
+        calls.append(args) or real(*args)))
+    return calls
+
+
+def test_ratings_are_committed_every_checkpoint(store, commits, kanjis):
+    session = kc.ReviewSession(store, "a@x.com", checkpoint=3,
+                               checkpoint_secs=3600)
+    kids = [kc.card_id(entry) for entry in kanjis.values()]
+
+    session.rate(kids[0], "good")
+    session.rate(kids[1], "again")
+    assert not commits and session.pending() == 2
+
+    session.mark_known(kids[2])
+    assert len(commits) == 1 and session.pending() == 0
+
+    # The store now holds the batch.
+    saved = store.get_schedule("a@x.com")
+    assert saved[kids[0]]["reps"] == 1
+    assert kids[2] not in saved
+    assert store.has_card("a@x.com", "known", kanjis["木"])
+
+
+def test_ratings_are_committed_after_checkpoint_secs(store, commits,
+                                                     kanjis, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(kc.time, "time", lambda: clock[0])
+    session = kc.ReviewSession(store, "a@x.com", checkpoint=100,
+                               checkpoint_secs=60)
+    kid = kc.card_id(kanjis["日"])
+
+    session.rate(kid, "good")
+    assert not commits
+    clock[0] += 61
+    session.rate(kid, "good")
+    assert len(commits) == 1
+    assert store.get_schedule("a@x.com")[kid]["reps"] == 2
+
+
+def test_ending_the_session_flushes_the_rest(store, commits, kanjis,
+                                             monkeypatch):
+    monkeypatch.setattr(kc, "_user_store", store)
+    monkeypatch.setattr(kc, "_review_session", None)
+
+    session = kc.get_review_session("a@x.com")
+    assert kc.get_review_session("a@x.com") is session
+    session.rate(kc.card_id(kanjis["水"]), "easy")
+    assert not commits
+
+    kc.end_review_session()
+    assert len(commits) == 1
+    assert kc._review_session is None
+
+    # Nothing buffered: no empty transaction.
+    kc.get_review_session("a@x.com")
+    kc.end_review_session()
+    assert len(commits) == 1
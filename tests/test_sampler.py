@@ -0,0 +1,43 @@
+import pytest
+
+import kanji_crow_monolith as kc
+
+
+@pytest.fixture
+def sampler(kanji_fp):
+    return kc.get_kanji_sampler(kanji_fp)
+
+
+def test_only_keyword_kanji_are_eligible(sampler):
+    assert sampler.pool() == ["日", "水", "木", "火", "氷", "雨"]
+    assert sampler.pool(jlpt=1) == []
+    assert sampler.draw(jlpt=1) is None
+    # Levels without eligible kanji are not offered.
+    assert sampler.levels("jlpt") == [2, 5]
+    assert sampler.levels("grade") == [1, 3]
+
+
+def test_pools_follow_facet_filters(sampler):
+    assert sampler.pool(jlpt=5, grade=None) == ["日", "水", "木", "火", "雨"]
+    assert sampler.pool(strokes=[5, 8]) == ["氷", "雨"]
+    assert sampler.pool(jlpt=5, grade=3) == []
+    assert sampler.draw(jlpt=5, grade=3) is None
+
+
+def test_cursor_draws_without_repeats(sampler):
+    drawn = sampler.draw_unique(5, jlpt=5)
+    assert sorted(k["kanji"] for k in drawn) == sorted("日水木火雨")
+    assert sampler.cursor(jlpt=5) is sampler.cursor(jlpt=5, grade=None)
+
+
+@pytest.mark.parametrize("choice", ["Filter by JLPT", "Filter by Grade"])
+def test_cancelled_level_prompt_returns_to_random(kanji_fp, monkeypatch,
+                                                  choice):
+    answers = iter([choice, None])
+    monkeypatch.setattr(kc, "gui", lambda *a: next(answers))
+    monkeypatch.setattr(kc, "clear_terminal", lambda: None)
+    monkeypatch.setattr(kc, "get_kanji_queries",
+                        lambda: kc.KanjiQueries(kanji_fp))
+    monkeypatch.setattr(kc.console, "print", lambda *a, **kw: None)
+
+    assert kc.kanji_wildcard_search() == "random"
@@ -0,0 +1,81 @@
+import pytest
+
+import kanji_crow_monolith as kc
+
+NOW = 1_000_000.0
+
+
+def rate(sched, *ratings, now=NOW):
+    for rating in ratings:
+        sched = kc.sm2_schedule(sched, rating, now)
+    return sched
+
+
+def test_new_card_is_due_now():
+    assert kc.new_schedule(NOW) == {"ease": 2.5, "interval": 0,
+                                    "due": NOW, "reps": 0}
+
+
+def test_good_ratings_grow_the_interval():
+    first = rate(kc.new_schedule(NOW), "good")
+    assert first == {"ease": 2.5, "interval": 1,
+                     "due": NOW + kc.DAY, "reps": 1}
+
+    second = rate(first, "good")
+    assert second["interval"] == 6 and second["reps"] == 2
+
+    third = rate(second, "good")
+    assert third["interval"] == pytest.approx(6 * 2.5)
+    assert third["due"] == pytest.approx(NOW + 15 * kc.DAY)
+
+
+def test_easy_and_hard_move_the_ease():
+    learned = rate(kc.new_schedule(NOW), "good", "good")
+
+    easy = rate(learned, "easy")
+    assert easy["ease"] == pytest.approx(2.6)
+    assert easy["interval"] == pytest.approx(6 * 2.6)
+
+    hard = rate(learned, "hard")
+    assert hard["ease"] == pytest.approx(2.36)
+    assert hard["interval"] == pytest.approx(6 * 1.2)
+
+
+def test_again_relearns_shortly():
+    learned = rate(kc.new_schedule(NOW), "good", "good", "good")
+    lapsed = rate(learned, "again")
+    assert lapsed["reps"] == 0 and lapsed["interval"] == 0
+    assert lapsed["due"] == NOW + kc.SM2_RELEARN_DELAY
+    assert lapsed["ease"] == pytest.approx(2.5 - 0.54)
+
+    # Relearning starts the interval ladder over.
+    assert rate(lapsed, "good")["interval"] == 1
+
+
+def test_ease_has_a_floor():
+    sched = rate(kc.new_schedule(NOW), *["again"] * 10)
+    assert sched["ease"] == kc.SM2_MIN_EASE
+
+
+def test_unknown_rating_is_rejected():
+    with pytest.raises(KeyError):
+        kc.sm2_schedule(kc.new_schedule(NOW), "meh", NOW)
+
+
+def test_due_index_serves_most_overdue_first():
+    index = kc.DueIndex({
+        1: kc.new_schedule(NOW - 50),
+        2: kc.new_schedule(NOW - 100),
+        3: kc.new_schedule(NOW + 100),
+    })
+    assert index.due_count(NOW) == 2
+    assert index.next_due(NOW) == 2
+    assert index.next_due_time() == NOW + 100
+
+    # Rating reschedules; the stale heap entry is skipped.
+    index.update(2, rate(index.schedule[2], "good"))
+    assert index.next_due(NOW) == 1
+    index.remove(1)
+    assert index.next_due(NOW) is None
+    assert index.due_count(NOW + 200) == 1
+    assert index.next_due(NOW + 200) == 3
@@ -0,0 +1,176 @@
+import pytest
+
+import kanji_crow_monolith as kc
+from conftest import make_entry
+
+
+@pytest.fixture
+def queries(kanji_fp):
+    return kc.KanjiQueries(kanji_fp)
+
+
+def test_paging_ranks_each_match_once(queries, kanji_fp, monkeypatch):
+    ranked = []
+    real = kc.EnglishSearchIndex.ranked
+
+    def counting(self, kq):
+        for d in real(self, kq):
+            ranked.append(d)
+            yield d
+
+    monkeypatch.setattr(kc.EnglishSearchIndex, "ranked", counting)
+
+    everything = [k["kanji"] for k in queries.search("i")]
+    assert len(everything) > 2
+    ranked.clear()
+
+    pager = kc.KanjiQueries(kanji_fp)
+    pages = []
+    for offset in range(0, len(everything) + 2, 2):
+        pages += [k["kanji"] for k in pager.search("i", None, 2, offset)]
+
+    assert pages == everything
+    assert len(ranked) == len(everything)
+
+
+def test_cursor_keeps_only_the_last_page(queries, kanji_fp):
+    everything = kc.KanjiQueries(kanji_fp).search("e")
+    assert len(everything) > 4
+
+    assert queries.search("e", None, 2, 2) == everything[2:4]
+    [(_, _, pos, start, page)] = queries._cursors.values()
+    assert (pos, start, page) == (4, 2, everything[2:4])
+
+    # Asked again, then backwards and jumping ahead.
+    assert queries.search("e", None, 1, 3) == everything[3:4]
+    assert queries.search("e", None, 2, 0) == everything[:2]
+    assert queries.search("e", None, 2, 3) == everything[3:5]
+    assert queries.search("e", None, 2, 100) == []
+
+
+def test_paging_with_filters_matches_full_search(queries):
+    filters = {"jlpt": 5}
+    full = queries.search("e", filters)
+    assert full and all(k["kanji"] in "日水木火雨" for k in full)
+    assert queries.search("e", filters, 1, 1) == full[1:2]
+    assert queries.search("e", {"jlpt": 2}, 5) != full[:5]
+
+
+@pytest.mark.parametrize("text, filters", [
+    ("", {}),
+    (None, {}),
+    ("jlpt=3", {"jlpt": 3}),
+    ("grade<=6", {"grade": (None, 6)}),
+    ("freq>=100", {"freq": (100, None)}),
+    ("freq<500", {"freq": (None, 499)}),
+    ("strokes>9", {"strokes": (10, None)}),
+    ("strokes=10-14", {"strokes": (10, 14)}),
+    ("JLPT=2, grade=1", {"jlpt": 2, "grade": 1}),
+])
+def test_parse_facet_filters(text, filters):
+    assert kc.parse_facet_filters(text) == filters
+
+
+@pytest.mark.parametrize("text, message", [
+    ("level=3", "Invalid filter 'level=3'"),
+    ("jlpt", "Invalid filter 'jlpt'"),
+    ("jlpt=x", "Invalid number in filter 'jlpt=x'"),
+    ("strokes=3-", "Invalid number"),
+])
+def test_parse_facet_filters_rejects(text, message):
+    with pytest.raises(ValueError, match=message):
+        kc.parse_facet_filters(text)
+
+
+class Prompt:
+    # questionary.text stand-in answering from a list.
+    asked = []
+
+    def __init__(self, message, answers):
+        self.message, self.answers = message, answers
+
+    def ask(self):
+        Prompt.asked.append(self.message)
+        return self.answers.pop(0)
+
+
+@pytest.mark.parametrize("answers, prompts", [
+    (["quit"], 1),
+    ([""], 1),
+    (["water", None], 2),
+    (["water", "jlpt=x"], 2),
+])
+def test_english_search_prompts(kanji_fp, monkeypatch, answers, prompts):
+    Prompt.asked = []
+    expected = [("水", "water")] if answers[1:] == [None] else []
+    monkeypatch.setattr(kc.questionary, "text",
+                        lambda message: Prompt(message, answers))
+    monkeypatch.setattr(kc, "gui", lambda *a: "English to Kanji")
+    monkeypatch.setattr(kc, "clear_terminal", lambda: None)
+    monkeypatch.setattr(kc.console, "print", lambda *a, **kw: None)
+    monkeypatch.setattr(kc.console, "input", lambda prompt="": "")
+    monkeypatch.setattr(kc, "get_kanji_queries",
+                        lambda: kc.KanjiQueries(kanji_fp))
+    shown = []
+    monkeypatch.setattr(kc, "show_result_pages",
+                        lambda banner, headers, rows: shown.extend(rows))
+
+    assert kc.kanji_search() == "search"
+    assert len(Prompt.asked) == prompts
+    assert shown == expected
+
+
+@pytest.mark.parametrize("a, b, dist", [
+    ("water", "water", 0),
+    ("water", "wafer", 1),
+    ("water", "watre", 1),
+    ("water", "waters", 1),
+    ("water", "ater", 1),
+    ("water", "wtaer", 1),
+    ("water", "wader", 1),
+    ("water", "otter", 2),
+])
+def test_edit_distance(a, b, dist):
+    assert kc.edit_distance(a, b, 2) == dist
+    assert kc.edit_distance(b, a, 2) == dist
+
+
+def test_edit_distance_stops_past_the_bound():
+    assert kc.edit_distance("water", "fire", 1) == 2
+    assert kc.edit_distance("a", "abcdef", 2) == 3
+    assert kc.edit_distance("abcdef", "uvwxyz", 2) == 3
+
+
+def test_ranked_tiers():
+    entries = [
+        make_entry("雨", "rain", freq=10),
+        make_entry("虹", "rainbow", freq=20),
+        make_entry("軌", "rail", freq=1),
+        make_entry("粒", "grain", freq=40),
+        make_entry("脳", "brain", freq=30),
+        make_entry("火", "fire", freq=2),
+    ]
+    index = kc.EnglishSearchIndex.build({e["kanji"]: e for e in entries})
+
+    # Exact word, then prefix, then substring (common first),
+    # then typos, even though "rail" is the most common kanji.
+    assert [r["kanji"] for r in index.search("rain")] == list("雨虹脳粒軌")
+    assert [r["kanji"] for r in index.search("rain", 2)] == list("雨虹")
+    assert index.search("Rain".lower())[0] == {"kanji": "雨",
+                                               "heisig_en": "rain"}
+    assert index.search("") == []
+    assert index.search("snow") == []
+
+
+def test_typo_bounds_depend_on_query_length(queries):
+    def kanji(kq):
+        return [k["kanji"] for k in queries.search(kq)]
+
+    # Below SEARCH_FUZZY_MIN_LEN letters there is no typo matching.
+    assert kanji("fyr") == []
+    assert kanji("fyre") == ["火"]
+
+    # One edit (a swap) for short words, two for long ones.
+    assert kanji("icilce") == ["氷"]
+    assert kanji("icilxe") == []
+    assert kanji("evnetidd") == ["汐"]
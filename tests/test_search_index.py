@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+import kanji_crow_monolith as kc
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """
+    Counts EnglishSearchIndex.build calls.
+    """
+
+    calls = []
+    build = kc.EnglishSearchIndex.build.__func__
+
+    def counted(cls, kanjis):
+        calls.append(len(kanjis))
+        return build(cls, kanjis)
+
+    monkeypatch.setattr(kc.EnglishSearchIndex, "build",
+                        classmethod(counted))
+    monkeypatch.setattr(kc, "_kanji_repository", None)
+    return calls
+
+
+def rewrite(fp, kanjis):
+    with open(fp, "w", encoding="utf-8") as file:
+        json.dump({"kanjis": kanjis}, file, ensure_ascii=False)
+    # Make sure the signature moves even on coarse-mtime filesystems.
+    stat = os.stat(fp)
+    os.utime(fp, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_index_is_built_once_and_persisted(kanji_fp, builds):
+    index = kc.load_search_index(kanji_fp)
+    assert builds == [7]
+    assert os.path.exists(kc.search_index_path(kanji_fp))
+
+    reloaded = kc.load_search_index(kanji_fp)
+    assert builds == [7]
+    assert reloaded.search("water") == index.search("water")
+
+
+def test_changed_dataset_rebuilds_the_index(kanji_fp, kanjis, builds):
+    kc.load_search_index(kanji_fp)
+
+    kanjis["水"]["heisig_en"] = "aqua"
+    kanjis["水"]["meanings"] = ["aqua"]
+    rewrite(kanji_fp, kanjis)
+
+    index = kc.load_search_index(kanji_fp)
+    assert len(builds) == 2
+    assert index.search("water") == []
+    assert index.search("aqua")[0]["kanji"] == "水"
+
+
+def test_old_index_version_is_rebuilt(kanji_fp, builds):
+    kc.load_search_index(kanji_fp)
+
+    ipath = kc.search_index_path(kanji_fp)
+    with open(ipath, encoding="utf-8") as file:
+        saved = json.load(file)
+    saved["version"] = kc.SEARCH_INDEX_VERSION - 1
+    with open(ipath, "w", encoding="utf-8") as file:
+        json.dump(saved, file)
+
+    kc.load_search_index(kanji_fp)
+    assert len(builds) == 2
+    with open(ipath, encoding="utf-8") as file:
+        assert json.load(file)["version"] == kc.SEARCH_INDEX_VERSION
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import socket
+
+import pytest
+
+import kanji_crow_monolith as kc
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="needs Unix sockets")
+
+
+def with_service(service, addr: str, client):
+    """
+    Runs service.serve(addr) on an event loop and client() on a
+    worker thread against it; returns client's result.
+    """
+
+    async def main():
+        task = asyncio.create_task(service.serve(addr))
+        while not os.path.exists(addr):
+            if task.done():
+                task.result()
+            await asyncio.sleep(0.01)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, client)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+def raw_exchange(addr: str, *lines: bytes) -> list:
+    sock = kc.connect_service(addr)
+    with sock, sock.makefile("rwb") as file:
+        replies = []
+        for line in lines:
+            file.write(line + b"\n")
+            file.flush()
+            replies.append(json.loads(file.readline()))
+        return replies
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "json"])
+def test_user_service_round_trip(tmp_path, kanjis, backend):
+    fp = str(tmp_path / ("users.db" if backend == "sqlite" else "users.json"))
+    addr = str(tmp_path / "users.sock")
+    service = kc.UserService(backend, fp, flush_secs=0.05)
+
+    def client():
+        store = kc.UserServiceClient(addr)
+        try:
+            assert store.create_user("a@x.com", "pw")
+            assert not store.create_user("a@x.com", "other")
+            assert store.get_password("a@x.com") == "pw"
+
+            store.add_cards("a@x.com", "reviews",
+                            [kanjis["水"], kanjis["木"]])
+            store.move_card("a@x.com", "reviews", "known", kanjis["木"])
+            assert [c["kanji"] for c in store.iter_cards(
+                "a@x.com", "reviews")] == ["水"]
+            assert store.has_card("a@x.com", "known", kanjis["木"])
+
+            kid = kc.card_id(kanjis["水"])
+            assert list(store.get_schedule("a@x.com")) == [kid]
+            store.commit_reviews("a@x.com", {}, [kid])
+            assert store.get_stats("a@x.com")["known"] == 2
+
+            with pytest.raises(kc.ServiceError, match="Error: "):
+                store.get_card(123)
+        finally:
+            store.close()
+
+    with_service(service, addr, client)
+
+    # The data outlives the service, in the store it was serving.
+    saved = kc.open_user_store(backend, fp)
+    assert saved.count_cards("a@x.com", "known") == 2
+    assert not os.path.exists(addr)
+
+
+def test_user_service_answers_malformed_requests(tmp_path):
+    addr = str(tmp_path / "users.sock")
+    service = kc.UserService("sqlite", str(tmp_path / "users.db"))
+
+    replies = with_service(service, addr, lambda: raw_exchange(
+        addr, b"not json", b'["op"]', b'{"id": 7, "op": "drop_all"}',
+        b'{"id": 8, "op": "has_user", "args": ["a@x.com"]}'))
+
+    assert [r["ok"] for r in replies] == [False, False, False, True]
+    assert replies[2] == {"id": 7, "ok": False, "error":
+                          "ValueError: Unknown operation 'drop_all'"}
+    assert replies[3] == {"id": 8, "ok": True, "result": False}
+
+
+def test_query_service_round_trip(kanji_fp, tmp_path):
+    addr = str(tmp_path / "queries.sock")
+    service = kc.QueryService(kanji_fp)
+
+    def client():
+        queries = kc.QueryServiceClient(addr)
+        try:
+            assert queries.total() == 7
+            assert queries.levels("jlpt") == [2, 5]
+            assert queries.lookup("水")["heisig_en"] == "water"
+            assert queries.random({"jlpt": 1}) is None
+            assert queries.random({"jlpt": 2})["kanji"] == "氷"
+            assert queries.random({"jlpt": 4}) is None
+            assert [k["kanji"] for k in queries.reading("みず")] == ["水"]
+
+            # Paged a chunk at a time, same order as one big search.
+            full = queries.search("e", None)
+            paged = list(queries.iter_search("e", None, chunk=2))
+            assert paged == full and len(full) > 2
+
+            with pytest.raises(kc.ServiceError, match="TypeError"):
+                queries.client.call("total", 1)
+            return raw_exchange(addr, b"{", b'{"op": "drop"}')
+        finally:
+            queries.close()
+
+    replies = with_service(service, addr, client)
+    assert [r["ok"] for r in replies] == [False, False]
+    assert "Unknown operation 'drop'" in replies[1]["error"]
+    assert service.stats["errors"] == 3
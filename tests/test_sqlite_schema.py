@@ -0,0 +1,225 @@
+import sqlite3
+import json
+import os
+
+import pytest
+
+import kanji_crow_monolith as kc
+from conftest import make_entry
+
+WATER = make_entry("水", "water", 5, 1, 223)
+TREE = make_entry("木", "tree", 5, 1, 317)
+FIRE = make_entry("火", "fire", 5, 1, 574)
+
+V1_SCHEMA = """
+    CREATE TABLE users (email TEXT PRIMARY KEY, password TEXT NOT NULL);
+    CREATE TABLE cards (
+        email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+        deck TEXT NOT NULL,
+        card_key TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (email, deck, card_key)
+    );
+"""
+
+V2_SCHEMA = """
+    CREATE TABLE users (
+        email TEXT PRIMARY KEY, password TEXT NOT NULL, known BLOB);
+    CREATE TABLE reviews (
+        email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+        kanji_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        PRIMARY KEY (email, kanji_id)
+    );
+    CREATE INDEX reviews_by_position ON reviews (email, position);
+    CREATE TABLE kanji_cards (kanji_id INTEGER PRIMARY KEY,
+                              data TEXT NOT NULL);
+"""
+
+
+def make_v1(fp):
+    conn = sqlite3.connect(fp)
+    conn.executescript(V1_SCHEMA)
+    conn.execute("INSERT INTO users VALUES ('a@x.com', 'pw')")
+    for pos, (deck, card) in enumerate([("reviews", WATER),
+                                        ("reviews", TREE),
+                                        ("known", FIRE)]):
+        conn.execute("INSERT INTO cards VALUES (?, ?, ?, ?, ?)",
+                     ("a@x.com", deck, card["kanji"], pos,
+                      json.dumps(card, ensure_ascii=False)))
+    conn.commit()
+    conn.close()
+
+
+def make_v2(fp, version: int = 2):
+    conn = sqlite3.connect(fp)
+    conn.executescript(V2_SCHEMA)
+    if version == 3:
+        conn.executescript("""
+            ALTER TABLE reviews ADD COLUMN ease REAL NOT NULL DEFAULT 2.5;
+            ALTER TABLE reviews ADD COLUMN interval REAL NOT NULL DEFAULT 0;
+            ALTER TABLE reviews ADD COLUMN due REAL NOT NULL DEFAULT 0;
+            ALTER TABLE reviews ADD COLUMN reps INTEGER NOT NULL DEFAULT 0;
+        """)
+    known = kc.KnownSet()
+    known.add(kc.card_id(FIRE))
+    conn.execute("INSERT INTO users VALUES ('a@x.com', 'pw', ?)",
+                 (known.to_bytes(),))
+    for pos, card in enumerate([WATER, TREE], 1):
+        conn.execute("INSERT INTO reviews (email, kanji_id, position) "
+                     "VALUES (?, ?, ?)", ("a@x.com", kc.card_id(card), pos))
+    for card in (WATER, TREE, FIRE):
+        conn.execute("INSERT INTO kanji_cards VALUES (?, ?)",
+                     (kc.card_id(card), json.dumps(card, ensure_ascii=False)))
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+    conn.close()
+
+
+def user_version(fp) -> int:
+    conn = sqlite3.connect(fp)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def check_migrated(store):
+    assert store.get_password("a@x.com") == "pw"
+    assert [c["kanji"] for c in store.get_cards("a@x.com", "reviews")] \
+        == ["水", "木"]
+    assert store.has_card("a@x.com", "known", FIRE)
+
+    stats = store.get_stats("a@x.com")
+    assert stats["known"] == 1 and stats["backlog"] == 2
+
+    sched = store.get_schedule("a@x.com")
+    assert set(sched) == {kc.card_id(WATER), kc.card_id(TREE)}
+
+
+def test_fresh_database_gets_current_schema(tmp_path):
+    fp = str(tmp_path / "users.db")
+    store = kc.SqliteUserStore(fp)
+    assert store.create_user("a@x.com", "pw")
+    store.close()
+    assert user_version(fp) == kc.SqliteUserStore.VERSION
+
+
+@pytest.mark.parametrize("make", [make_v1, make_v2,
+                                  lambda fp: make_v2(fp, 3)],
+                         ids=["v1", "v2", "v3"])
+def test_upgrade_keeps_users_and_cards(tmp_path, make):
+    fp = str(tmp_path / "users.db")
+    make(fp)
+
+    store = kc.SqliteUserStore(fp)
+    check_migrated(store)
+    store.close()
+    assert user_version(fp) == kc.SqliteUserStore.VERSION
+
+    # Reopening an upgraded file is a no-op.
+    check_migrated(kc.SqliteUserStore(fp))
+
+
+def test_failed_v1_upgrade_loses_nothing(tmp_path, monkeypatch):
+    fp = str(tmp_path / "users.db")
+    make_v1(fp)
+
+    def boom(self, usdb):
+        raise RuntimeError("interrupted")
+
+    with monkeypatch.context() as m:
+        m.setattr(kc.SqliteUserStore, "_import_users", boom)
+        with pytest.raises(RuntimeError):
+            kc.SqliteUserStore(fp)
+
+    # The DROPs were rolled back with the rest of the upgrade.
+    conn = sqlite3.connect(fp)
+    assert conn.execute("SELECT COUNT(*) FROM cards").fetchone()[0] == 3
+    conn.close()
+    assert user_version(fp) == 0
+
+    check_migrated(kc.SqliteUserStore(fp))
+
+
+@pytest.mark.parametrize("version", [2, 3])
+def test_failed_column_upgrade_can_be_retried(tmp_path, monkeypatch,
+                                              version):
+    fp = str(tmp_path / "users.db")
+    make_v2(fp, version)
+
+    real_execute = sqlite3.Connection.execute
+
+    class FailingConnection(sqlite3.Connection):
+        def execute(self, sql, *args):
+            if "ADD COLUMN stats" in sql:
+                raise sqlite3.OperationalError("interrupted")
+            return real_execute(self, sql, *args)
+
+    real_connect = sqlite3.connect
+    with monkeypatch.context() as m:
+        m.setattr(kc.sqlite3, "connect", lambda *a, **kw: real_connect(
+            *a, factory=FailingConnection, **kw))
+        with pytest.raises(sqlite3.OperationalError):
+            kc.SqliteUserStore(fp)
+
+    assert user_version(fp) == version
+
+    # No "duplicate column" on the next start.
+    check_migrated(kc.SqliteUserStore(fp))
+
+
+@pytest.fixture
+def json_users(tmp_path, monkeypatch):
+    # A legacy JSON user file where open_user_store looks for one.
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / os.path.dirname(kc.USER_DATA_FP)).mkdir()
+    kc.JsonUserStore(kc.USER_DATA_FP).create_user("a@x.com", "pw")
+
+
+def test_json_users_are_imported_once(tmp_path, json_users):
+    fp = str(tmp_path / "users.db")
+    store = kc.open_user_store("sqlite", fp)
+    assert store.get_password("a@x.com") == "pw"
+    store.set_password("a@x.com", "new")
+    store.close()
+
+    # Reopening does not overwrite newer data with the JSON file.
+    store = kc.open_user_store("sqlite", fp)
+    assert store.get_password("a@x.com") == "new"
+    store.close()
+
+
+def test_interrupted_json_import_is_retried(tmp_path, json_users,
+                                            monkeypatch):
+    fp = str(tmp_path / "users.db")
+
+    def boom(self, usdb):
+        raise RuntimeError("interrupted")
+
+    with monkeypatch.context() as m:
+        m.setattr(kc.SqliteUserStore, "_import_users", boom)
+        with pytest.raises(RuntimeError):
+            kc.open_user_store("sqlite", fp)
+
+    # The database file exists now, but the import never finished.
+    store = kc.open_user_store("sqlite", fp)
+    assert store.get_password("a@x.com") == "pw"
+    store.close()
+
+
+def test_upgraded_store_counts_as_imported(tmp_path, json_users):
+    fp = str(tmp_path / "users.db")
+    make_v2(fp, 3)
+    conn = sqlite3.connect(fp)
+    conn.execute("UPDATE users SET password = 'kept'")
+    conn.execute("PRAGMA user_version = 4")
+    conn.execute("ALTER TABLE users ADD COLUMN stats TEXT")
+    conn.commit()
+    conn.close()
+
+    store = kc.open_user_store("sqlite", fp)
+    assert store.get_password("a@x.com") == "kept"
+    store.close()
+    assert user_version(fp) == kc.SqliteUserStore.VERSION
@@ -0,0 +1,43 @@
+import subprocess
+
+import pytest
+
+from typer.testing import CliRunner
+
+import kanji_crow_monolith as kc
+
+
+def fake_run(monkeypatch, returncode: int, stdout: str, stderr: str):
+    monkeypatch.setattr(subprocess, "run", lambda *a, **kw: (
+        subprocess.CompletedProcess(a[0], returncode, stdout, stderr)))
+
+
+def test_reports_import_costs():
+    report = kc.profile_startup()
+    assert report["import_ms"] > 0
+    assert report["first_frame_ms"] >= report["import_ms"]
+    assert "rich.console" in report["modules"]
+
+    # Deferred until a backend or command needs them.
+    for name in ("sqlite3", "tracemalloc", "hashlib", "zlib", "bcrypt"):
+        assert name not in report["modules"]
+
+
+def test_failed_run_is_a_clear_error(monkeypatch):
+    fake_run(monkeypatch, 1, "", "import time: 1 | 1 | os\n"
+             "ModuleNotFoundError: No module named 'rich'\n")
+    with pytest.raises(RuntimeError, match="No module named 'rich'"):
+        kc.profile_startup()
+
+
+def test_missing_module_timing_is_a_clear_error(monkeypatch):
+    fake_run(monkeypatch, 0, "0.1 0.2\n", "import time: 1 | 1 | os\n")
+    with pytest.raises(RuntimeError, match="No import timing"):
+        kc.profile_startup()
+
+
+def test_cli_exits_with_an_error(monkeypatch):
+    fake_run(monkeypatch, 1, "", "SyntaxError: invalid syntax\n")
+    result = CliRunner().invoke(kc.app, ["--startup-profile"])
+    assert result.exit_code == 1
+    assert "SyntaxError: invalid syntax" in result.output
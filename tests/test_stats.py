@@ -0,0 +1,81 @@
+import pytest
+
+import kanji_crow_monolith as kc
+
+EMAIL = "a@x.com"
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        store = kc.JsonUserStore(str(tmp_path / "users.json"))
+    else:
+        store = kc.SqliteUserStore(str(tmp_path / "users.db"))
+    store.create_user(EMAIL, "hash")
+    yield store
+    if request.param == "sqlite":
+        store.close()
+
+
+def recounted(store) -> dict:
+    # What the stats would be if counted from scratch.
+    return kc.build_user_stats(store.get_cards(EMAIL, "known"),
+                               store.count_cards(EMAIL, "reviews"))
+
+
+def test_add_and_remove(store, kanjis):
+    store.add_card(EMAIL, "known", kanjis["日"])
+    store.add_card(EMAIL, "known", kanjis["氷"])
+    store.add_card(EMAIL, "reviews", kanjis["水"])
+    # Repeats are not membership changes.
+    store.add_card(EMAIL, "known", kanjis["日"])
+
+    stats = store.get_stats(EMAIL)
+    assert stats["known"] == 2 and stats["backlog"] == 1
+    assert stats["jlpt"] == {"5": 1, "2": 1}
+    assert stats["grade"] == {"1": 1, "3": 1}
+    assert stats["recent"] == [ord("日"), ord("氷")]
+    assert stats == recounted(store)
+
+    store.remove_card(EMAIL, "known", kanjis["氷"])
+    store.remove_card(EMAIL, "reviews", kanjis["木"])
+
+    stats = store.get_stats(EMAIL)
+    assert stats["known"] == 1 and stats["backlog"] == 1
+    assert stats["jlpt"] == {"5": 1} and stats["grade"] == {"1": 1}
+    assert stats["recent"] == [ord("日")]
+    assert stats == recounted(store)
+
+
+def test_batches(store, kanjis):
+    cards = [kanjis[k] for k in "日水木汐"]
+    assert store.add_cards(EMAIL, "reviews", cards) == 4
+    assert store.get_stats(EMAIL)["backlog"] == 4
+
+    assert store.remove_cards(EMAIL, "reviews", cards[:2]) == 2
+    assert store.get_stats(EMAIL) == recounted(store)
+    assert store.get_stats(EMAIL)["backlog"] == 2
+
+
+def test_marking_known(store, kanjis):
+    store.add_card(EMAIL, "reviews", kanjis["火"])
+    store.move_card(EMAIL, "reviews", "known", kanjis["火"])
+
+    stats = store.get_stats(EMAIL)
+    assert stats["known"] == 1 and stats["backlog"] == 0
+    assert stats["recent"] == [ord("火")]
+    assert stats == recounted(store)
+
+
+def test_committed_reviews(store, kanjis):
+    store.add_cards(EMAIL, "reviews", [kanjis["雨"], kanjis["汐"]])
+    sched = kc.new_schedule(0)
+
+    # Rated cards stay queued; graduated ones become known.
+    store.commit_reviews(EMAIL, {ord("雨"): sched}, [ord("汐")])
+
+    stats = store.get_stats(EMAIL)
+    assert stats["known"] == 1 and stats["backlog"] == 1
+    # 汐 has a JLPT level but no school grade.
+    assert stats["jlpt"] == {"1": 1} and stats["grade"] == {}
+    assert stats == recounted(store)
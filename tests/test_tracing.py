@@ -0,0 +1,57 @@
+import json
+
+import kanji_crow_monolith as kc
+
+
+def test_reads_and_writes_are_traced(tmp_path, kanjis):
+    store = kc.SqliteUserStore(str(tmp_path / "users.db"))
+    trace_fp = tmp_path / "trace.jsonl"
+    kc.start_tracing(str(trace_fp))
+    try:
+        store.create_user("a@x.com", "pw")
+        store.add_cards("a@x.com", "reviews", [kanjis["水"], kanjis["木"]])
+        store.get_cards("a@x.com", "reviews")
+    finally:
+        kc.stop_tracing()
+
+    spans = [json.loads(line) for line in trace_fp.read_text().splitlines()]
+    by_name = {span["name"]: span for span in spans}
+    assert by_name["sqlite.add_cards"]["rows_written"] == 5
+    assert by_name["sqlite.get_cards"]["rows_read"] == 2
+    commits = [s for s in spans if s["name"] == "sqlite.commit"]
+    assert [s["parent"] for s in commits] == [
+        "sqlite.create_user", "sqlite.add_cards"]
+
+
+def test_tracer_stops_only_the_tracemalloc_it_started(tmp_path):
+    assert not kc.tracemalloc.is_tracing()
+    kc.start_tracing(str(tmp_path / "trace.jsonl"))
+    assert kc.tracemalloc.is_tracing()
+    kc.stop_tracing()
+    assert not kc.tracemalloc.is_tracing()
+
+    kc.tracemalloc.start()
+    try:
+        kc.start_tracing(str(tmp_path / "trace.jsonl"))
+        kc.stop_tracing()
+        assert kc.tracemalloc.is_tracing()
+    finally:
+        kc.tracemalloc.stop()
+
+
+def test_spans_record_the_net_memory_change(tmp_path):
+    trace_fp = tmp_path / "trace.jsonl"
+    kc.start_tracing(str(trace_fp))
+    try:
+        with kc.trace_span("grow"):
+            kept = bytearray(1 << 20)
+        with kc.trace_span("churn"):
+            bytearray(1 << 20)
+    finally:
+        kc.stop_tracing()
+
+    spans = {s["name"]: s for s in map(json.loads,
+                                       trace_fp.read_text().splitlines())}
+    assert spans["grow"]["mem_delta_bytes"] >= len(kept)
+    # Freed before the span ended: no net change.
+    assert spans["churn"]["mem_delta_bytes"] < 1 << 16
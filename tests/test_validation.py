@@ -0,0 +1,60 @@
+import pytest
+
+import kanji_crow_monolith as kc
+
+
+@pytest.mark.parametrize("password, result", [
+    ("Short1", "Too short! Must be >= 8."),
+    ("Waytoolongpassword1", "Too long! Must be <= 16."),
+    ("lowercase1", "Missing at least 1 uppercase char."),
+    ("NoDigitsHere", "Missing at least 1 digit."),
+    ("Has Space1", "Cannot contain spaces."),
+    ("Kanji4Crow", True),
+])
+def test_password_rules(password, result):
+    assert kc.PASSWORD_VALIDATOR(password) == result
+
+
+def test_first_failing_rule_wins():
+    # Too short, no uppercase and no digit: only the first is reported.
+    assert kc.PASSWORD_VALIDATOR("abc") == "Too short! Must be >= 8."
+
+
+def test_email_rules():
+    assert kc.EMAIL_VALIDATOR("nobody") == \
+        "An email address must have an @-sign."
+    assert kc.EMAIL_VALIDATOR("a@example.com") is True
+    assert kc.EMAIL_VALIDATOR("a@b") is not True
+
+
+def test_none_is_validated_as_empty():
+    assert kc.LOGIN_PASSWORD_VALIDATOR(None) == "Password required."
+    assert kc.LOGIN_PASSWORD_VALIDATOR("x") is True
+
+
+def test_results_are_memoized():
+    calls = []
+
+    def check(value):
+        calls.append(value)
+        return True if value.endswith("!") else "Needs a !"
+
+    engine = kc.ValidationEngine([("min", 2, "Too short."),
+                                  ("check", check, None)])
+    for _ in range(3):
+        assert engine("hey") == "Needs a !"
+        assert engine("hey!") is True
+    assert engine("h") == "Too short."
+
+    # Each distinct input ran the rules once; "h" stopped early.
+    assert calls == ["hey", "hey!"]
+    assert engine.validate.cache_info().hits == 4
+
+
+def test_character_classes_come_from_the_rules():
+    engine = kc.ValidationEngine([("has", "digits", "Digit!"),
+                                  ("no", "spaces", "Space!"),
+                                  ("has", "digits", "Digit again!")])
+    assert [name for name, _ in engine._classes] == ["digits", "spaces"]
+    assert engine("a b") == "Digit!"
+    assert engine("1 b") == "Space!"